@@ -0,0 +1,161 @@
+"""
+Ingest Benchmark
+-------------------
+
+Measures the throughput of the stages of the processing with a zip-file generated by
+`synthetic.generate_archive`:
+
+- extract: unzip the outer and the inner zip-file into a temporary directory (`unzip_data`)
+- parse: read the IBI.csv files of all students (`InterBeatInterval.series`)
+- window: calculate all values stored in the database (`compute_term`)
+- write: insert the results into an SQLite database (`write_student`)
+
+Every stage is timed separately over all students and reported in beats per second,
+so a regression in one of the hot paths shows up in its own line.
+
+With `--end-to-end`, the wall time of `process_data` is compared between the serial
+processing and the pipeline, in which the stages overlap.
+
+Usage (from the root of the repository):
+    python -m benchmarks.ingest [--students N] [--beats N] [--repeat N] [--sqlite PATH] [--ibi-storage MODE]
+                                [--end-to-end]
+
+:Modul: ingest
+:Author: Benjamin Gaube
+:Date: 2023-10-12
+"""
+
+import io
+import os
+import tempfile
+import argparse
+import warnings
+from time import perf_counter
+from contextlib import redirect_stdout
+from typing import Dict
+
+from src.main import (unzip_it, stream_data, process_data, student_factory, compute_term, write_student,
+                      StudentResult, FILENAME)
+from src.storage import SQLiteBackend, TERMS, IBI_STORAGE_MODES
+from src.synthetic import generate_archive
+
+STAGES = ['extract', 'parse', 'window', 'write']
+
+
+def run_benchmark(zip_path: str, sqlite_path: str = ':memory:', ibi_storage: str = 'rows') -> Dict[str, float]:
+    """
+    Run all stages once and measure their duration.
+
+    :param zip_path: str, The path to a zip-file with the layout of the dataset.
+    :param sqlite_path: str, The path to the SQLite database the data is written to. Default is in memory.
+    :param ibi_storage: str, Where the raw IBI series are stored, one of `IBI_STORAGE_MODES`.
+    :return: Dict[str, float], The duration of every stage in seconds and the number of processed 'beats'.
+    """
+
+    timings = dict.fromkeys(STAGES, 0.0)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        start = perf_counter()
+        unzip_it(zip_path, temp_dir)
+        data_dir = os.path.join(temp_dir, FILENAME)
+        unzip_it(os.path.join(data_dir, 'Data.zip'), data_dir)
+        timings['extract'] = perf_counter() - start
+
+        students = []
+        start = perf_counter()
+        for stud in student_factory(data_dir):
+            stud.ibi = stud.path
+            for term in TERMS:
+                stud.ibi.series(term)
+            students.append(stud)
+        timings['parse'] = perf_counter() - start
+
+        results = []
+        start = perf_counter()
+        for stud in students:
+            terms = tuple(compute_term(stud.ibi.series(term), term, stud.grades[j])
+                          for j, term in enumerate(TERMS))
+            results.append(StudentResult(stud.student_id, terms, {}, {}))
+        timings['window'] = perf_counter() - start
+
+    with SQLiteBackend(sqlite_path, ibi_storage=ibi_storage) as backend:
+        backend.create_schema(drop_existing=True)
+        start = perf_counter()
+        for result in results:
+            with backend.transaction() as cursor:
+                write_student(backend, cursor, backend.insert_student(cursor, result.student_id), result)
+        timings['write'] = perf_counter() - start
+
+    timings['beats'] = sum(len(term.interval) for result in results for term in result.terms)
+    return timings
+
+
+def run_end_to_end(zip_path: str, sqlite_path: str = ':memory:', ibi_storage: str = 'rows',
+                   pipeline: bool = False) -> float:
+    """
+    Process the zip-file with `process_data` and measure the wall time.
+
+    :param zip_path: str, The path to a zip-file with the layout of the dataset.
+    :param sqlite_path: str, The path to the SQLite database the data is written to. Default is in memory.
+    :param ibi_storage: str, Where the raw IBI series are stored, one of `IBI_STORAGE_MODES`.
+    :param pipeline: bool, Whether reading, calculating and writing run in separate threads.
+    :return: float, The wall time of the run in seconds.
+    """
+
+    runs = []
+    with SQLiteBackend(sqlite_path, ibi_storage=ibi_storage) as backend:
+        backend.create_schema(drop_existing=True)
+        with redirect_stdout(io.StringIO()):
+            stream_data(zip_path, lambda temp_dir, archive: runs.append(
+                process_data(temp_dir, backend, archive=archive, pipeline=pipeline)))
+    return runs[0].wall_time
+
+
+def report(timings: Dict[str, float]) -> str:
+    """
+    Format the results of `run_benchmark` as a table.
+
+    :param timings: Dict[str, float], The results of `run_benchmark`.
+    :return: str, One line per stage with its duration and throughput.
+    """
+
+    lines = [f'{"stage":<10}{"seconds":>10}{"beats/s":>14}']
+    for stage in STAGES + ['total']:
+        seconds = sum(timings[s] for s in STAGES) if stage == 'total' else timings[stage]
+        lines.append(f'{stage:<10}{seconds:>10.3f}{timings["beats"] / seconds:>14,.0f}')
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Measure the throughput of the stages of the processing.')
+    parser.add_argument('--students', type=int, default=10, metavar='N', help='number of students (default: 10)')
+    parser.add_argument('--beats', type=int, default=20000, metavar='N',
+                        help='number of beats per student and term (default: 20000)')
+    parser.add_argument('--repeat', type=int, default=3, metavar='N',
+                        help='number of runs, the fastest one is reported (default: 3)')
+    parser.add_argument('--sqlite', default=':memory:', metavar='PATH',
+                        help='SQLite database the data is written to (default: in memory)')
+    parser.add_argument('--ibi-storage', choices=IBI_STORAGE_MODES, default='rows',
+                        help='store the raw IBI series as rows, as compressed blobs or both (default: rows)')
+    parser.add_argument('--end-to-end', action='store_true',
+                        help='compare the wall time of the serial processing and the pipeline')
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore', FutureWarning)
+
+    with tempfile.TemporaryDirectory() as archive_dir:
+        path = generate_archive(os.path.join(archive_dir, FILENAME + '.zip'), args.students, args.beats)
+        runs = [run_benchmark(path, args.sqlite, args.ibi_storage) for _ in range(args.repeat)]
+        if args.end_to_end:
+            wall_times = {mode: min(run_end_to_end(path, args.sqlite, args.ibi_storage, mode == 'pipeline')
+                                    for _ in range(args.repeat))
+                          for mode in ['serial', 'pipeline']}
+
+    best = {key: min(run[key] for run in runs) for key in STAGES}
+    best['beats'] = runs[0]['beats']
+    print(f'{args.students} students, {best["beats"]:,} beats, best of {args.repeat} runs')
+    print(report(best))
+    if args.end_to_end:
+        for mode, seconds in wall_times.items():
+            print(f'{"end-to-end " + mode:<20}{seconds:>10.3f}')
@@ -0,0 +1,87 @@
+"""
+Parse Benchmark
+-------------------
+
+Compares the parsing of an IBI.csv file by `InterBeatInterval.parse_file` with the generic
+path of `pd.read_csv` and `InterBeatInterval._reformat_file` (`InterBeatInterval.read_file`).
+The file is generated by `synthetic.ibi_csv` and parsed from memory, so only the parsing is timed.
+Both paths have to give the same series.
+
+Usage (from the root of the repository):
+    python -m benchmarks.parse [--beats N] [--repeat N]
+
+:Modul: parse
+:Author: Benjamin Gaube
+:Date: 2023-10-12
+"""
+
+import io
+import argparse
+import warnings
+from time import perf_counter
+from typing import Callable, Dict
+
+import numpy as np
+import pandas as pd
+
+from src.event_series import InterBeatInterval, IBISeries
+from src.synthetic import ibi_csv
+
+
+def generic_parser(file) -> IBISeries:
+    """ the parsing of `InterBeatInterval.read_file` """
+    ibi_df = pd.read_csv(file, encoding='utf-8-sig')
+    return IBISeries.from_frame(InterBeatInterval._reformat_file(ibi_df))
+
+
+PARSERS: Dict[str, Callable] = {'read_csv + _reformat_file': generic_parser,
+                                'parse_file': InterBeatInterval.parse_file}
+
+
+def run_benchmark(beats: int = 1000000, repeat: int = 3) -> Dict[str, float]:
+    """
+    Parse a generated file with every parser and measure the fastest run.
+
+    :param beats: int, The number of beats in the file.
+    :param repeat: int, The number of runs per parser.
+    :return: Dict[str, float], The seconds per million beats by parser.
+    :raise AssertionError: If the parsers give different series.
+    """
+
+    term_start = InterBeatInterval.term_periods['final'][0]
+    content = ('\ufeff' + ibi_csv(np.random.default_rng(0), term_start, beats, 0.002)).encode('utf-8')
+
+    results, series = {}, []
+    for name, parser in PARSERS.items():
+        best = float('inf')
+        for _ in range(repeat):
+            file = io.BytesIO(content)
+            start = perf_counter()
+            parsed = parser(file)
+            best = min(best, perf_counter() - start)
+        results[name] = best / beats * 1e6
+        series.append(parsed)
+
+    for other in series[1:]:
+        if not (np.array_equal(series[0].time, other.time) and np.array_equal(series[0].interval, other.interval)):
+            raise AssertionError('The parsers give different series.')
+    return results
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Compare the parsers of the IBI.csv files.')
+    parser.add_argument('--beats', type=int, default=1000000, metavar='N',
+                        help='number of beats in the file (default: 1000000)')
+    parser.add_argument('--repeat', type=int, default=3, metavar='N',
+                        help='number of runs, the fastest one is reported (default: 3)')
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore', FutureWarning)
+
+    results = run_benchmark(args.beats, args.repeat)
+    baseline = results['read_csv + _reformat_file']
+    print(f'{args.beats:,} beats, best of {args.repeat} runs')
+    print(f'{"parser":<28}{"s per 1M beats":>16}{"speed-up":>10}')
+    for name, seconds in results.items():
+        print(f'{name:<28}{seconds:>16.3f}{baseline / seconds:>9.2f}x')
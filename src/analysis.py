@@ -0,0 +1,182 @@
+"""
+Analysis Module
+-------------------
+
+This module provides the analyses of the notebook 'analyzing_students_hrv.ipynb' as functions
+over the stored tables. Instead of a query of the whole frame per student and term, every
+analysis is one groupby or one vectorized pass over the columns:
+
+1. `exam_averages`: Which exams turned out best? The average grade per term.
+2. `student_totals`: Which student performed the best? The sum of the grades per student.
+3. `load_exam_statistics`, `hrv_differences`: Is there a difference in the HRV for the whole
+   recording time and the time in which the exams are written?
+4. `correlation_inputs`, `grade_correlations`: Is there a relation between grade and HRV?
+
+The tables are read by `load_master` and `load_exam_statistics` with a `sql_query.QueryReader`,
+so the analyses run on the MySQL database as well as on the SQLite database of `storage`. The HRV
+during the exams is read from the table exam_window, which is filled at ingest, instead of the
+intervals of the exam periods.
+The p-values of the correlations need the optional package scipy, without it they are NaN.
+
+Usage:
+    with open_reader() as reader:
+        master, statistics = load_master(reader), load_exam_statistics(reader)
+    differences = hrv_differences(statistics, master)
+
+:Modul: analysis
+:Author: Benjamin Gaube
+:Date: 2023-10-12
+"""
+
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scipy.stats import t as t_distribution
+except ImportError:  # optional dependency, only needed for the p-values
+    t_distribution = None
+
+from src.sql_query import QueryReader
+from src.storage import TERMS
+
+# the final has twice the points of a midterm
+TERM_POINTS = {'mid1': 1, 'mid2': 1, 'final': 2}
+HRV_COLUMNS = ['nni_mean_examen', 'sdnn_examen']
+
+
+def _order(frame: pd.DataFrame) -> pd.DataFrame:
+    """ sort the rows by student in their natural order (S1, S2, ..., S10) and term """
+    keys = pd.DataFrame({'length': frame.student.str.len(), 'student': frame.student,
+                         'term': frame.term.map(TERMS.index)})
+    return frame.loc[keys.sort_values(['length', 'student', 'term']).index].reset_index(drop=True)
+
+
+def load_master(reader: QueryReader) -> pd.DataFrame:
+    """
+    Read the master data of all students and terms.
+
+    :param reader: QueryReader, The reader of the database.
+    :return: pd.DataFrame, The columns of `sql_query.MASTER_COLUMNS`.
+    """
+    return pd.DataFrame(reader.master_data())
+
+
+def load_exam_statistics(reader: QueryReader) -> pd.DataFrame:
+    """
+    Read the mean and the sample standard deviation of the intervals during the exams per student and term.
+
+    :param reader: QueryReader, The reader of the database.
+    :return: pd.DataFrame, The columns 'student', 'term', 'nni_mean_examen' and 'sdnn_examen',
+        rounded to two decimals, with one row per student and term with intervals during the exam.
+    """
+    exam_window = reader.exam_window()
+    statistics = pd.DataFrame({'student': exam_window['student'], 'term': exam_window['term'],
+                               # FLOAT columns of MySQL are single precision
+                               'nni_mean_examen': exam_window['nni_mean'].round(2),
+                               'sdnn_examen': exam_window['sdnn'].round(2)})
+    return _order(statistics)
+
+
+def exam_averages(master: pd.DataFrame) -> pd.DataFrame:
+    """
+    Average the grades per term, the grades of the final are divided by two.
+
+    :param master: pd.DataFrame, The master data with the columns 'term' and 'grade'.
+    :return: pd.DataFrame, The columns 'id', 'term' and 'average_grade' with one row per term.
+    """
+    averages = master.groupby('term', sort=False).grade.mean()
+    averages = averages / averages.index.map(TERM_POINTS)
+    terms = [term for term in TERMS if term in averages.index]
+    return pd.DataFrame({'id': [TERMS.index(term) + 1 for term in terms], 'term': terms,
+                         'average_grade': averages[terms].to_numpy()})
+
+
+def student_totals(master: pd.DataFrame) -> pd.DataFrame:
+    """
+    Sum up the grades of every student.
+
+    :param master: pd.DataFrame, The master data with the columns 'student' and 'grade'.
+    :return: pd.DataFrame, The columns 'student' and 'total_points', the best student first.
+    """
+    totals = master.groupby('student', sort=False).grade.sum().astype(float)
+    return (totals.rename('total_points').reset_index()
+            .sort_values('total_points', ascending=False, kind='stable').reset_index(drop=True))
+
+
+def hrv_differences(statistics: pd.DataFrame, master: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compare the HRV during the exams with the HRV of the whole recording.
+
+    The HRV of the whole recording is subtracted from the HRV during the exam.
+
+    :param statistics: pd.DataFrame, The HRV during the exams, see `load_exam_statistics`.
+    :param master: pd.DataFrame, The master data with the columns 'student', 'term', 'nni_mean' and 'sdnn'.
+    :return: pd.DataFrame, The columns of `statistics`, 'nni_mean_whole', 'sdnn_whole',
+        'nni_mean_diff' and 'sdnn_diff' for every student and term in both.
+    """
+    whole = master[['student', 'term', 'nni_mean', 'sdnn']].rename(columns={'nni_mean': 'nni_mean_whole',
+                                                                            'sdnn': 'sdnn_whole'})
+    differences = statistics.merge(whole, on=['student', 'term'], how='inner')
+    differences['nni_mean_diff'] = differences.nni_mean_examen - differences.nni_mean_whole
+    differences['sdnn_diff'] = differences.sdnn_examen - differences.sdnn_whole
+    return differences
+
+
+def correlation_inputs(statistics: pd.DataFrame, master: pd.DataFrame, scale_final: bool = False) -> pd.DataFrame:
+    """
+    Combine the grades with the HRV during the exams.
+
+    :param statistics: pd.DataFrame, The HRV during the exams, see `load_exam_statistics`.
+    :param master: pd.DataFrame, The master data with the columns 'student', 'term' and 'grade'.
+    :param scale_final: bool, Whether the grades of the final are divided by two, so the grades
+        of all terms are comparable.
+    :return: pd.DataFrame, The columns 'student', 'term', 'grade' and `HRV_COLUMNS`.
+    """
+    inputs = master[['student', 'term', 'grade']].merge(statistics[['student', 'term'] + HRV_COLUMNS],
+                                                        on=['student', 'term'], how='inner')
+    if scale_final:
+        inputs['grade'] = inputs.grade / inputs.term.map(TERM_POINTS)
+    return inputs
+
+
+def grade_correlations(inputs: pd.DataFrame, by_term: bool = True,
+                       parameters: Sequence[str] = HRV_COLUMNS) -> pd.DataFrame:
+    """
+    Calculate the Pearson correlation between the grade and HRV parameters, per term or over all terms.
+
+    The coefficients of all groups are calculated at once from the sums of the centered columns.
+    The two-sided p-value of the t-test of the coefficient is NaN, if scipy isn't installed.
+
+    :param inputs: pd.DataFrame, The grades and the HRV, see `correlation_inputs`.
+    :param by_term: bool, Whether the correlations are calculated per term (True) or over all rows (False).
+    :param parameters: Sequence[str], The columns correlated with the grade.
+    :return: pd.DataFrame, The columns 'term' (only by term), 'parameter' (without the suffix '_examen'),
+        'n', 'p' and 'cor'.
+    """
+    keys = inputs.term if by_term else np.zeros(len(inputs), dtype=int)
+    groups = inputs.groupby(keys, sort=False)
+    grade = inputs.grade - groups.grade.transform('mean')
+    grade_squares = (grade * grade).groupby(keys, sort=False).sum()
+
+    results = []
+    for parameter in parameters:
+        values = inputs[parameter] - groups[parameter].transform('mean')
+        cor = (grade * values).groupby(keys, sort=False).sum() / np.sqrt(
+            grade_squares * (values * values).groupby(keys, sort=False).sum())
+        result = pd.DataFrame({'parameter': parameter[:-len('_examen')], 'n': groups.size(), 'cor': cor})
+        if by_term:
+            result.insert(0, 'term', cor.index)
+        results.append(result)
+
+    results = pd.concat(results).reset_index(drop=True)
+    if by_term:
+        results = results.sort_values('term', key=lambda term: term.map(TERMS.index), kind='stable')
+
+    degrees = results.n - 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = results.cor * np.sqrt(degrees / (1 - results.cor ** 2))
+    results.insert(results.columns.get_loc('cor'), 'p',
+                   2 * t_distribution.sf(np.abs(t), degrees) if t_distribution is not None else np.nan)
+    return results.reset_index(drop=True)
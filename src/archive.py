@@ -0,0 +1,231 @@
+"""
+Archive Module
+-------------------
+
+This module provides read access to the data as it is downloaded, without extracting
+the zip-files to a temporary directory. The downloaded zip-file contains the file
+'StudentGrades.txt' and another zip-file 'Data.zip' with the folders of all students.
+`DatasetArchive` combines both into one directory tree, which looks like the extracted
+data, and opens only the files which are actually read.
+
+The functions `list_dir`, `open_file` and `file_fingerprint` are used by the other modules
+of the package to work on both, the extracted data on disk and a `DatasetArchive`.
+
+:Modul: archive
+:Author: Benjamin Gaube
+:Date: 2023-10-12
+"""
+
+import os
+import zlib
+import shutil
+import zipfile
+import posixpath
+import tempfile
+from multiprocessing.util import Finalize
+from typing import Dict, List, Set, Tuple, BinaryIO
+
+INNER_ZIP = 'Data.zip'
+SPOOL_SIZE = 256 * 1024 ** 2  # compressed inner zip-files up to this size are buffered in memory
+
+# the archives opened by unpickling, by process id and path, so every process opens a zip-file once
+_SHARED: Dict[Tuple[int, str], 'DatasetArchive'] = {}
+
+
+def _normalize(path: str) -> str:
+    """ convert a path of the operating system into a path of the archive """
+    path = posixpath.normpath(path.replace(os.sep, '/')).strip('/')
+    return '' if path == '.' else path
+
+
+class DatasetArchive:
+    """
+    Read-only view of the downloaded zip-file, which looks like the extracted data.
+
+    Paths are relative to the folder of the dataset, e.g. 'StudentGrades.txt' or
+    os.path.join('Data', 'S1', 'Final', 'IBI.csv'). The inner 'Data.zip' is opened in place,
+    if it is stored uncompressed in the outer zip-file. Otherwise, seeking in it would mean
+    to decompress it again and again, so the inner zip-file (but none of its members) is
+    copied into a spooled temporary file once.
+
+    The archive can be pickled, e.g. to pass it to worker processes. Only the path is pickled and
+    every process opens the zip-file once, on the first unpickling, and reuses it for all further
+    tasks (see `_shared_archive`). The archives of a process are closed when it exits.
+
+    :ivar path: str, The path to the downloaded zip-file.
+
+    :param main_zip_path: str, The path to the downloaded zip-file.
+    :raise FileNotFoundError: If the zip-file doesn't exist or doesn't contain 'Data.zip'.
+    """
+
+    def __init__(self, main_zip_path: str):
+        self.path = main_zip_path
+        self._outer = None
+        self._inner = None
+        self._spool = None
+        self._prefix = ''
+        self._tree: Dict[str, Set[str]] = {}
+        self._open_archive()
+
+    def _open_archive(self):
+        self._outer = zipfile.ZipFile(self.path, 'r')
+
+        inner_info = next((info for info in self._outer.infolist()
+                           if posixpath.basename(info.filename) == INNER_ZIP), None)
+        if inner_info is None:
+            raise FileNotFoundError(f'No {INNER_ZIP} found in {self.path}')
+        self._prefix = posixpath.dirname(inner_info.filename)
+
+        inner_file = self._outer.open(inner_info)
+        if inner_info.compress_type != zipfile.ZIP_STORED:
+            self._spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+            with inner_file:
+                shutil.copyfileobj(inner_file, self._spool)
+            inner_file = self._spool
+        self._inner = zipfile.ZipFile(inner_file, 'r')
+
+        self._tree = {}
+        start = len(self._prefix) + 1 if self._prefix else 0
+        outer_names = [name[start:] for name in self._outer.namelist()
+                       if name.startswith(self._prefix + '/' if self._prefix else '')]
+        for name in outer_names + self._inner.namelist():
+            parts = [part for part in name.split('/') if part]
+            for depth in range(len(parts)):
+                self._tree.setdefault('/'.join(parts[:depth]), set()).add(parts[depth])
+
+    def _locate(self, path: str):
+        """ return the zip-file and the name of the member for a path """
+        path = _normalize(path)
+        if path in self._inner.NameToInfo:
+            return self._inner, path
+        outer_name = posixpath.join(self._prefix, path) if self._prefix else path
+        if outer_name in self._outer.NameToInfo:
+            return self._outer, outer_name
+        raise FileNotFoundError(f'No such file in {self.path}: {path}')
+
+    def listdir(self, path: str = '') -> List[str]:
+        """
+        Return the names of the entries of a directory in the archive.
+
+        :param path: str, The path of the directory. Default is the folder of the dataset.
+        :return: List[str], The names of files and folders in the directory.
+        :raise FileNotFoundError: If the directory doesn't exist.
+        """
+        try:
+            return sorted(self._tree[_normalize(path)])
+        except KeyError:
+            raise FileNotFoundError(f'No such directory in {self.path}: {path}') from None
+
+    def open(self, path: str) -> BinaryIO:
+        """
+        Open a file of the archive as binary stream without extracting it.
+
+        :param path: str, The path of the file.
+        :return: BinaryIO, A file-like object providing the content of the file.
+        :raise FileNotFoundError: If the file doesn't exist.
+        """
+        archive, name = self._locate(path)
+        return archive.open(name)
+
+    def info(self, path: str) -> zipfile.ZipInfo:
+        """
+        Return the information (CRC, size, ...) stored in the zip-file about a file.
+
+        :param path: str, The path of the file.
+        :return: zipfile.ZipInfo, The information about the member.
+        :raise FileNotFoundError: If the file doesn't exist.
+        """
+        archive, name = self._locate(path)
+        return archive.getinfo(name)
+
+    def close(self):
+        """
+        Close the zip-files and remove the buffered inner zip-file.
+        """
+        for file in (self._inner, self._outer, self._spool):
+            if file is not None:
+                file.close()
+        self._inner = self._outer = self._spool = None
+
+    @property
+    def closed(self) -> bool:
+        """ whether the zip-files are closed """
+        return self._outer is None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __reduce__(self):
+        return _shared_archive, (self.path,)
+
+
+def _shared_archive(path: str) -> DatasetArchive:
+    """
+    Return the archive of this process for a path, which is opened on the first call.
+
+    Used to unpickle a `DatasetArchive`, so the tasks of a worker process share one archive
+    instead of opening the zip-file (and copying a compressed inner zip-file) once per task.
+    Archives opened by another process, e.g. inherited by a fork, aren't reused.
+
+    :param path: str, The path to the downloaded zip-file.
+    :return: DatasetArchive, The open archive.
+    """
+    key = (os.getpid(), os.path.abspath(path))
+    archive = _SHARED.get(key)
+    if archive is None or archive.closed:
+        archive = _SHARED[key] = DatasetArchive(path)
+        # also run at the exit of worker processes, which don't run atexit handlers
+        Finalize(archive, archive.close, exitpriority=10)
+    return archive
+
+
+def list_dir(path: str, archive: DatasetArchive = None) -> List[str]:
+    """
+    Return the names of the entries of a directory on disk or in an archive.
+
+    :param path: str, The path of the directory.
+    :param archive: DatasetArchive, Optional. If given, the path is looked up in the archive.
+    :return: List[str], The names of files and folders in the directory.
+    """
+    if archive is None:
+        return os.listdir(path)
+    return archive.listdir(path)
+
+
+def open_file(path: str, archive: DatasetArchive = None) -> BinaryIO:
+    """
+    Open a file on disk or in an archive as binary stream.
+
+    :param path: str, The path of the file.
+    :param archive: DatasetArchive, Optional. If given, the file is opened in the archive.
+    :return: BinaryIO, A file-like object providing the content of the file.
+    """
+    if archive is None:
+        return open(path, 'rb')
+    return archive.open(path)
+
+
+def file_fingerprint(path: str, archive: DatasetArchive = None) -> str:
+    """
+    Return a fingerprint of the content of a file on disk or in an archive.
+
+    The fingerprint consists of the CRC-32 checksum and the size of the file. For a file
+    in an archive, both are taken from the directory of the zip-file, so nothing has to be
+    decompressed. A file on disk is read once to calculate the checksum.
+
+    :param path: str, The path of the file.
+    :param archive: DatasetArchive, Optional. If given, the file is looked up in the archive.
+    :return: str, The fingerprint in the format '<crc as hex>-<size>'.
+    """
+    if archive is not None:
+        info = archive.info(path)
+        return f'{info.CRC:08x}-{info.file_size}'
+
+    crc = 0
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 ** 2), b''):
+            crc = zlib.crc32(chunk, crc)
+    return f'{crc:08x}-{os.path.getsize(path)}'
@@ -0,0 +1,160 @@
+"""
+Cache Module
+-------------------
+
+This module provides an on-disk cache of parsed arrays, so the IBI.csv files of a delivery
+which didn't change aren't parsed again by every run or notebook session.
+
+An entry consists of one .npy file per array, e.g. the columns 'time', 'interval' and
+'contiguous' of an `IBISeries`. The key of an entry is the fingerprint of the parsed file
+(see `archive.file_fingerprint`), i.e. the CRC-32 and the size of the zip member, prefixed with
+the version of the parser (`event_series.CACHE_VERSION`), so a changed file or parser gets a new
+entry and the old one is never read again, but evicted at some point. The files are loaded as read-only
+memory maps, so a hit copies nothing: the pages are read by the operating system when the
+arrays are accessed.
+
+The cache has a size cap. When it is exceeded, the least recently used entries are removed.
+The time of the last use is the modification time of the files, which is updated on every hit.
+New entries are written into temporary files and renamed, so several processes can share a cache.
+
+Usage:
+    cache = ArrayCache('~/.cache/wearable_exam_stress')
+    arrays = cache.get(key)
+    if arrays is None:
+        cache.put(key, {'time': time, 'interval': interval})
+
+:Modul: cache
+:Author: Benjamin Gaube
+:Date: 2023-10-12
+"""
+
+import os
+import re
+import tempfile
+from typing import Dict, Optional
+
+import numpy as np
+
+CACHE_SIZE = 1024 ** 3  # maximum size of the cache in bytes
+_FILE_NAME = re.compile(r'^(?P<key>[\w-]+)\.(?P<name>\w+)\.npy$')
+
+
+class ArrayCache:
+    """
+    Directory of memory-mapped .npy files, keyed by the fingerprint of the parsed file.
+
+    :ivar directory: str, The directory of the cache files, which is created if it doesn't exist.
+    :ivar max_bytes: int, Maximum size of all files of the cache in bytes.
+
+    :param directory: str, The directory of the cache files.
+    :param max_bytes: int, Maximum size of all files of the cache in bytes.
+    :raise ValueError: If `max_bytes` is negative.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = CACHE_SIZE):
+        if max_bytes < 0:
+            raise ValueError(f'max_bytes must not be negative, not {max_bytes}.')
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str, name: str) -> str:
+        return os.path.join(self.directory, f'{key}.{name}.npy')
+
+    def _entries(self) -> Dict[str, list]:
+        """ map every key to the paths of its files """
+        entries = {}
+        for file_name in os.listdir(self.directory):
+            match = _FILE_NAME.match(file_name)
+            if match:
+                entries.setdefault(match['key'], []).append(os.path.join(self.directory, file_name))
+        return entries
+
+    def get(self, key: str, names=('time', 'interval', 'contiguous')) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Load the arrays of an entry as read-only memory maps and mark the entry as used.
+
+        :param key: str, The key of the entry, e.g. '<crc as hex>-<size>'.
+        :param names: Sequence[str], The names of the arrays of the entry.
+        :return: Dict[str, np.ndarray] or None, The arrays by name, or None if the entry doesn't exist.
+        """
+        try:
+            arrays = {name: np.load(self._path(key, name), mmap_mode='r') for name in names}
+        except (FileNotFoundError, ValueError):
+            # missing or evicted by another process in the meantime
+            return None
+
+        for name in names:
+            try:
+                os.utime(self._path(key, name))
+            except FileNotFoundError:
+                pass
+        return arrays
+
+    def put(self, key: str, arrays: Dict[str, np.ndarray]) -> None:
+        """
+        Store the arrays of an entry and evict the least recently used entries if the cache is too large.
+
+        :param key: str, The key of the entry, e.g. '<crc as hex>-<size>'.
+        :param arrays: Dict[str, np.ndarray], The arrays by name.
+        :raise ValueError: If the key contains other characters than letters, digits, '_' and '-'.
+        """
+        if not re.fullmatch(r'[\w-]+', key):
+            raise ValueError(f'Invalid key {key!r}, only letters, digits, "_" and "-" are allowed.')
+
+        for name, array in arrays.items():
+            handle, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+            try:
+                with os.fdopen(handle, 'wb') as file:
+                    np.save(file, np.ascontiguousarray(array))
+                os.replace(temp_path, self._path(key, name))
+            except BaseException:
+                os.remove(temp_path)
+                raise
+
+        self.evict(keep=key)
+
+    def evict(self, keep: str = None) -> int:
+        """
+        Remove the least recently used entries until the cache doesn't exceed `max_bytes`.
+
+        :param keep: str, Optional. The key of an entry which isn't removed, e.g. the one just stored.
+        :return: int, Number of removed entries.
+        """
+        usage = []
+        for key, paths in self._entries().items():
+            try:
+                stats = [os.stat(path) for path in paths]
+            except FileNotFoundError:
+                continue
+            usage.append((max(stat.st_mtime for stat in stats), key, sum(stat.st_size for stat in stats), paths))
+
+        total = sum(size for _, _, size, _ in usage)
+        removed = 0
+        for _, key, size, paths in sorted(usage):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    # removed by another process or still mapped (Windows)
+                    pass
+            total -= size
+            removed += 1
+        return removed
+
+    @property
+    def nbytes(self) -> int:
+        """ the size of all files of the cache in bytes """
+        return sum(os.path.getsize(path) for paths in self._entries().values() for path in paths)
+
+    def clear(self) -> None:
+        """
+        Remove all entries of the cache.
+        """
+        for paths in self._entries().values():
+            for path in paths:
+                os.remove(path)
@@ -0,0 +1,71 @@
+"""
+Codec Module
+-------------------
+
+This module provides a compact binary representation of an IBI series, which is stored
+as a single row per student and term in the table ibi_series instead of one row per
+heartbeat in inter_beat_interval.
+
+The timestamps are delta-encoded, so mostly zeros and ones remain, and packed as
+little-endian 32-bit integers. The intervals are packed as 16-bit integers if all of them
+fit into this range, else as 32-bit integers. Both arrays are compressed with zlib.
+
+:Modul: codec
+:Author: Benjamin Gaube
+:Date: 2023-10-12
+"""
+
+import zlib
+from typing import Tuple
+
+import numpy as np
+
+COMPRESSION_LEVEL = 6
+
+
+def encode_series(time: np.ndarray, interval: np.ndarray) -> Tuple[int, bytes, bytes]:
+    """
+    Encode an IBI series into two compressed binary blobs.
+
+    :param time: np.ndarray, The Unix timestamps of the intervals.
+    :param interval: np.ndarray, The inter-beat intervals in ms.
+    :return: tuple(int, bytes, bytes), The first timestamp, the delta-encoded timestamps
+        and the intervals.
+    :raise ValueError: If the arrays are of different length.
+    """
+
+    if len(time) != len(interval):
+        raise ValueError('time and interval have to be of the same length.')
+
+    start_time = int(time[0]) if len(time) else 0
+    deltas = np.diff(np.asarray(time, dtype=np.int64), prepend=start_time).astype('<i4')
+
+    interval = np.asarray(interval)
+    small = len(interval) == 0 or (interval.min() >= np.iinfo(np.int16).min and interval.max() <= np.iinfo(np.int16).max)
+    packed = interval.astype('<i2' if small else '<i4')
+
+    return (start_time,
+            zlib.compress(deltas.tobytes(), COMPRESSION_LEVEL),
+            zlib.compress(packed.tobytes(), COMPRESSION_LEVEL))
+
+
+def decode_series(start_time: int, time_blob: bytes, interval_blob: bytes,
+                  number_of_ibi: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Decode the blobs of `encode_series` into NumPy arrays.
+
+    :param start_time: int, The first timestamp of the series.
+    :param time_blob: bytes, The compressed, delta-encoded timestamps.
+    :param interval_blob: bytes, The compressed intervals.
+    :param number_of_ibi: int, The number of intervals of the series.
+    :return: tuple(np.ndarray, np.ndarray), The timestamps (int64) and the intervals (int16 or int32).
+    """
+
+    deltas = np.frombuffer(zlib.decompress(time_blob), dtype='<i4')
+    time = np.cumsum(deltas, dtype=np.int64) + start_time
+
+    raw = zlib.decompress(interval_blob)
+    width = len(raw) // number_of_ibi if number_of_ibi else 2
+    interval = np.frombuffer(raw, dtype='<i2' if width == 2 else '<i4')
+
+    return time, interval
@@ -8,6 +8,15 @@ from CSV files, and offers utilities for reformatting and generating 5-minute mo
 of IBI data within specified term periods. These periods are hardcoded in the class attribute
 `term_periods`.
 
+Besides the 5-minute windows, further window lengths and steps are registered in `WINDOW_SPECS`.
+`InterBeatInterval.moving_windows_hrv` calculates any selection of them at once: the borders of
+the windows of all specs are searched in the sorted beats together and the HRV parameters of all
+windows are calculated by one call of `hrv.window_parameters`.
+
+The further signals of the wristband (BVP, ACC, EDA, HR, TEMP) are sampled at a fixed rate
+and much larger than the IBI data. `SignalSeries` streams them in chunks of a fixed number of
+samples, so the memory needed doesn't depend on the length of the recording.
+
 :Modul: event_series
 :Author: Benjamin Gaube
 :Date: 2023-10-12
@@ -17,7 +26,89 @@ import os
 
 import pandas as pd
 import numpy as np
-from typing import Generator, Dict
+from typing import Generator, Dict, Tuple, BinaryIO, List, NamedTuple
+
+from src.archive import DatasetArchive, open_file, file_fingerprint
+from src.cache import ArrayCache
+from src.metrics import timed
+from src.hrv import window_parameters, estimate_contiguity
+
+CONTIGUITY_TOLERANCE = 1 / 128  # seconds, half the resolution of the beat detection
+CHUNK_SIZE = 100000  # samples per chunk of a signal
+# version of the parsed arrays in the cache, to be increased with every change of `parse_file`,
+# the contiguity or the dtypes, so the arrays parsed by older versions are never read again
+CACHE_VERSION = 1
+TERMS = ['mid1', 'mid2', 'final']  # order defines the term_id and the position of the grade of a term
+# length and step of the moving windows in seconds by name, the order defines the window_spec_id
+WINDOW_SPECS: Dict[str, Tuple[int, int]] = {'5min': (300, 60),
+                                            '1min': (60, 15),
+                                            '2min': (120, 30),
+                                            '10min': (600, 60)}
+DEFAULT_WINDOW_SPECS = ('5min',)
+# columns of the sampled signals by file name (without .csv)
+SIGNALS: Dict[str, List[str]] = {'BVP': ['bvp'],
+                                 'ACC': ['x', 'y', 'z'],
+                                 'EDA': ['eda'],
+                                 'HR': ['hr'],
+                                 'TEMP': ['temp']}
+
+
+class IBISeries:
+    """
+    Compact IBI data of one term in two NumPy arrays.
+
+    The Unix timestamps are stored as int32 and the intervals as int16, or as int32 if an interval
+    doesn't fit into int16. Compared to a DataFrame with two int64 columns, this needs less than half
+    of the memory. Like a DataFrame, the columns are accessed as attributes `time` and `interval`,
+    so an IBISeries can be passed to the static methods of `InterBeatInterval`.
+
+    :ivar time: np.ndarray, The Unix timestamps of the intervals (int32).
+    :ivar interval: np.ndarray, The inter-beat intervals in ms (int16 or int32).
+    :ivar contiguous: np.ndarray, For every interval whether it follows the previous one without missing beats.
+
+    :param time: np.ndarray, The Unix timestamps of the intervals.
+    :param interval: np.ndarray, The inter-beat intervals in ms.
+    :param contiguous: np.ndarray, Optional. For every interval whether it follows the previous one.
+        Default is None, meaning it is estimated from the timestamps (see `hrv.estimate_contiguity`).
+    """
+
+    __slots__ = ('time', 'interval', 'contiguous')
+
+    def __init__(self, time: np.ndarray, interval: np.ndarray, contiguous: np.ndarray = None):
+        interval = np.asarray(interval)
+        small = interval.dtype == np.int16 or len(interval) == 0 or (interval.min() >= np.iinfo(np.int16).min and
+                                                                     interval.max() <= np.iinfo(np.int16).max)
+        # arrays of the right type, e.g. memory maps of the cache, aren't copied
+        self.time = np.asarray(time, dtype=np.int32)
+        self.interval = interval.astype(np.int16 if small else np.int32, copy=False)
+        self.contiguous = (estimate_contiguity(self.time, self.interval) if contiguous is None
+                           else np.asarray(contiguous, dtype=bool))
+
+    @classmethod
+    def from_frame(cls, ibi_df: pd.DataFrame) -> 'IBISeries':
+        """
+        Create the compact series of a DataFrame with the columns 'time' and 'interval'.
+
+        :param ibi_df: pd.DataFrame, The IBI data, see `InterBeatInterval._reformat_file`.
+        :return: IBISeries, The series with the same values.
+        """
+        return cls(ibi_df.time.to_numpy(), ibi_df.interval.to_numpy())
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Return the series as DataFrame with the columns 'time' and 'interval'.
+
+        :return: pd.DataFrame, The IBI data.
+        """
+        return pd.DataFrame({'time': self.time, 'interval': self.interval})
+
+    @property
+    def nbytes(self) -> int:
+        """ the memory used by the arrays in bytes """
+        return self.time.nbytes + self.interval.nbytes + self.contiguous.nbytes
+
+    def __len__(self):
+        return len(self.interval)
 
 
 class InterBeatInterval:
@@ -27,23 +118,130 @@ class InterBeatInterval:
     The class provides functionalities for reading, reformating and generating
     5-minute moving windows of IBI data for different term periods (e.g., 'Final', 'Midterm 1', 'Midterm 2').
 
+    The IBI data of a term is read when it is accessed for the first time and kept as compact
+    `IBISeries` until it is released, so only the term which is currently processed is in memory.
+    With an `ArrayCache`, a parsed file is stored in the cache and loaded from it as memory maps,
+    as long as the fingerprint of the file and the `CACHE_VERSION` of the parser don't change,
+    so it is parsed only once.
+
     :ivar path: str, The directory path where term IBI data resides.
+    :ivar archive: DatasetArchive or None, The archive containing the directory, if the data isn't extracted.
+    :ivar cache: ArrayCache or None, The cache of the parsed files.
     :ivar final: pd.DataFrame, A DataFrame containing the 'Final' term IBI data.
     :ivar mid1: pd.DataFrame, A DataFrame containing the 'Midterm 1' term IBI data.
     :ivar mid2: pd.DataFrame, A DataFrame containing the 'Midterm 2' term IBI data.
 
     :param temp_dir: str, Temporary directory path where IBI data for different term periods are stored.
+    :param archive: DatasetArchive, Optional. If given, `temp_dir` is a path inside this archive.
+    :param cache: ArrayCache, Optional. If given, the parsed files are cached.
     """
 
+    __slots__ = ('path', 'archive', 'cache', '_series')
+
     term_periods = {'final': (1544022000, 1544032800),
                     'mid1': (1539439200, 1539444600),
                     'mid2': (1541862000, 1541867400)}
 
-    def __init__(self, temp_dir):
+    term_folders = {'final': 'Final',
+                    'mid1': 'Midterm 1',
+                    'mid2': 'Midterm 2'}
+
+    def __init__(self, temp_dir, archive: DatasetArchive = None, cache: ArrayCache = None):
         self.path = temp_dir
-        self.final = self.read_file('Final')
-        self.mid1 = self.read_file('Midterm 1')
-        self.mid2 = self.read_file('Midterm 2')
+        self.archive = archive
+        self.cache = cache
+        self._series: Dict[str, IBISeries] = {}
+
+    def series(self, term: str) -> IBISeries:
+        """
+        Return the IBI data of a term, which is read on the first access.
+
+        :param term: str, should be one of {'final', 'mid1', 'mid2'}.
+        :return: IBISeries, The compact IBI data of the term.
+
+        :raise ValueError: Raised if `term` is not one of the allowed options.
+        """
+        if term not in self.term_folders:
+            raise ValueError(f'The passed string have to be one of the following: {list(self.term_folders)}')
+
+        if term not in self._series:
+            path = os.path.join(self.path, self.term_folders[term], 'IBI.csv')
+            if self.cache is None:
+                self._series[term] = self._read_series(path)
+            else:
+                with timed('read_file'):
+                    key = f'v{CACHE_VERSION}-{file_fingerprint(path, self.archive)}'
+                    arrays = self.cache.get(key)
+                if arrays is None:
+                    series = self._read_series(path)
+                    self.cache.put(key, {'time': series.time, 'interval': series.interval,
+                                         'contiguous': series.contiguous})
+                else:
+                    series = IBISeries(**arrays)
+                self._series[term] = series
+        return self._series[term]
+
+    def _read_series(self, path: str) -> IBISeries:
+        """ open and parse an IBI.csv file """
+        with open_file(path, self.archive) as file:
+            return self.parse_file(file)
+
+    def release(self, term: str = None) -> None:
+        """
+        Release the IBI data of a term, it is read again on the next access.
+
+        :param term: str, Optional. One of {'final', 'mid1', 'mid2'}. Default is None, meaning all terms.
+        """
+        if term is None:
+            self._series.clear()
+        else:
+            self._series.pop(term, None)
+
+    @property
+    def final(self) -> pd.DataFrame:
+        """ the IBI data of the 'Final' term as DataFrame """
+        return self.series('final').to_frame()
+
+    @property
+    def mid1(self) -> pd.DataFrame:
+        """ the IBI data of the 'Midterm 1' term as DataFrame """
+        return self.series('mid1').to_frame()
+
+    @property
+    def mid2(self) -> pd.DataFrame:
+        """ the IBI data of the 'Midterm 2' term as DataFrame """
+        return self.series('mid2').to_frame()
+
+    @staticmethod
+    def parse_file(file: BinaryIO) -> IBISeries:
+        """
+        Parse an IBI.csv file of the Empatica wristband into a compact series.
+
+        The result is the same as of `pd.read_csv` and `_reformat_file`, but the start time is
+        taken from the header and both columns are read into one float array, which is shifted
+        and converted to ms in place before it is cast to the integer arrays of the series.
+        An interval follows the previous one without missing beats, if the time between both beats
+        equals the interval.
+
+        :param file: BinaryIO, The opened IBI.csv file.
+        :return: IBISeries, The Unix start times of the intervals and the intervals in ms.
+        """
+        with timed('read_file'):
+            start_time = float(file.readline().decode('utf-8-sig').split(',')[0])
+            values = pd.read_csv(file, header=None, names=['time', 'interval'], dtype=np.float64,
+                                 na_filter=False, engine='c').to_numpy()
+
+        with timed('reformat_file'):
+            time, interval = values[:, 0], values[:, 1]
+            contiguous = np.zeros(len(time), dtype=bool)
+            contiguous[1:] = np.abs(np.diff(time) - interval[1:]) < CONTIGUITY_TOLERANCE
+            time += start_time
+            # the time of a beat is the end of its interval, so the start is the previous beat
+            first = time[0] - interval[0] if len(time) else 0.0
+            time[1:] = time[:-1]
+            time[:1] = first
+            interval *= 1000
+            return IBISeries(time, interval, contiguous)
 
     def read_file(self, term: str) -> pd.DataFrame:
         """
@@ -53,10 +251,44 @@ class InterBeatInterval:
             Should be one of {'Final', 'Midterm 1', 'Midterm 2'}.
         :return: pd.DataFrame, DataFrame containing IBI data for the specified term period.
         """
-        ibi_df = pd.read_csv(os.path.join(self.path, term, 'IBI.csv'), encoding='utf-8-sig')
-        ibi_df = self._reformat_file(ibi_df)
+        with timed('read_file'), open_file(os.path.join(self.path, term, 'IBI.csv'), self.archive) as file:
+            ibi_df = pd.read_csv(file, encoding='utf-8-sig')
+        with timed('reformat_file'):
+            ibi_df = self._reformat_file(ibi_df)
         return ibi_df
 
+    @staticmethod
+    def window_bounds(time: np.ndarray, term: str, length: int = 300,
+                      step: int = 60) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Locate all moving windows of a term in one pass over the sorted time column.
+
+        By default, the windows are 5 minutes long and centered on every full minute of the
+        term period, so they contain all beats with `center - 150 <= time <= center + 150`.
+        Instead of filtering the whole series once per window, the borders of all windows
+        are found with a binary search.
+
+        :param time: np.ndarray, sorted Unix timestamps of the inter-beat intervals.
+        :param term: str, should be one of {'final', 'mid1', 'mid2'}.
+        :param length: int, The length of the windows in seconds.
+        :param step: int, The time between the centers of two windows in seconds.
+        :return: tuple(np.ndarray, np.ndarray, np.ndarray), the central timestamps of the windows
+            and the start (inclusive) and stop (exclusive) index of each window in `time`.
+
+        :raise ValueError: Raised if `term` is not one of the allowed options.
+        """
+
+        term_options = ['final', 'mid1', 'mid2']
+        if term not in term_options:
+            raise ValueError(f'The passed string have to be one of the following: {term_options}')
+
+        period = InterBeatInterval.term_periods[term]
+        centers = np.arange(period[0], period[1] + 1, step, dtype=np.int64)
+        lower = np.searchsorted(time, centers - length / 2, side='left')
+        upper = np.searchsorted(time, centers + length / 2, side='right')
+
+        return centers, lower, upper
+
     @staticmethod
     def moving_5min_window(ibi_df: pd.DataFrame, term: str) -> Generator[Dict[int, np.array], None, None]:
         """
@@ -68,7 +300,7 @@ class InterBeatInterval:
         the count of IBI values within the window, and the IBI values themselves
         in a NumPy array.
 
-        :param ibi_df: pd.DataFrame, containing at least 'time' and 'interval' columns,
+        :param ibi_df: pd.DataFrame or IBISeries, containing at least 'time' and 'interval' columns,
             where 'time' should represent Unix timestamps and 'interval' represents IBI values.
         :param term: str, a string to specify the period, depending on the date of the term
             and should be one of {'final', 'mid1', 'mid2'}.
@@ -79,17 +311,172 @@ class InterBeatInterval:
         :raise ValueError: Raised if `term` is not one of the allowed options.
         """
 
+        intervals = np.asarray(ibi_df.interval)
+        centers, lower, upper = InterBeatInterval.window_bounds(np.asarray(ibi_df.time), term)
+
+        for timestamp, start, stop in zip(centers, lower, upper):
+            yield {'time': int(timestamp), 'intervals': intervals[start:stop]}
+
+    @staticmethod
+    def moving_5min_window_hrv(ibi_df: pd.DataFrame, term: str) -> Dict[str, np.ndarray]:
+        """
+        Calculate all HRV parameters of `hrv.HRV_PARAMETERS` for all 5-minute moving windows of a term at once.
+
+        The windows are the same as in `moving_5min_window`, but instead of yielding the
+        intervals of every window, all parameters are calculated in one pass over the whole
+        term by `hrv.window_parameters`. Without the column 'contiguous' (see `IBISeries`),
+        the contiguity of the intervals is estimated from the timestamps. It is `moving_windows_hrv`
+        restricted to the 5-minute windows.
+
+        :param ibi_df: pd.DataFrame or IBISeries, containing at least 'time' and 'interval' columns.
+        :param term: str, should be one of {'final', 'mid1', 'mid2'}.
+        :return: Dict[str, np.ndarray], columnar arrays 'time', 'number_of_ibi' and one per HRV parameter
+            with one entry per window. Windows without intervals have NaN as hrv values.
+
+        :raise ValueError: Raised if `term` is not one of the allowed options.
+        """
+
+        windows = InterBeatInterval.moving_windows_hrv(ibi_df, term, ['5min'])
+        del windows['window_spec_id'], windows['window_id']
+        return windows
+
+    @staticmethod
+    def window_grid(term: str, specs=DEFAULT_WINDOW_SPECS) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return the moving windows of several specs of `WINDOW_SPECS` within a term period.
+
+        :param term: str, should be one of {'final', 'mid1', 'mid2'}.
+        :param specs: Sequence[str], The names of the window specs, see `WINDOW_SPECS`.
+        :return: tuple(np.ndarray, np.ndarray, np.ndarray, np.ndarray), The window_spec_id, the window_id
+            (counted per spec from 1), the center and half the length of every window.
+
+        :raise ValueError: Raised if `term` or a spec is not one of the allowed options.
+        """
+
+        unknown = [spec for spec in specs if spec not in WINDOW_SPECS]
+        if unknown:
+            raise ValueError(f'Unknown window specs {unknown}, the specs have to be some of {list(WINDOW_SPECS)}.')
+
         term_options = ['final', 'mid1', 'mid2']
         if term not in term_options:
             raise ValueError(f'The passed string have to be one of the following: {term_options}')
 
         period = InterBeatInterval.term_periods[term]
-        for timestamp in range(period[0], period[1]+1, 60):
-            start = timestamp - 150  # minus 2.5min
-            stop = timestamp + 150  # plus 2.5min
-            window = ibi_df.query('@start <= time <= @stop')
+        spec_ids, window_ids, centers, halves = [], [], [], []
+        for spec in specs:
+            length, step = WINDOW_SPECS[spec]
+            spec_centers = np.arange(period[0], period[1] + 1, step, dtype=np.int64)
+            spec_ids.append(np.full(len(spec_centers), list(WINDOW_SPECS).index(spec) + 1))
+            window_ids.append(np.arange(1, len(spec_centers) + 1))
+            centers.append(spec_centers)
+            halves.append(np.full(len(spec_centers), length / 2))
+        return tuple(np.concatenate(column) if column else np.zeros(0, dtype=np.int64)
+                     for column in (spec_ids, window_ids, centers, halves))
+
+    @staticmethod
+    def moving_windows_hrv(ibi_df: pd.DataFrame, term: str, specs=DEFAULT_WINDOW_SPECS) -> Dict[str, np.ndarray]:
+        """
+        Calculate all HRV parameters of `hrv.HRV_PARAMETERS` for the moving windows of several specs at once.
+
+        The windows of every spec of `WINDOW_SPECS` are located like in `window_bounds`, but the
+        borders of the windows of all specs are searched together, and the parameters of all
+        windows are calculated by one call of `hrv.window_parameters`. So a further spec costs
+        more windows, but no further pass over the beats.
+
+        :param ibi_df: pd.DataFrame or IBISeries, containing at least 'time' and 'interval' columns.
+        :param term: str, should be one of {'final', 'mid1', 'mid2'}.
+        :param specs: Sequence[str], The names of the window specs, see `WINDOW_SPECS`.
+        :return: Dict[str, np.ndarray], columnar arrays 'window_spec_id', 'window_id' (counted per spec
+            from 1), 'time', 'number_of_ibi' and one per HRV parameter with one entry per window.
+            Windows without intervals have NaN as hrv values.
+
+        :raise ValueError: Raised if `term` or a spec is not one of the allowed options.
+        """
+
+        spec_ids, window_ids, centers, halves = InterBeatInterval.window_grid(term, specs)
+
+        time, intervals = np.asarray(ibi_df.time), np.asarray(ibi_df.interval)
+        lower = np.searchsorted(time, centers - halves, side='left')
+        upper = np.searchsorted(time, centers + halves, side='right')
+
+        contiguous = getattr(ibi_df, 'contiguous', None)
+        if contiguous is None:
+            contiguous = estimate_contiguity(time, intervals)
+
+        return {'window_spec_id': spec_ids,
+                'window_id': window_ids,
+                'time': centers,
+                'number_of_ibi': upper - lower,
+                **window_parameters(intervals, np.asarray(contiguous), lower, upper)}
+
+    @staticmethod
+    def segments(ibi_df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """
+        Split the IBI series into segments of contiguous beats, i.e. runs without missing beats.
+
+        A segment starts at every interval which doesn't follow the previous one. Its end is the
+        start of its last interval plus that interval, rounded to full seconds like the timestamps.
+        The gap is the time between the end of the previous segment and the start of the segment
+        (0 for the first segment), the duration is the sum of its intervals, i.e. the time covered
+        by detected beats. All segments are found in one vectorized pass over the series.
+
+        :param ibi_df: pd.DataFrame or IBISeries, containing at least 'time' and 'interval' columns.
+            Without the column 'contiguous' (see `IBISeries`), the contiguity is estimated from the timestamps.
+        :return: Dict[str, np.ndarray], The columns 'segment_id' (from 1), 'start_time', 'end_time',
+            'number_of_ibi', 'duration_in_ms' and 'gap_in_s' with one entry per segment.
+        """
+
+        time = np.asarray(ibi_df.time, dtype=np.int64)
+        intervals = np.asarray(ibi_df.interval, dtype=np.int64)
+        contiguous = getattr(ibi_df, 'contiguous', None)
+        if contiguous is None:
+            contiguous = estimate_contiguity(time, intervals)
+
+        first = np.flatnonzero(~np.asarray(contiguous, dtype=bool) | (np.arange(len(time)) == 0))
+        last = np.append(first[1:], len(time))[:len(first)] - 1
+
+        end_time = time[last] + (intervals[last] + 500) // 1000
+        gap = np.zeros(len(first), dtype=np.int64)
+        gap[1:] = np.maximum(time[first[1:]] - end_time[:-1], 0)
+
+        return {'segment_id': np.arange(1, len(first) + 1),
+                'start_time': time[first],
+                'end_time': end_time,
+                'number_of_ibi': last - first + 1,
+                'duration_in_ms': np.add.reduceat(intervals, first) if len(first) else np.zeros(0, dtype=np.int64),
+                'gap_in_s': gap}
+
+    @staticmethod
+    def exam_window(ibi_df: pd.DataFrame, term: str) -> Dict[str, float]:
+        """
+        Aggregate the inter-beat intervals within the period in which the exam was written.
+
+        The beats with `start <= time <= stop` of the term period are aggregated to their
+        count, mean, standard deviation (SDNN, sample standard deviation like in the analysis
+        notebook) and coverage, which is the share of the period covered by detected beats.
+
+        :param ibi_df: pd.DataFrame or IBISeries, containing at least 'time' and 'interval' columns.
+        :param term: str, should be one of {'final', 'mid1', 'mid2'}.
+        :return: Dict[str, float], The values 'number_of_ibi', 'nni_mean', 'sdnn' and 'coverage'.
+            Values which can't be calculated because of missing beats are None.
+
+        :raise ValueError: Raised if `term` is not one of the allowed options.
+        """
+
+        term_options = ['final', 'mid1', 'mid2']
+        if term not in term_options:
+            raise ValueError(f'The passed string have to be one of the following: {term_options}')
+
+        start, stop = InterBeatInterval.term_periods[term]
+        time = np.asarray(ibi_df.time)
+        intervals = np.asarray(ibi_df.interval)[np.searchsorted(time, start, side='left'):
+                                               np.searchsorted(time, stop, side='right')]
 
-            yield {'time': timestamp, 'intervals': np.array(window.interval)}
+        count = len(intervals)
+        return {'number_of_ibi': count,
+                'nni_mean': float(np.mean(intervals).round(2)) if count > 0 else None,
+                'sdnn': float(np.std(intervals, ddof=1).round(2)) if count > 1 else None,
+                'coverage': round(float(np.sum(intervals, dtype=np.int64)) / ((stop - start) * 1000), 4)}
 
     @staticmethod
     def _reformat_file(ibi_df: pd.DataFrame) -> pd.DataFrame:
@@ -113,3 +500,107 @@ class InterBeatInterval:
         ibi_df.time = ibi_df.time.astype(int)
 
         return ibi_df
+
+
+class SignalChunk(NamedTuple):
+    """
+    A chunk of consecutive samples of a signal.
+
+    :ivar first_sample: int, The index of the first sample of the chunk in the recording.
+    :ivar time: np.ndarray, The Unix timestamps of the samples (float64).
+    :ivar values: np.ndarray, The samples with one column per column of the signal (float64).
+    :ivar sample_rate: float, The sample rate of the signal in Hz.
+    """
+    first_sample: int
+    time: np.ndarray
+    values: np.ndarray
+    sample_rate: float
+
+
+class SignalSeries:
+    """
+    Streamed access to the sampled signals of a student (see `SIGNALS`) for the different term periods.
+
+    The files of the Empatica wristband start with a header of two lines: the Unix time of the
+    first sample and the sample rate in Hz, repeated for every column. Every further line holds
+    one sample. The timestamps aren't stored in the file, they are derived from the header for
+    every chunk.
+
+    :ivar path: str, The directory path where the term folders of the student reside.
+    :ivar archive: DatasetArchive or None, The archive containing the directory, if the data isn't extracted.
+
+    :param temp_dir: str, Directory path of the student containing the term folders.
+    :param archive: DatasetArchive, Optional. If given, `temp_dir` is a path inside this archive.
+    """
+
+    __slots__ = ('path', 'archive')
+
+    def __init__(self, temp_dir, archive: DatasetArchive = None):
+        self.path = temp_dir
+        self.archive = archive
+
+    def file_path(self, term: str, signal: str) -> str:
+        """
+        Return the path of the file of a signal and term.
+
+        :param term: str, should be one of {'final', 'mid1', 'mid2'}.
+        :param signal: str, should be one of `SIGNALS`.
+        :return: str, The path of the file.
+
+        :raise ValueError: Raised if `term` or `signal` is not one of the allowed options.
+        """
+        if term not in InterBeatInterval.term_folders:
+            raise ValueError(f'The passed string have to be one of the following: {list(InterBeatInterval.term_folders)}')
+        if signal not in SIGNALS:
+            raise ValueError(f'The passed signal have to be one of the following: {list(SIGNALS)}')
+        return os.path.join(self.path, InterBeatInterval.term_folders[term], signal + '.csv')
+
+    def chunks(self, term: str, signal: str, chunk_size: int = CHUNK_SIZE) -> Generator[SignalChunk, None, None]:
+        """
+        Read the samples of a signal and term in chunks, the file is kept open until all chunks are read.
+
+        :param term: str, should be one of {'final', 'mid1', 'mid2'}.
+        :param signal: str, should be one of `SIGNALS`.
+        :param chunk_size: int, Maximum number of samples per chunk.
+        :yield: SignalChunk, The consecutive chunks of the recording.
+        """
+        with open_file(self.file_path(term, signal), self.archive) as file:
+            yield from self.parse_chunks(file, len(SIGNALS[signal]), chunk_size)
+
+    @staticmethod
+    def read_header(file: BinaryIO) -> Tuple[float, float]:
+        """
+        Read the header of a signal file.
+
+        :param file: BinaryIO, The opened file, positioned at its start.
+        :return: tuple(float, float), The Unix time of the first sample and the sample rate in Hz.
+        """
+        start_time = float(file.readline().decode('utf-8-sig').split(',')[0])
+        sample_rate = float(file.readline().decode('utf-8').split(',')[0])
+        return start_time, sample_rate
+
+    @staticmethod
+    def parse_chunks(file: BinaryIO, n_columns: int, chunk_size: int = CHUNK_SIZE) -> Generator[SignalChunk, None, None]:
+        """
+        Parse an opened signal file in chunks.
+
+        :param file: BinaryIO, The opened file, positioned at its start.
+        :param n_columns: int, The number of columns of the signal.
+        :param chunk_size: int, Maximum number of samples per chunk.
+        :yield: SignalChunk, The consecutive chunks of the recording, none if it has no samples.
+        """
+        start_time, sample_rate = SignalSeries.read_header(file)
+        first_sample = 0
+        try:
+            reader = pd.read_csv(file, header=None, names=range(n_columns), dtype=np.float64, na_filter=False,
+                                 engine='c', chunksize=chunk_size)
+        except pd.errors.EmptyDataError:
+            return
+        with reader:
+            for chunk in reader:
+                values = chunk.to_numpy()
+                if len(values) == 0:
+                    continue
+                time = start_time + np.arange(first_sample, first_sample + len(values)) / sample_rate
+                yield SignalChunk(first_sample, time, values, sample_rate)
+                first_sample += len(values)
@@ -0,0 +1,188 @@
+"""
+Export Module
+-------------------
+
+This module writes the processed data as columnar Parquet files besides the database, so bulk
+analyses read only the needed columns and partitions of a table instead of querying the whole
+table with `pd.read_sql`.
+
+The tables inter_beat_interval, master_data and window_values are written per student and term
+straight from the arrays of the calculation (`main.TermResult`), partitioned by term and student
+in the layout of Hive:
+
+    <root>/<table>/term=<term>/student=<student>/part-0.parquet
+
+The columns are those of the tables of the database without the ids of the student and the term,
+which are given by the partition. Other than in the table window_values, the HRV parameters of a
+window are stored in one column per parameter of `hrv.HRV_PARAMETERS`, so a parameter is read
+without the others. Windows with less than `MIN_IBI` intervals are skipped like in the database.
+A file is replaced as a whole, so the incremental mode replaces the files of the changed terms.
+It is written into a hidden temporary file first, which is ignored when the tables are read.
+After a full run, the partitions of students which weren't written are removed by `prune`.
+
+The export needs the optional package pyarrow.
+
+Usage:
+    export = ParquetExport('export')
+    process_data(temp_dir, backend, export=export)
+    windows = read_table('export', 'window_values', columns=['timestamp', 'rmssd'], term='final')
+
+:Modul: export
+:Author: Benjamin Gaube
+:Date: 2023-10-12
+"""
+
+import os
+import shutil
+import tempfile
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency, only needed by the export
+    pa = pq = None
+
+from src.hrv import HRV_PARAMETERS
+from src.storage import TERMS
+
+EXPORT_TABLES = ['inter_beat_interval', 'master_data', 'window_values']
+MASTER_COLUMNS = ['grade', 'nni_mean', 'sdnn', 'number_of_ibi', 'duration_in_h']
+MIN_IBI = 3  # windows with less intervals are skipped, see `StorageBackend.insert_windows`
+
+
+def _require_pyarrow() -> None:
+    if pq is None:
+        raise ImportError('The Parquet export needs the package pyarrow (pip install pyarrow).')
+
+
+class ParquetExport:
+    """
+    Writer of the Parquet files of the processed data, partitioned by term and student.
+
+    :ivar root: str, The directory of the export.
+    :ivar compression: str, The compression codec of the files, e.g. 'snappy' or 'zstd'.
+
+    :param root: str, The directory of the export, which is created if it doesn't exist.
+    :param compression: str, The compression codec of the files.
+    :raise ImportError: If pyarrow isn't installed.
+    """
+
+    def __init__(self, root: str, compression: str = 'snappy'):
+        _require_pyarrow()
+        self.root = root
+        self.compression = compression
+        os.makedirs(root, exist_ok=True)
+
+    def partition(self, table: str, term: str, student: str) -> str:
+        """
+        Return the directory of a partition.
+
+        :param table: str, One of `EXPORT_TABLES`.
+        :param term: str, One of `TERMS`.
+        :param student: str, The identifier of the student, e.g. 'S1'.
+        :return: str, The directory of the files of the partition.
+        """
+        return os.path.join(self.root, table, f'term={term}', f'student={student}')
+
+    def write(self, table: str, term: str, student: str, columns: Dict[str, np.ndarray]) -> None:
+        """
+        Write the columns of a partition into a new file, which replaces the existing one.
+
+        :param table: str, One of `EXPORT_TABLES`.
+        :param term: str, One of `TERMS`.
+        :param student: str, The identifier of the student, e.g. 'S1'.
+        :param columns: Dict[str, np.ndarray], Mapping of the column names to arrays of the same length.
+        """
+        directory = self.partition(table, term, student)
+        os.makedirs(directory, exist_ok=True)
+        # pyarrow skips files starting with '.' or '_', so a file in progress is never read
+        handle, temp_path = tempfile.mkstemp(prefix='.', suffix='.tmp', dir=directory)
+        os.close(handle)
+        try:
+            pq.write_table(pa.table({name: np.asarray(values) for name, values in columns.items()}),
+                           temp_path, compression=self.compression)
+            os.replace(temp_path, os.path.join(directory, 'part-0.parquet'))
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def write_student(self, result) -> int:
+        """
+        Write the tables of all terms of a processed student.
+
+        :param result: main.StudentResult, The processed data of the student.
+        :return: int, Number of written files.
+        """
+        n_files = 0
+        for term_result in result.terms:
+            term = TERMS[term_result.term_id - 1]
+            self.write('inter_beat_interval', term, result.student_id, {
+                'ibi_value_id': np.arange(1, len(term_result.interval) + 1, dtype=np.int32),
+                'ibi_value': term_result.interval,
+                'timestamp': term_result.time})
+
+            self.write('master_data', term, result.student_id,
+                       {name: np.array([value]) for name, value in zip(MASTER_COLUMNS, term_result.master)})
+
+            windows = term_result.windows
+            stored = windows['number_of_ibi'] >= MIN_IBI
+            self.write('window_values', term, result.student_id, {
+                'window_spec_id': windows['window_spec_id'][stored].astype(np.int16),
+                'window_id': windows['window_id'][stored].astype(np.int32),
+                'timestamp': windows['time'][stored],
+                'number_of_ibi': windows['number_of_ibi'][stored].astype(np.int32),
+                **{parameter: windows[parameter][stored] for parameter in HRV_PARAMETERS}})
+            n_files += len(EXPORT_TABLES)
+        return n_files
+
+    def prune(self, students: Iterable[str]) -> int:
+        """
+        Remove the partitions of all other students and the temporary files left by interrupted runs.
+
+        :param students: Iterable[str], The identifiers of the students which are kept, e.g. those written by a full run.
+        :return: int, Number of removed partitions.
+        """
+        keep = {f'student={student}' for student in students}
+        removed = 0
+        for table in EXPORT_TABLES:
+            for term in TERMS:
+                term_dir = os.path.join(self.root, table, f'term={term}')
+                if not os.path.isdir(term_dir):
+                    continue
+                for name in os.listdir(term_dir):
+                    if name.startswith('student=') and name not in keep:
+                        shutil.rmtree(os.path.join(term_dir, name))
+                        removed += 1
+                    elif name in keep:
+                        for file_name in os.listdir(os.path.join(term_dir, name)):
+                            if file_name.startswith('.') and file_name.endswith('.tmp'):
+                                os.remove(os.path.join(term_dir, name, file_name))
+        return removed
+
+
+def read_table(root: str, table: str, columns: List[str] = None, term: str = None,
+               student: str = None) -> pd.DataFrame:
+    """
+    Read a table of the export, only the given columns and partitions.
+
+    :param root: str, The directory of the export.
+    :param table: str, One of `EXPORT_TABLES`.
+    :param columns: List[str], Optional. The columns to be read. Default is None, meaning all columns.
+        The partition columns 'term' and 'student' can be read like the other columns.
+    :param term: str, Optional. Only the partitions of this term are read.
+    :param student: str, Optional. Only the partitions of this student are read.
+    :return: pd.DataFrame, The rows of the partitions.
+    :raise ImportError: If pyarrow isn't installed.
+    :raise ValueError: If `table` isn't one of `EXPORT_TABLES`.
+    """
+    _require_pyarrow()
+    if table not in EXPORT_TABLES:
+        raise ValueError(f'The table has to be one of {EXPORT_TABLES}, not {table!r}.')
+
+    filters = [(name, '=', value) for name, value in [('term', term), ('student', student)] if value is not None]
+    return pq.read_table(os.path.join(root, table), columns=columns, filters=filters or None,
+                         partitioning='hive').to_pandas()
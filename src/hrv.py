@@ -0,0 +1,136 @@
+"""
+HRV Module
+-------------------
+
+This module provides the registry of the HRV parameters calculated for the 5-minute moving
+windows and the kernel calculating all of them for all windows of a term at once.
+
+The order of `HRV_PARAMETERS` defines the id of a parameter in the table hrv, so new
+parameters have to be appended. Every parameter of the registry has to be returned by
+`window_parameters`.
+
+Count, sums and successive differences of the windows are taken from prefix sums over the
+whole term, the order statistics from padded matrices with a row per window. So the cost
+of a further parameter is one more vectorized operation over all windows, not one more
+reduction per window.
+
+RMSSD and pNN50 only use successive differences of contiguous beats, i.e. of two intervals
+without missing beats between them (see `estimate_contiguity`), because the recordings contain
+many gaps (see `main.calculate_hrv`).
+
+:Modul: hrv
+:Author: Benjamin Gaube
+:Date: 2023-10-12
+"""
+
+from typing import Dict
+
+import numpy as np
+
+MATRIX_SIZE = 2 ** 16  # entries of a padded matrix of the order statistics
+
+# name (at most 15 characters) and description, the order defines the parameter_id
+HRV_PARAMETERS = {
+    'nni_mean': 'mean of the intervals in ms',
+    'sdnn': 'standard deviation of the intervals in ms',
+    'rmssd': 'root mean square of the successive differences of contiguous intervals in ms',
+    'pnn50': 'share of successive differences of contiguous intervals above 50 ms in %',
+    'nni_min': 'shortest interval in ms',
+    'nni_max': 'longest interval in ms',
+    'nni_median': 'median of the intervals in ms',
+}
+
+
+def estimate_contiguity(time: np.ndarray, interval: np.ndarray) -> np.ndarray:
+    """
+    Estimate which intervals directly follow the previous one, if only the timestamps in full seconds are known.
+
+    An interval follows the previous one, if it starts where the previous one ends. With
+    timestamps truncated to full seconds, a gap shorter than a second can't be detected.
+    `InterBeatInterval.parse_file` determines the contiguity exactly from the original file.
+
+    :param time: np.ndarray, The Unix timestamps of the start of the intervals in full seconds.
+    :param interval: np.ndarray, The inter-beat intervals in ms.
+    :return: np.ndarray, For every interval whether it follows the previous one (False for the first).
+    """
+    time = np.asarray(time, dtype=np.int64)
+    interval = np.asarray(interval, dtype=np.int64)
+    contiguous = np.zeros(len(time), dtype=bool)
+    contiguous[1:] = np.diff(time) <= interval[:-1] // 1000 + 1
+    return contiguous
+
+
+def window_parameters(intervals: np.ndarray, contiguous: np.ndarray, lower: np.ndarray,
+                      upper: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Calculate all parameters of `HRV_PARAMETERS` for all windows of a term.
+
+    The values are rounded to two decimals like `main.calculate_hrv`. Values which can't be
+    calculated, e.g. of a window without intervals or RMSSD of a window without contiguous
+    intervals, are NaN. The rounded values are identical to the per-window calculation: windows
+    whose SDNN lies close to a rounding edge are recalculated with `np.std`.
+
+    :param intervals: np.ndarray, The inter-beat intervals of the term in ms.
+    :param contiguous: np.ndarray, For every interval whether it follows the previous one.
+    :param lower: np.ndarray, The index of the first interval of each window.
+    :param upper: np.ndarray, The index after the last interval of each window.
+    :return: Dict[str, np.ndarray], One array per parameter with one entry per window.
+    """
+
+    intervals = np.asarray(intervals, dtype=np.int64)
+    contiguous = np.asarray(contiguous, dtype=bool)
+    count = upper - lower
+
+    sum_1 = np.concatenate(([0], np.cumsum(intervals)))
+    sum_2 = np.concatenate(([0], np.cumsum(intervals * intervals)))
+    window_sum = sum_1[upper] - sum_1[lower]
+    window_sum_2 = sum_2[upper] - sum_2[lower]
+
+    # the successive difference to the previous interval is stored at the later one,
+    # so a window contains the differences of all its intervals but the first
+    differences = np.diff(intervals, prepend=intervals[:1])
+    valid = contiguous & (np.arange(len(intervals)) > 0)
+    pairs = np.concatenate(([0], np.cumsum(valid)))
+    squares = np.concatenate(([0], np.cumsum(np.where(valid, differences * differences, 0))))
+    above_50 = np.concatenate(([0], np.cumsum(valid & (np.abs(differences) > 50))))
+    second = np.minimum(lower + 1, upper)
+    window_pairs = pairs[upper] - pairs[second]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        nni_mean = window_sum / count
+        # exact integer numerator: n * sum(x^2) - sum(x)^2
+        sdnn = np.sqrt((count * window_sum_2 - window_sum * window_sum) / (count * count.astype(float)))
+        rmssd = np.sqrt((squares[upper] - squares[second]) / window_pairs)
+        pnn50 = 100 * ((above_50[upper] - above_50[second]) / window_pairs)
+
+    # mean, RMSSD and pNN50 are the same float operations on the same exact sums as the
+    # per-window calculation; only SDNN isn't, so values close to x.xx5 may round differently
+    # than np.std and are recalculated
+    scaled = sdnn * 100
+    on_edge = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    for k in on_edge:
+        sdnn[k] = np.std(intervals[lower[k]:upper[k]], ddof=0)
+
+    # order statistics from sorted matrices with a row per window, padded with infinity;
+    # windows of similar size (up to the next power of two) share a matrix, so windows of
+    # different lengths aren't padded to the longest one
+    nni_min, nni_max, nni_median = (np.full(len(count), np.nan) for _ in range(3))
+    size_class = np.ceil(np.log2(np.maximum(count, 1))).astype(int)
+    for size in np.unique(size_class[count > 0]):
+        class_rows = np.flatnonzero((size_class == size) & (count > 0))
+        width = count[class_rows].max()
+        # matrices of at most MATRIX_SIZE entries stay in the cache, also for many windows
+        chunk = max(1, MATRIX_SIZE // width)
+        for rows in np.split(class_rows, np.arange(chunk, len(class_rows), chunk)):
+            index = lower[rows, None] + np.arange(width)
+            matrix = np.where(index < upper[rows, None], intervals[np.minimum(index, len(intervals) - 1)], np.inf)
+            matrix.sort(axis=1)
+            row_count = count[rows]
+            last = np.arange(len(rows))
+            nni_min[rows] = matrix[:, 0]
+            nni_max[rows] = matrix[last, row_count - 1]
+            nni_median[rows] = (matrix[last, (row_count - 1) // 2] + matrix[last, row_count // 2]) / 2
+
+    parameters = {'nni_mean': nni_mean, 'sdnn': sdnn, 'rmssd': rmssd, 'pnn50': pnn50,
+                  'nni_min': nni_min, 'nni_max': nni_max, 'nni_median': nni_median}
+    return {name: parameters[name].round(2) for name in HRV_PARAMETERS}
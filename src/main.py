@@ -15,10 +15,17 @@ developed for this purpose.
 
 Main Functions:
 - `unzip_data()`: Extracts data of the zip-file into temporary directory
+- `stream_data()`: Provides the data of the zip-file without extracting it
 - `student_factory()`: Generator providing student-objects
 - `calculate_hrv()`: simple hrv-calculations (mean_nni and sdnn)
+- `compute_term()`: Calculates all values of one term of a student, which are stored in the database
+- `load_student()`: Reads the IBI data of a student
+- `compute_student()`: Calculates all values of a student, which are stored in the database
+- `write_student()`: Writes the calculated values of a student into the database
+- `write_signals()`: Streams the sampled signals of a student into the database
 - `process_data()`: Use the in this package provided functionality to process the data
-                    and store them into the database
+                    and store them into the database, optionally with several worker processes
+                    or as pipeline of threads
 
 Usage:
     The used Data is free access and available on `https://www.physionet.org/content/wearable-exam-stress/1.0.0/`.
@@ -28,12 +35,24 @@ Usage:
     A local MySQl server has to run. For this purpose I used XAMPP (https://www.apachefriends.org/de/index.html)
     with the default Settings (localhost Port `3306`, no password and user `root`).
     The necessary schema will automatically be created while running this code.
+    Alternatively the data can be stored in an embedded SQLite database by passing
+    `--sqlite PATH`, which needs no server.
+    With `--reload`, all data is replaced without asking. The data is loaded into staging
+    tables, which replace the tables at once after the load.
 
 Contained Modules:
 - `student.py`: Provides a student-object with all necessary information.
 - `event_series.py`: Provides a further object which is used as attribute of Student
-- `sql_database.py`: Provides the schema of the developed database and a contextmanager
-                     for the connection to localhost.
+- `archive.py`: Provides read access to the files inside the zip-file
+- `sql_database.py`: Provides the schema of the developed database, a contextmanager
+                     for the connection to localhost and a pool of reusable connections.
+- `storage.py`: Provides the interface to the database and implementations for MySQL and SQLite.
+- `sql_query.py`: Provides the read access to the stored data for the analysis as NumPy arrays.
+- `analysis.py`: Provides the analyses of the notebook as vectorized functions over the stored tables.
+- `export.py`: Writes the processed data as Parquet files partitioned by term and student.
+- `cache.py`: Provides the on-disk cache of the parsed IBI files as memory-mapped arrays.
+- `codec.py`: Provides the compact binary format of the IBI series in the table ibi_series.
+- `synthetic.py`: Generates zip-files with the layout of the dataset and random data for tests and benchmarks.
 
 :Author: Benjamin Gaube
 :Date: 2023-10-12
@@ -41,28 +60,34 @@ Contained Modules:
 
 
 import os
+import zlib
 import zipfile
 import tempfile
 import datetime as dt
-import timeit
-from typing import Generator, Tuple
+import argparse
+import queue
+import threading
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Generator, Tuple, Dict, NamedTuple, Callable, Iterable, Iterator, Sequence
 
-import mysql.connector
 import numpy as np
 
 from src.student import Student
-from src.sql_database import create_schema, connect_to_localhost
-from src.event_series import InterBeatInterval
+from src.archive import DatasetArchive, list_dir, file_fingerprint
+from src.cache import ArrayCache, CACHE_SIZE
+from src.export import ParquetExport
+from src.storage import StorageBackend, MySQLBackend, SQLiteBackend, TERMS, IBI_STORAGE_MODES
+from src.event_series import InterBeatInterval, SignalSeries, SIGNALS, WINDOW_SPECS, DEFAULT_WINDOW_SPECS
+from src.metrics import collect, timed, profiled, RunMetrics, ProgressReporter
 
 directory = r'C:\tests'  # TODO Enter the path to the downloaded zip-File here.
 schema = 'application_project_gaube'
 FILENAME = r'a-wearable-exam-stress-dataset-for-predicting-cognitive-performance-in-real-world-settings-1.0.0'
 
 
-def clear():
-    os.system('cls' if os.name == 'nt' else 'clear')
-
-
 def unzip_it(zip_path: str, extract_to: str) -> None:
     """
     Extracts the contents of a zip file to a specified location.
@@ -115,17 +140,45 @@ def unzip_data(main_zip_path: str, func: callable = None) -> None:
             raise
 
 
-def generator_length(temp_dir: str) -> int:
+def stream_data(main_zip_path: str, func: callable = None) -> None:
+    """
+    Opens the zip file without extracting it and optionally applies a function to it.
+
+    In contrast to `unzip_data`, nothing is written to disk. The files are read directly
+    out of the zip file, when they are needed (see `archive.DatasetArchive`).
+
+    :param main_zip_path: str, The path to the main zip file.
+    :param func: callable, An optional function to apply to the data. It is called with
+        the root path '' of the data inside the archive and the keyword argument `archive`.
+        Default is None, meaning no function will be applied.
+    :return: None
+    """
+
+    try:
+        with DatasetArchive(main_zip_path) as archive:
+            print('Successfully opened zip-File')
+
+            if func is not None:
+                func('', archive=archive)
+
+    except FileNotFoundError:
+        print(f'invalid path given: {main_zip_path}. Code has not executed.')
+        raise
+
+
+def generator_length(temp_dir: str, archive: DatasetArchive = None) -> int:
     """
     Get the length of the generator object provided by student_factory().
 
     :param temp_dir: str, The path to the temporary directory containing the data.
+    :param archive: DatasetArchive, Optional. If given, `temp_dir` is a path inside this archive.
     :return: int, Length of the generator.
     """
-    return len(os.listdir(os.path.join(temp_dir, 'Data')))
+    return len(list_dir(os.path.join(temp_dir, 'Data'), archive))
 
 
-def student_factory(temp_dir: str) -> Generator[Student, None, None]:
+def student_factory(temp_dir: str, archive: DatasetArchive = None,
+                    cache: ArrayCache = None) -> Generator[Student, None, None]:
     """
     Creates a generator yielding Student objects.
 
@@ -133,11 +186,14 @@ def student_factory(temp_dir: str) -> Generator[Student, None, None]:
     by traversing through the student data located in the specified temporary directory.
 
     :param temp_dir: str, The path to the temporary directory containing the data.
+    :param archive: DatasetArchive, Optional. If given, `temp_dir` is a path inside this archive.
+    :param cache: ArrayCache, Optional. The cache of the parsed IBI files of the students.
     :yield: Student, Yields Student objects.
     """
 
-    students_list = os.listdir(os.path.join(temp_dir, 'Data'))
-    students_grades = Student.extract_grades(os.path.join(temp_dir, 'StudentGrades.txt'))
+    # natural order (S1, S2, ..., S10), so the ids in the database are reproducible
+    students_list = sorted(list_dir(os.path.join(temp_dir, 'Data'), archive), key=lambda name: (len(name), name))
+    students_grades = Student.extract_grades(os.path.join(temp_dir, 'StudentGrades.txt'), archive)
     term_keys = [key for key in students_grades]
 
     for student_id in students_list:
@@ -148,7 +204,7 @@ def student_factory(temp_dir: str) -> Generator[Student, None, None]:
             students_grades[term_keys[2]][student_id]
         ]
 
-        yield Student(os.path.join(temp_dir, 'Data'), student_id, tuple(grades))
+        yield Student(os.path.join(temp_dir, 'Data'), student_id, tuple(grades), archive, cache)
 
 
 def calculate_hrv(hrv_array: np.array) -> Tuple[float, float]:
@@ -162,6 +218,8 @@ def calculate_hrv(hrv_array: np.array) -> Tuple[float, float]:
     calculate frequency-based parameters (e.g., High Frequency - Low Frequency Ratio).
     Furthermore, evaluating persistence with Detrended Fluctuation Analysis or other
     nonlinear methods will not lead to consistent data.
+    The 5-minute windows get further parameters (see `hrv.HRV_PARAMETERS`), where RMSSD and
+    pNN50 only use successive differences of contiguous beats.
 
     :param hrv_array: np.array, Array containing inter beat intervals.
     :yield: tuple(float, float), Returning the mean nni and the SDNN.
@@ -170,113 +228,523 @@ def calculate_hrv(hrv_array: np.array) -> Tuple[float, float]:
     return np.mean(hrv_array).round(2), np.std(hrv_array, ddof=0).round(2)
 
 
-def process_data(temp_dir: str):
+class TermResult(NamedTuple):
     """
-    Process student and HRV data from a ZIP file and store structured Data into an SQL database.
+    Processed data of one student and one term, ready to be written into the database.
+
+    :ivar term_id: int, The id of the term in the table exam (position in `TERMS` + 1).
+    :ivar interval: np.ndarray, The inter-beat intervals in ms.
+    :ivar time: np.ndarray, The Unix timestamps of the intervals.
+    :ivar master: Tuple, The values of master_data (grade, nni_mean, sdnn, number_of_ibi, duration_in_h).
+    :ivar exam_window: Dict[str, float], The aggregated intervals of the exam period (see `exam_window`).
+    :ivar windows: Dict[str, np.ndarray], The columnar results of `moving_windows_hrv`.
+    :ivar segments: Dict[str, np.ndarray], The segments of contiguous beats (see `segments`).
+    """
+    term_id: int
+    interval: np.ndarray
+    time: np.ndarray
+    master: Tuple[int, float, float, int, float]
+    exam_window: Dict[str, float]
+    windows: Dict[str, np.ndarray]
+    segments: Dict[str, np.ndarray]
 
-    :param temp_dir: str, The path to the temporary directory containing the data.
+
+class StudentResult(NamedTuple):
+    """
+    Processed data of one student: the student identifier, one TermResult per processed term,
+    the fingerprints of the input data of these terms by term_id (empty if unknown) and the
+    durations of the stages of the calculation in seconds (see `metrics`).
     """
+    student_id: str
+    terms: Tuple[TermResult, ...]
+    fingerprints: Dict[int, str]
+    timings: Dict[str, float]
 
-    # TODO
-    expected_iterations = generator_length(temp_dir)
-    start_dt = dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    start_t = timeit.default_timer()
-    error_count = 0
-    terms = ['mid1', 'mid2', 'final']
 
-    gen = student_factory(temp_dir)
+def compute_term(ibi_df, term: str, grade: int, window_specs: Sequence[str] = DEFAULT_WINDOW_SPECS) -> TermResult:
+    """
+    Calculate all values of one term of a student, which are stored in the database.
 
-    for i, stud in enumerate(gen):
+    :param ibi_df: IBISeries or pd.DataFrame, The IBI data of the term (see `InterBeatInterval`).
+    :param term: str, The key of the term, one of `TERMS`.
+    :param grade: int, The grade of the student in this term.
+    :param window_specs: Sequence[str], The moving windows to be calculated, see `event_series.WINDOW_SPECS`.
+    :return: TermResult, The compact results of the term.
+    """
 
-        clear()
-        print(f'Calculation of {expected_iterations} datasets started: {start_dt}')
-        print(f'Actually in the {i + 1} run. Processing data of student: {stud.student_id}')
-        print(f'Calculation to {round(i / expected_iterations * 100, 2)}% completed.')
-        time_per_ds = 'unknown' if i < 2 else (timeit.default_timer() - start_t) / i
-        if i >= 2:
-            print(f'estimated time remaining: {round((time_per_ds * (expected_iterations - i)) / 60, 2)} min')
-        print(f'{error_count} errors occurred')
-        
-        # open database connection with context manager
-        with connect_to_localhost(schema) as db:
-            cursor = db.cursor()
+    ibi_array = np.asarray(ibi_df.interval)
+    time_array = np.asarray(ibi_df.time)
 
-            try:
-                # add student to db
-                try:
-                    # if the student doesn't exist: write student
-                    cursor.execute('INSERT INTO dataset (student) VALUES (%s)', (stud.student_id,))
-                    cursor.execute('SELECT LAST_INSERT_ID()')
-                    last_id = cursor.fetchone()[0]
-                except mysql.connector.IntegrityError as e:
-                    # if the student already in db: rewrite student
-                    if 'Duplicate entry' in str(e):
-                        print(f'Duplicate entry {stud.student_id} for key student detected. Deleting...')
-                        cursor.execute(f"DELETE FROM dataset WHERE student = '{stud.student_id}'")
-                        db.commit()
-                        print(f'Successfully deleted {stud.student_id}. Rewriting...')
-                        cursor.execute('INSERT INTO dataset (student) VALUES (%s)', (stud.student_id,))
-
-                        cursor.execute('SELECT LAST_INSERT_ID()')
-                        last_id = cursor.fetchone()[0]
-                    else:
-                        raise
-            except Exception as e:
-                with open(os.path.join(directory, 'error_log.txt'), 'a') as file:
-                    error_time = dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    file.write(f'Error in {stud.student_id} at {error_time}:\n {e}')
-                    file.write('\n\n')
-                continue
+    duration = round((time_array[-1] - time_array[0]) / 3600, 2)  # recording duration in hours
+    with timed('calculate_hrv'):
+        nni_mean, sdnn = calculate_hrv(ibi_array)
+    master = (grade, float(nni_mean), float(sdnn), len(ibi_array), float(duration))
+
+    with timed('windowing'):
+        exam_window = InterBeatInterval.exam_window(ibi_df, term)
+        windows = InterBeatInterval.moving_windows_hrv(ibi_df, term, window_specs)
+        segments = InterBeatInterval.segments(ibi_df)
+    return TermResult(TERMS.index(term) + 1, ibi_array, time_array, master, exam_window, windows, segments)
+
+
+def load_student(stud: Student, fingerprints: Dict[int, str] = None) -> Tuple[Student, Dict[int, str], Dict[str, float]]:
+    """
+    Read the IBI data of the terms of a student, which are processed by `compute_student`.
+
+    :param stud: Student, The student to be processed.
+    :param fingerprints: Dict[int, str], Optional. The fingerprints of the terms to be processed
+        by term_id. Default is None, meaning all terms are read.
+    :return: tuple(Student, Dict[int, str], Dict[str, float]), The student with the loaded IBI data,
+        the fingerprints and the durations of the reading, i.e. the arguments of `compute_student`.
+    """
+
+    with collect() as timings:
+        stud.ibi = stud.path
+        for j, term in enumerate(TERMS, start=1):
+            if fingerprints is None or j in fingerprints:
+                stud.ibi.series(term)
 
-            # set ibi object for student
+    return stud, fingerprints, timings
+
+
+def term_fingerprint(stud: Student, term: str, window_specs: Sequence[str] = DEFAULT_WINDOW_SPECS,
+                     signals: Sequence[str] = ()) -> str:
+    """
+    Return the fingerprint of a term recorded in the ingestion ledger: the fingerprint of the input
+    data (see `Student.fingerprint`), the window specs, if they aren't the default, and the stored
+    signals with the fingerprints of their files, if any are stored. To fit into the ledger, the
+    part of the signals is condensed into a CRC-32 checksum.
+
+    :param stud: Student, The student.
+    :param term: str, One of `TERMS`.
+    :param window_specs: Sequence[str], The moving windows stored in window_values.
+    :param signals: Sequence[str], The sampled signals stored besides the IBI data, see `event_series.SIGNALS`.
+    :return: str, The fingerprint.
+    """
+    fingerprint = stud.fingerprint(term)
+    if tuple(window_specs) != DEFAULT_WINDOW_SPECS:
+        fingerprint += '-' + '+'.join(window_specs)
+    if signals:
+        folder = os.path.join(stud.path, InterBeatInterval.term_folders[term])
+        available = list_dir(folder, stud.archive)
+        files = [f'{signal}:' + (file_fingerprint(os.path.join(folder, signal + '.csv'), stud.archive)
+                                 if signal + '.csv' in available else '')
+                 for signal in sorted(signals)]
+        fingerprint += f'-s{zlib.crc32(";".join(files).encode()):08x}'
+    return fingerprint
+
+
+def compute_student(stud: Student, fingerprints: Dict[int, str] = None, timings: Dict[str, float] = None,
+                    window_specs: Sequence[str] = DEFAULT_WINDOW_SPECS,
+                    fingerprint: Callable[[Student, str], str] = None) -> StudentResult:
+    """
+    Read the IBI data of a student and calculate all values to be stored in the database.
+
+    The function doesn't touch the database, so it can run in a worker process.
+    The durations of the stages are measured and returned with the results.
+    The IBI data of a term is read just before it is processed, unless it is already loaded
+    by `load_student`, and released afterwards.
+
+    :param stud: Student, The student to be processed.
+    :param fingerprints: Dict[int, str], Optional. The fingerprints of the terms to be processed
+        by term_id. Default is None, meaning all terms are processed.
+    :param timings: Dict[str, float], Optional. The durations of previous stages of the student,
+        which are continued.
+    :param window_specs: Sequence[str], The moving windows to be calculated, see `event_series.WINDOW_SPECS`.
+    :param fingerprint: Callable[[Student, str], str], Optional. If given and `fingerprints` is None,
+        the fingerprints of all terms are calculated with it, each just after the term is read,
+        e.g. `term_fingerprint`. Default is None, meaning the fingerprints are unknown.
+    :return: StudentResult, The compact results of the processed terms.
+    """
+
+    if fingerprints is None and fingerprint is not None:
+        fingerprints, lazy = {}, True
+    else:
+        lazy = False
+
+    with collect(timings) as timings:
+        # set ibi object for student, if the data isn't loaded yet
+        if stud.ibi is None:
             stud.ibi = stud.path
 
-            # process data and store it into db
-            for j, term in enumerate(terms, start=1):
-                ibi_df = getattr(stud.ibi, term)
+        terms = []
+        for j, term in enumerate(TERMS, start=1):
+            if fingerprints is not None and not lazy and j not in fingerprints:
+                continue
+
+            terms.append(compute_term(stud.ibi.series(term), term, stud.grades[j - 1], window_specs))
+            if lazy:
+                # an extracted file was just read, so its checksum is calculated from the page cache
+                with timed('read_file'):
+                    fingerprints[j] = fingerprint(stud, term)
+            stud.ibi.release(term)
 
-                # fill table inter_beat_interval
-                for value_id, row in ibi_df.iterrows():
-                    cursor.execute(
-                        'INSERT INTO inter_beat_interval (student_id, term_id, ibi_value_id, ibi_value, timestamp) '
-                        'VALUES (%s, %s, %s, %s, %s)', (last_id, j, value_id + 1, int(row[1]), int(row[0]))
-                    )
-                db.commit()
+    return StudentResult(stud.student_id, tuple(terms), fingerprints or {}, timings)
 
-                # process data
-                duration = round((ibi_df.time.iloc[-1] - ibi_df.time.iloc[0]) / 3600, 2)  # recording duration in hours
-                ibi_array = np.array(ibi_df.interval)
-                nni_mean, sdnn = calculate_hrv(ibi_array)
-                insert_into_master = (last_id, j, stud.grades[j - 1], float(nni_mean),
-                                      float(sdnn), len(ibi_array), float(duration))
 
-                # fill table master_data
-                cursor.execute('INSERT INTO master_data (student_id, term_id, grade, nni_mean, sdnn, '
-                               'number_of_ibi, duration_in_h) VALUES (%s, %s, %s, %s, %s, %s, %s)', insert_into_master)
-                db.commit()
+def _compute_task(task: Tuple, window_specs: Sequence[str] = DEFAULT_WINDOW_SPECS,
+                  fingerprint: Callable[[Student, str], str] = None) -> StudentResult:
+    """ unpack the arguments of compute_student, used as picklable function for the worker processes """
+    return compute_student(*task, window_specs=window_specs, fingerprint=fingerprint)
 
-                window_generator = InterBeatInterval.moving_5min_window(ibi_df, term)
 
-                for k, window_dic in enumerate(window_generator, start=1):
-                    ibi_num = len(window_dic['intervals'])
-                    if ibi_num < 3:
-                        continue
-                    hrv_parameters = calculate_hrv(window_dic['intervals'])
+def _load_task(task: Tuple[Student, Dict[int, str]]) -> Tuple[Student, Dict[int, str], Dict[str, float]]:
+    """ unpack the arguments of load_student """
+    return load_student(*task)
 
-                    for par_id, value in enumerate(hrv_parameters, start=1):
-                        # fill table window_values
-                        cursor.execute('INSERT INTO window_values (student_id, term_id, window_id, timestamp, '
-                                       'parameter_id, hrv_value, number_of_ibi) VALUES ( %s, %s, %s, %s, %s, %s, %s)',
-                                       (last_id, j, k, int(window_dic['time']), par_id, float(value), ibi_num))
 
-                db.commit()
-            db.commit()
+def write_student(backend: StorageBackend, cursor, student_id: int, result: StudentResult) -> None:
+    """
+    Insert the processed data of a student into the tables inter_beat_interval, ibi_segment,
+    master_data, exam_window and window_values and record the fingerprints of the written terms
+    in the ingestion ledger. The transaction is not committed.
+
+    :param backend: StorageBackend, The database the data is stored in.
+    :param cursor: The cursor of an open transaction of the backend.
+    :param student_id: int, The id of the student in the table dataset.
+    :param result: StudentResult, The processed data of the student.
+    """
+
+    for term_result in result.terms:
+        j = term_result.term_id
+        with timed('insert_ibi'):
+            backend.insert_ibi(cursor, student_id, j, term_result.interval, term_result.time)
+        with timed('insert_segments'):
+            backend.insert_segments(cursor, student_id, j, term_result.segments)
+        with timed('insert_master'):
+            backend.insert_master(cursor, student_id, j, term_result.master)
+        with timed('insert_exam_window'):
+            backend.insert_exam_window(cursor, student_id, j, term_result.exam_window)
+        with timed('insert_windows'):
+            backend.insert_windows(cursor, student_id, j, term_result.windows)
+
+        if j in result.fingerprints:
+            with timed('ledger'):
+                backend.record_fingerprint(cursor, student_id, j, result.fingerprints[j])
+
+
+def write_signals(backend: StorageBackend, cursor, student_id: int, series: SignalSeries,
+                  term_ids: Iterable[int], signals: Sequence[str]) -> None:
+    """
+    Insert the sampled signals of a student chunk by chunk into the tables of the signals.
+    Signals without file in a term folder are skipped. The transaction is not committed.
+
+    :param backend: StorageBackend, The database the data is stored in.
+    :param cursor: The cursor of an open transaction of the backend.
+    :param student_id: int, The id of the student in the table dataset.
+    :param series: SignalSeries, The signals of the student.
+    :param term_ids: Iterable[int], The ids of the terms to be inserted.
+    :param signals: Sequence[str], The names of the signals to be inserted, see `event_series.SIGNALS`.
+    """
+
+    for j in term_ids:
+        term = TERMS[j - 1]
+        available = list_dir(os.path.join(series.path, InterBeatInterval.term_folders[term]), series.archive)
+        for signal in signals:
+            if signal + '.csv' in available:
+                backend.insert_signal(cursor, student_id, j, signal, series.chunks(term, signal))
+
+
+def parallel_map(func: Callable, iterable: Iterable, workers: int) -> Iterator:
+    """
+    Apply a function to all items using a pool of worker processes and yield the results in order.
+
+    At most two tasks per worker are submitted in advance, so the items are consumed lazily
+    and finished results don't pile up if the consumer is slower than the workers.
+
+    :param func: Callable, A picklable function with one argument.
+    :param iterable: Iterable, The items to apply the function on.
+    :param workers: int, Number of worker processes.
+    :yield: The results of `func` in the order of the items.
+    """
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for item in iterable:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def threaded_map(func: Callable, iterable: Iterable, maxsize: int = 2) -> Iterator:
+    """
+    Apply a function to all items in a background thread and yield the results in order.
+
+    The results are passed through a queue of at most `maxsize` entries, so the thread works
+    ahead of the consumer, but not more than `maxsize` items. Chained calls build a pipeline
+    with one thread per stage. Exceptions of the thread are raised in the consumer. If the
+    consumer stops early, the thread (and the threads of the previous stages) stop as well.
+
+    :param func: Callable, A function with one argument.
+    :param iterable: Iterable, The items to apply the function on.
+    :param maxsize: int, Maximum number of results waiting for the consumer.
+    :yield: The results of `func` in the order of the items.
+    """
+
+    results = queue.Queue(maxsize)
+    stop = threading.Event()
+    done = object()
+
+    def put(entry) -> bool:
+        while not stop.is_set():
+            try:
+                results.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put((func(item), None)):
+                    return
+            put((done, None))
+        except BaseException as e:
+            put((None, e))
+        finally:
+            if hasattr(iterator, 'close'):
+                iterator.close()
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            result, error = results.get()
+            if error is not None:
+                raise error
+            if result is done:
+                return
+            yield result
+    finally:
+        stop.set()
+        thread.join()
+
+
+def process_data(temp_dir: str, backend: StorageBackend = None, workers: int = 1, archive: DatasetArchive = None,
+                 incremental: bool = False, metrics: RunMetrics = None, pipeline: bool = False,
+                 signals: Sequence[str] = (), window_specs: Sequence[str] = DEFAULT_WINDOW_SPECS,
+                 cache: ArrayCache = None, export: ParquetExport = None) -> RunMetrics:
+    """
+    Process student and HRV data from a ZIP file and store structured Data into an SQL database.
+
+    With more than one worker, the students are processed by a pool of worker processes,
+    while the results are written by this process in the order of `student_factory`,
+    so the ids of the students in the database don't depend on the number of workers.
+
+    As pipeline, the students are read by one thread and processed by a second thread, while
+    this thread writes the results, so reading, calculating and writing overlap. The stages are
+    connected by queues of two students (see `threaded_map`).
+
+    The sampled signals are read by this process while writing, chunk by chunk, so they are
+    neither held in memory as a whole nor sent to the worker processes.
+
+    The fingerprints of the input data of every student and term are recorded in the
+    ingestion ledger. In the incremental mode, students whose fingerprints didn't change
+    are skipped and only the changed terms of the other students are replaced. Other window specs
+    than the default and the stored signals with their files are part of the fingerprints
+    (see `term_fingerprint`), so a change of the specs or the signals replaces all terms and a
+    changed signal file replaces its term.
+    The fingerprint of a file in an archive is read from the directory of the zip-file. An extracted
+    file (also of a signal) is read once more for its checksum: in the incremental mode before the comparison, otherwise
+    by `compute_student` just after the file is parsed, so it is read from the page cache.
+
+    With a cache, the IBI files are parsed only if their fingerprint isn't in the cache yet, e.g. on
+    the first run with a new delivery, otherwise the parsed arrays are mapped from the cache.
+
+    With an export, the results of every student are also written as Parquet files, after the
+    transaction of the student is committed (see `export.ParquetExport`). Unless in the incremental
+    mode, the partitions of students which weren't written are removed from the export at the end.
+
+    :param temp_dir: str, The path to the temporary directory containing the data.
+    :param backend: StorageBackend, Optional. The database the data is stored in.
+        Default is None, meaning the hardcoded schema of the MySQL database on localhost is used.
+    :param workers: int, Number of worker processes calculating the data. Default is 1,
+        meaning everything is processed sequentially in this process.
+    :param archive: DatasetArchive, Optional. If given, `temp_dir` is a path inside this archive.
+    :param incremental: bool, Whether unchanged data already stored in the database is skipped.
+        Default is False, meaning all students are rewritten.
+    :param metrics: RunMetrics, Optional. The durations of the stages of every student are added to it.
+    :param pipeline: bool, Whether reading, calculating and writing run in separate threads.
+        Can't be combined with more than one worker.
+    :param signals: Sequence[str], The sampled signals stored besides the IBI data, see `event_series.SIGNALS`.
+        Default is none.
+    :param window_specs: Sequence[str], The moving windows stored in window_values, see `event_series.WINDOW_SPECS`.
+        Default are the 5-minute windows.
+    :param cache: ArrayCache, Optional. The cache of the parsed IBI files. Default is None, meaning no cache.
+    :param export: ParquetExport, Optional. The Parquet files the results are written to besides the database.
+    :return: RunMetrics, The durations of the stages of the run.
+    :raise ValueError: If a pipeline with several workers, an unknown signal or window spec is requested.
+    """
+
+    if pipeline and workers > 1:
+        raise ValueError('The pipeline runs in threads of this process and can\'t be combined with workers.')
+    unknown = [signal for signal in signals if signal not in SIGNALS]
+    if unknown:
+        raise ValueError(f'Unknown signals {unknown}, the signals have to be some of {list(SIGNALS)}.')
+    unknown = [spec for spec in window_specs if spec not in WINDOW_SPECS]
+    if unknown:
+        raise ValueError(f'Unknown window specs {unknown}, the specs have to be some of {list(WINDOW_SPECS)}.')
+
+    metrics = RunMetrics() if metrics is None else metrics
+    progress = ProgressReporter(generator_length(temp_dir, archive))
+    error_count = 0
+    skipped = []
+    skipped_before = []  # number of students skipped before every task, the results come in the same order
+    exported = []
+
+    own_backend = backend is None
+    if own_backend:
+        backend = MySQLBackend(schema)
+
+    ledger = {}
+    if incremental:
+        with backend.transaction() as cursor:
+            ledger = backend.load_ledger(cursor)
+
+    fingerprint = partial(term_fingerprint, window_specs=tuple(window_specs), signals=tuple(signals))
+
+    def tasks():
+        for stud in student_factory(temp_dir, archive, cache):
+            if not incremental:
+                # all terms are written, their fingerprints are calculated by compute_student
+                skipped_before.append(0)
+                yield stud, None
+                continue
+
+            fingerprints = {j: fingerprint(stud, term) for j, term in enumerate(TERMS, start=1)}
+            _, stored = ledger.get(stud.student_id, (None, {}))
+            changed = {j: value for j, value in fingerprints.items() if stored.get(j) != value}
+            if changed:
+                skipped_before.append(len(skipped))
+                yield stud, changed
+            else:
+                skipped.append(stud.student_id)
+
+    compute_task = partial(_compute_task, window_specs=tuple(window_specs), fingerprint=fingerprint)
+    if pipeline:
+        results = threaded_map(compute_task, threaded_map(_load_task, tasks()))
+    elif workers > 1:
+        results = parallel_map(compute_task, tasks(), workers)
+    else:
+        results = map(compute_task, tasks())
+
+    for i, result in enumerate(results):
+        beats = sum(len(term.interval) for term in result.terms)
+
+        # one transaction per student, on an error it is rolled back as a whole, so the deleted terms
+        # and the ledger stay as they were and the student is loaded again by the next run
+        failed = False
+        try:
+            with collect(result.timings), backend.transaction() as cursor:
+                with timed('insert_student'):
+                    if result.student_id in ledger:
+                        # replace only the changed terms of a stored student
+                        last_id = ledger[result.student_id][0]
+                        for term_id in result.fingerprints:
+                            backend.delete_term(cursor, last_id, term_id)
+                    else:
+                        # add student to db
+                        last_id = backend.insert_student(cursor, result.student_id)
+
+                # store processed data into db
+                write_student(backend, cursor, last_id, result)
+                with timed('insert_signals'):
+                    write_signals(backend, cursor, last_id,
+                                  SignalSeries(os.path.join(temp_dir, 'Data', result.student_id), archive),
+                                  [term_result.term_id for term_result in result.terms], signals)
+        except Exception as e:
+            failed = True
+            error_count += 1
+            with open(os.path.join(directory, 'error_log.txt'), 'a') as file:
+                error_time = dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                file.write(f'Error in {result.student_id} at {error_time}:\n {e}')
+                file.write('\n\n')
+
+        if export is not None and not failed:
+            with collect(result.timings), timed('export'):
+                export.write_student(result)
+            exported.append(result.student_id)
+
+        # the durations of failed students are recorded as well
+        metrics.add_student(result.student_id, result.timings, beats, failed=failed)
+        # the students skipped before this one, but not those the prefetching tasks() skipped ahead
+        progress.update(i + 1 + skipped_before[i], result.student_id, error_count)
+
+    progress.close()
+    if export is not None and not incremental:
+        export.prune(exported)
+    metrics.finish()
+
+    if skipped:
+        print(f'{len(skipped)} unchanged students skipped: {", ".join(skipped)}')
+
+    if own_backend:
+        backend.close()
+
+    return metrics
 
 
 if __name__ == '__main__':
 
+    parser = argparse.ArgumentParser(description='Store the wearable exam stress dataset into a MySQL database.')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--workers', type=int, default=1, metavar='N',
+                      help='number of worker processes calculating the data (default: 1)')
+    mode.add_argument('--pipeline', action='store_true',
+                      help='read, calculate and write in separate threads, which overlap')
+    parser.add_argument('--sqlite', metavar='PATH',
+                        help='store the data in an embedded SQLite database instead of MySQL')
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument('--incremental', action='store_true',
+                      help='keep the existing data and only load students whose input data changed')
+    load.add_argument('--reload', action='store_true',
+                      help='replace all data without asking: load into staging tables and swap them in at the end')
+    parser.add_argument('--partition', action='store_true',
+                        help='partition the MySQL tables inter_beat_interval and window_values by term')
+    parser.add_argument('--ibi-storage', choices=IBI_STORAGE_MODES, default='rows',
+                        help='store the raw IBI series as rows, as compressed blobs or both (default: rows). '
+                             'With blobs only, the row-based SQL queries of the analysis (e.g. of the notebook) '
+                             'find no intervals, only the query module decodes the blobs')
+    parser.add_argument('--signals', nargs='+', choices=list(SIGNALS), default=[], metavar='SIGNAL',
+                        help=f'further sampled signals stored in a table per signal, some of {", ".join(SIGNALS)}')
+    parser.add_argument('--windows', nargs='+', choices=list(WINDOW_SPECS), default=DEFAULT_WINDOW_SPECS,
+                        metavar='SPEC', help=f'moving windows stored in window_values, some of '
+                                             f'{", ".join(WINDOW_SPECS)} (default: {" ".join(DEFAULT_WINDOW_SPECS)})')
+    parser.add_argument('--cache', metavar='DIR',
+                        help='cache the parsed IBI files in DIR, so unchanged files are not parsed again')
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE // 1024 ** 2, metavar='MB',
+                        help=f'maximum size of the cache, least recently used files are removed '
+                             f'(default: {CACHE_SIZE // 1024 ** 2})')
+    parser.add_argument('--export', metavar='DIR',
+                        help='also write the tables as Parquet files partitioned by term and student to DIR '
+                             '(needs pyarrow)')
+    parser.add_argument('--metrics', metavar='PATH',
+                        help='write the durations of the stages per student and run to a .json or .csv file')
+    parser.add_argument('--profile', metavar='PATH',
+                        help='run under cProfile and write the statistics to PATH (readable with pstats)')
+    args = parser.parse_args()
+
     # directory = input()
     path = os.path.join(directory, FILENAME+'.zip')
 
-    create_schema(schema)
-    unzip_data(path, process_data)
+    if args.sqlite:
+        storage = SQLiteBackend(args.sqlite, ibi_storage=args.ibi_storage)
+    else:
+        storage = MySQLBackend(schema, partition=args.partition, ibi_storage=args.ibi_storage)
+
+    run_metrics = RunMetrics()
+    cache = ArrayCache(args.cache, args.cache_size * 1024 ** 2) if args.cache else None
+    export = ParquetExport(args.export) if args.export else None
+    with storage, profiled(args.profile), (storage.reload() if args.reload else nullcontext(storage)) as target:
+        if not args.reload:
+            storage.create_schema(drop_existing=False if args.incremental else None)
+        stream_data(path, partial(process_data, backend=target, workers=args.workers, incremental=args.incremental,
+                                  metrics=run_metrics, pipeline=args.pipeline, signals=args.signals,
+                                  window_specs=args.windows, cache=cache, export=export))
+
+    if args.metrics:
+        run_metrics.export(args.metrics)
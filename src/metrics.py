@@ -0,0 +1,252 @@
+"""
+Metrics Module
+-------------------
+
+This module measures where the time of a run is spent, without changing the processing.
+
+The stages of the processing are wrapped in `timed(stage)`. The durations are only
+recorded while a `collect` block is active in the same thread, otherwise `timed` does nothing
+but the check. `main.compute_student` collects the stages of a student (also in worker
+processes or, continuing `main.load_student`, in the threads of a pipeline) and returns them
+with its result, `main.process_data` adds the stages of writing
+and hands everything over to a `RunMetrics`, which aggregates them per student and per run
+and exports them as JSON or CSV.
+
+Stages:
+- read_file, reformat_file: Reading and reformatting of the IBI.csv files (`InterBeatInterval`)
+- calculate_hrv, windowing: Calculation of the values of a term (`main.compute_term`)
+- insert_student, insert_ibi, insert_segments, insert_master, insert_exam_window, insert_windows, ledger:
+  The insert groups of a student (`main.process_data`, `main.write_student`)
+- insert_signals: Reading and inserting the sampled signals of a student (`main.write_signals`)
+- commit: The commit of the transaction of a student (`StorageBackend.transaction`)
+- export: Writing the Parquet files of a student, only if exported (`export.ParquetExport`)
+
+Furthermore, `ProgressReporter` shows the progress of a run on one line and
+`profiled` runs a block under cProfile.
+
+:Modul: metrics
+:Author: Benjamin Gaube
+:Date: 2023-10-12
+"""
+
+import os
+import csv
+import sys
+import json
+import cProfile
+import threading
+import datetime as dt
+from time import perf_counter
+from contextlib import contextmanager
+from typing import Dict, List, TextIO
+
+STAGES = ['read_file', 'reformat_file', 'calculate_hrv', 'windowing', 'insert_student', 'insert_ibi',
+          'insert_segments', 'insert_master', 'insert_exam_window', 'insert_windows', 'ledger', 'insert_signals',
+          'commit']
+
+_local = threading.local()
+
+
+@contextmanager
+def collect(times: Dict[str, float] = None):
+    """
+    Record the durations of all `timed` stages of this thread while the block runs.
+
+    :param times: Dict[str, float], Optional. The durations are added to this mapping of
+        stages to seconds, e.g. to continue the timings of a student. Default is a new dict.
+    :yield: Dict[str, float], The mapping of the stages to their summed up durations in seconds.
+    """
+    times = {} if times is None else times
+    previous = getattr(_local, 'times', None)
+    _local.times = times
+    try:
+        yield times
+    finally:
+        _local.times = previous
+
+
+@contextmanager
+def timed(stage: str):
+    """
+    Add the duration of the block to the stage, if a `collect` block is active.
+
+    :param stage: str, The name of the stage, see `STAGES`.
+    """
+    times = getattr(_local, 'times', None)
+    if times is None:
+        yield
+        return
+
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        times[stage] = times.get(stage, 0.0) + perf_counter() - start
+
+
+@contextmanager
+def profiled(path: str = None):
+    """
+    Run the block under cProfile and write the statistics to a file, which can be read with pstats.
+
+    Only this process is profiled, not the worker processes.
+
+    :param path: str, Optional. The path of the statistics file. Default is None, meaning nothing is profiled.
+    """
+    if path is None:
+        yield
+        return
+
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        profile.dump_stats(path)
+
+
+class RunMetrics:
+    """
+    Stage durations of a run, aggregated per student and for the whole run.
+
+    :ivar started: datetime, The start of the run.
+    :ivar wall_time: float, The duration of the run in seconds, set by `finish`.
+    :ivar students: Dict[str, Dict[str, float]], The durations of the stages by student.
+    :ivar beats: Dict[str, int], The number of processed beats by student.
+    :ivar failed: List[str], The students whose data couldn't be stored, their durations are included.
+    """
+
+    def __init__(self):
+        self.started = dt.datetime.now()
+        self.wall_time = None
+        self.students: Dict[str, Dict[str, float]] = {}
+        self.beats: Dict[str, int] = {}
+        self.failed: List[str] = []
+        self._start = perf_counter()
+
+    def add_student(self, student_id: str, times: Dict[str, float], beats: int, failed: bool = False) -> None:
+        """
+        Add the stage durations of a processed student.
+
+        :param student_id: str, The identifier of the student, e.g. 'S1'.
+        :param times: Dict[str, float], The durations of the stages in seconds.
+        :param beats: int, The number of processed beats of the student.
+        :param failed: bool, Whether the data of the student couldn't be stored.
+        """
+        self.students[student_id] = dict(times)
+        self.beats[student_id] = beats
+        if failed:
+            self.failed.append(student_id)
+
+    def finish(self) -> None:
+        """
+        Stop the clock of the run.
+        """
+        self.wall_time = perf_counter() - self._start
+
+    def totals(self) -> Dict[str, float]:
+        """
+        Sum up the stage durations of all students.
+
+        :return: Dict[str, float], The durations of the stages in seconds.
+        """
+        totals = dict.fromkeys(STAGES, 0.0)
+        for times in self.students.values():
+            for stage, seconds in times.items():
+                totals[stage] = totals.get(stage, 0.0) + seconds
+        return totals
+
+    def to_dict(self) -> dict:
+        """
+        Return the metrics as dict, the content of the JSON export.
+
+        :return: dict, The metrics of the run and of every student.
+        """
+        total_beats = sum(self.beats.values())
+        return {
+            'started': self.started.strftime('%Y-%m-%d %H:%M:%S'),
+            'wall_time': self.wall_time,
+            'students': len(self.students),
+            'failed': list(self.failed),
+            'beats': total_beats,
+            'beats_per_second': total_beats / self.wall_time if self.wall_time else None,
+            'totals': self.totals(),
+            'per_student': {student: dict(times, beats=self.beats[student])
+                            for student, times in self.students.items()}
+        }
+
+    def export(self, path: str) -> None:
+        """
+        Write the metrics to a JSON file or a CSV file with one row per student and a row 'total'.
+
+        :param path: str, The path of the file, the extension (.json or .csv) defines the format.
+        :raise ValueError: If the extension is neither .json nor .csv.
+        """
+        extension = os.path.splitext(path)[1].lower()
+        if extension == '.json':
+            with open(path, 'w') as file:
+                json.dump(self.to_dict(), file, indent=2)
+        elif extension == '.csv':
+            stages = list(self.totals())
+            with open(path, 'w', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(['student', 'beats'] + stages + ['failed'])
+                for student, times in self.students.items():
+                    writer.writerow([student, self.beats[student]] + [times.get(stage, 0.0) for stage in stages]
+                                    + [int(student in self.failed)])
+                writer.writerow(['total', sum(self.beats.values())] + list(self.totals().values())
+                                + [len(self.failed)])
+        else:
+            raise ValueError(f'Metrics can be exported as .json or .csv, not {extension!r}.')
+
+
+class ProgressReporter:
+    """
+    Shows the progress of a run on a single line of the console, which is overwritten.
+
+    The line is rewritten at most every `interval` seconds and for the last student,
+    so the reporting costs nothing compared to the processing.
+
+    :param total: int, The number of students to be processed.
+    :param stream: TextIO, Optional. The stream the progress is written to. Default is sys.stdout.
+    :param interval: float, Minimum time between two updates of the line in seconds.
+    """
+
+    def __init__(self, total: int, stream: TextIO = None, interval: float = 0.5):
+        self.total = total
+        self.stream = sys.stdout if stream is None else stream
+        self.interval = interval
+        self._start = perf_counter()
+        self._last_update = None
+        self._width = 0
+        self.stream.write(f'Calculation of {total} datasets started: {dt.datetime.now():%Y-%m-%d %H:%M:%S}\n')
+
+    def update(self, done: int, student_id: str, errors: int = 0) -> None:
+        """
+        Report a processed student.
+
+        :param done: int, The number of processed students including this one.
+        :param student_id: str, The identifier of the processed student.
+        :param errors: int, The number of errors occurred so far.
+        """
+        now = perf_counter()
+        if self._last_update is not None and now - self._last_update < self.interval and done < self.total:
+            return
+        self._last_update = now
+
+        elapsed = now - self._start
+        line = f'{done}/{self.total} ({done / max(self.total, 1):.0%}) student {student_id}, {errors} errors'
+        if 0 < done < self.total:
+            line += f', estimated time remaining: {elapsed / done * (self.total - done) / 60:.2f} min'
+        self.stream.write('\r' + line.ljust(self._width))
+        self.stream.flush()
+        self._width = len(line)
+
+    def close(self) -> None:
+        """
+        Finish the line of the progress.
+        """
+        if self._last_update is not None:
+            self.stream.write('\n')
+            self.stream.flush()
@@ -4,7 +4,13 @@ SQL Database Interaction Module
 
 This module provides functionalities for interaction with a MySQL database,
 including schema creation and basic CRUD operations through various functions
-and context managers.
+and context managers. Connections can be reused by a `ConnectionPool` and bulk data
+is written with multi-row inserts by `insert_rows`.
+
+A full reload is written into a staging schema, which is created without the secondary
+indexes. They are added by `add_indexes` after the load, then `swap_schema` exchanges all
+tables of the staging schema and the schema in one RENAME TABLE statement, so readers see
+either the old or the new data, but never a partial load.
 
 Usage:
     Make sure that there is a MySQL-Server running at local host.
@@ -14,51 +20,105 @@ Usage:
 :Date: 2023-10-12
 """
 
+import queue
+import threading
 from time import sleep
 from contextlib import contextmanager
+from itertools import chain
+from typing import Dict, Any, List
 
+import numpy as np
 import mysql.connector
 
+from src.hrv import HRV_PARAMETERS
+from src.event_series import SIGNALS, WINDOW_SPECS, TERMS
+
 schema = 'application_project_gaube'
+HOST = 'localhost'
+USER = 'root'
+PASSWORD = ''
+POOL_SIZE = 4
+RETRIES = 6
+BASE_DELAY = 0.5  # seconds before the first retry, doubled with every further retry
+MAX_DELAY = 8.0  # upper bound of the delay between two connection attempts
+BATCH_SIZE = 5000  # rows per multi-row insert
+SIGNAL_TABLES = {signal: 'signal_' + signal.lower() for signal in SIGNALS}
+SIGNAL_TYPES = {'ACC': 'SMALLINT'}  # SQL type of the columns of a signal, FLOAT if not listed
+FACT_TABLES = ['inter_beat_interval', 'ibi_series', 'ibi_segment', 'master_data', 'exam_window', 'window_values',
+               'ingestion_ledger', 'signal_recording'] + list(SIGNAL_TABLES.values())
+
+STAGING_SUFFIX = '_staging'
+# secondary indexes for time range queries by table, added after the load of a staging schema
+SECONDARY_INDEXES = {
+    'inter_beat_interval': {'ibi_student_term_time': 'student_id, term_id, timestamp',
+                            'ibi_term_time': 'term_id, timestamp'},
+    'window_values': {'window_student_term_spec_time': 'student_id, term_id, window_spec_id, timestamp',
+                      'window_term_spec_time': 'term_id, window_spec_id, timestamp'}
+}
+# indexes of older schemas, which are replaced by those of SECONDARY_INDEXES
+STALE_INDEXES = {'window_values': ['window_student_term_time', 'window_term_time']}
+
+TERM_PARTITIONS = '''
+        PARTITION BY LIST (term_id) (
+            PARTITION mid1 VALUES IN (1),
+            PARTITION mid2 VALUES IN (2),
+            PARTITION final VALUES IN (3)
+        )'''
+
+# standard queries of the analysis, which are served by index range scans. They read the rows of
+# inter_beat_interval, which are empty if the series are only stored as blobs (`sql_query.QueryReader` decodes them)
+ANALYSIS_QUERIES = {
+    'ibi_range': 'SELECT timestamp, ibi_value FROM inter_beat_interval '
+                 'WHERE student_id = %s AND term_id = %s AND timestamp BETWEEN %s AND %s',
+    'window_range': 'SELECT timestamp, parameter_id, hrv_value FROM window_values '
+                    'WHERE student_id = %s AND term_id = %s AND window_spec_id = %s AND timestamp BETWEEN %s AND %s',
+    'exam_window': 'SELECT student_id, ibi_value FROM inter_beat_interval '
+                   'WHERE term_id = %s AND timestamp BETWEEN %s AND %s'
+}
+
+
+def connect(database=None, host: str = HOST, user: str = USER, password: str = PASSWORD,
+            retries: int = RETRIES, base_delay: float = BASE_DELAY, max_delay: float = MAX_DELAY):
+    """
+    Open a connection to a MySQL server, retrying with a bounded exponential backoff.
+
+    After a failed attempt the function waits `base_delay`, then twice as long and so on,
+    but never longer than `max_delay` seconds between two attempts.
+
+    :param database: str, Optional. The name of the database to connect to.
+    :param host: str, The host of the MySQL server.
+    :param user: str, The user to log in with.
+    :param password: str, The password of the user.
+    :param retries: int, Number of retries after the first failed attempt.
+    :param base_delay: float, Delay in seconds before the first retry.
+    :param max_delay: float, Upper bound of the delay in seconds between two attempts.
+    :return: MySQLConnection, The database connection object.
+    :raise mysql.connector.Error: If unable to establish connection after all retries.
+    """
+
+    for attempt in range(retries + 1):
+        try:
+            return mysql.connector.connect(host=host, user=user, password=password, database=database)
+        except mysql.connector.Error:
+            if attempt == retries:
+                raise
+            sleep(min(max_delay, base_delay * 2 ** attempt))
 
 
 @contextmanager
-def connect_to_localhost(database=None):
+def connect_to_localhost(database=None, **config):
     """
     Establish and manage a connection to a MySQL database on localhost.
 
     :param database: str, Optional. The name of the database to connect to.
                      Default is None.
+    :param config: Further keyword arguments passed to `connect`, e.g. another host than localhost.
     :yield: MySQLConnection, The database connection object.
-    :raise mysql.connector.Error: If unable to establish connection after 5 retries.
+    :raise mysql.connector.Error: If unable to establish connection after the retries of `connect`.
     """
     db = None
     try:
-        try:
-            db = mysql.connector.connect(
-                host='localhost',
-                user='root',
-                password='',
-                database=database
-            )
-        except mysql.connector.Error:
-            tries = 0
-            while True:
-                if tries > 5:
-                    raise mysql.connector.Error('Could not connect to database')
-                sleep(60)
-                try:
-                    db = mysql.connector.connect(
-                        host='localhost',
-                        user='root',
-                        password='',
-                        database=database
-                    )
-                    break
-
-                except mysql.connector.Error:
-                    tries += 1
-
+        db = connect(database, **config)
         yield db  # The connection is used here
 
     finally:
@@ -66,77 +126,261 @@ def connect_to_localhost(database=None):
             db.close()
 
 
-def create_schema(schema_name: str):
+class ConnectionPool:
+    """
+    Thread-safe pool of reusable MySQL connections.
+
+    Connections are opened lazily up to `pool_size` and handed out by the context manager
+    `connection`. Before an idle connection is reused, it is validated with a ping and
+    replaced by a new one if the server closed it. Uncommitted changes are rolled back
+    when a connection is returned after an error.
+
+    :ivar database: str or None, The name of the database the connections are using.
+    :ivar pool_size: int, Maximum number of open connections.
+
+    :param database: str, Optional. The name of the database to connect to.
+    :param pool_size: int, Maximum number of open connections.
+    :param config: Further keyword arguments passed to `connect` (host, user, password, retries, ...).
+    """
+
+    def __init__(self, database=None, pool_size: int = POOL_SIZE, **config):
+        self.database = database
+        self.pool_size = pool_size
+        self._config = config
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+
+    def _acquire(self):
+        while True:
+            try:
+                db = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    open_new = self._opened < self.pool_size
+                    if open_new:
+                        self._opened += 1
+                if open_new:
+                    try:
+                        return connect(self.database, **self._config)
+                    except mysql.connector.Error:
+                        with self._lock:
+                            self._opened -= 1
+                        raise
+                db = self._idle.get()  # wait for a connection in use
+
+            try:
+                db.ping(reconnect=False)
+                return db
+            except mysql.connector.Error:
+                # stale connection, open a new one instead
+                self._drop(db)
+
+    def _drop(self, db):
+        with self._lock:
+            self._opened -= 1
+        try:
+            db.close()
+        except mysql.connector.Error:
+            pass
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection from the pool.
+
+        :yield: MySQLConnection, A validated connection, which is returned to the pool afterwards.
+        """
+        db = self._acquire()
+        healthy = True
+        try:
+            yield db
+        except BaseException:
+            try:
+                db.rollback()
+            except mysql.connector.Error:
+                healthy = False
+            raise
+        finally:
+            if healthy:
+                self._idle.put(db)
+            else:
+                self._drop(db)
+
+    def close(self):
+        """
+        Close all idle connections of the pool.
+        """
+        while True:
+            try:
+                db = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._drop(db)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def create_schema(schema_name: str, drop_existing: bool = None, partition: bool = False, indexes: bool = True,
+                  **config):
     """
     Creates a database schema if it does not exist, with optional deletion of existing schema.
 
     Connects to a local database, checks if a schema by the provided name already exists,
-    and if so, prompts the user to either delete or retain it. If the user opts for deletion,
-    the existing schema is dropped. Subsequently or if the schema didn't exist in the first place,
-    the function creates a new schema and sets up a basic table structure within it.
+    and if so, prompts the user to either delete or retain it, unless `drop_existing` decides it.
+    If the existing schema is dropped or didn't exist in the first place, the function creates
+    a new schema and sets up a basic table structure within it. A retained schema keeps its
+    data, only missing tables (e.g. the ingestion_ledger of older schemas) are added.
+
+    The table ibi_series holds the IBI series of a student and term as compressed binary
+    blobs (see `codec`), an alternative to the rows of inter_beat_interval. The table ibi_segment
+    indexes the segments of contiguous beats of every series (see `InterBeatInterval.segments`),
+    so the gaps and the covered time of a recording are known without reading the beats.
+
+    The table window_spec holds the length and step of the moving windows (see
+    `event_series.WINDOW_SPECS`), every row of window_values refers to the spec of its window.
+    The column window_spec_id is added to the window_values of a retained schema, its rows
+    belong to the 5-minute windows (window_spec_id 1).
+
+    The sampled signals (see `event_series.SIGNALS`) are stored one row per sample in a table
+    per signal (`SIGNAL_TABLES`). The timestamps aren't stored, the table signal_recording holds
+    the start time and the sample rate of every recording, so the timestamp of a sample is
+    start_time + sample_index / sample_rate.
+
+    The tables inter_beat_interval and window_values get composite indexes for time range
+    queries per student and term (student_id, term_id, timestamp) and across all students
+    (term_id, timestamp). Optionally, both tables are partitioned by term_id. As MySQL doesn't
+    support foreign keys on partitioned tables, they are omitted in this case and
+    `insert_student` deletes the dependent rows explicitly. The indexes of `SECONDARY_INDEXES` can be
+    omitted to load data faster and added afterwards by `add_indexes`. Otherwise, the missing ones
+    are added to the tables of a retained schema and the replaced ones of `STALE_INDEXES` are dropped.
 
     :param schema_name: str, The name of the schema to be created in the database.
+    :param drop_existing: bool, Optional. Whether an existing schema is dropped (True) or retained (False).
+        Default is None, meaning the user is asked.
+    :param partition: bool, Whether inter_beat_interval and window_values are partitioned by term_id.
+    :param indexes: bool, Whether the tables are created with the indexes of `SECONDARY_INDEXES`.
+    :param config: Further keyword arguments passed to `connect` (host, user, password, ...).
     """
 
-    with connect_to_localhost() as db:
+    with connect_to_localhost(**config) as db:
 
         cursor = db.cursor()
-        cursor.execute(f'SELECT SCHEMA_NAME FROM INFORMATION_SCHEMA.SCHEMATA WHERE SCHEMA_NAME = "{schema}"')
+        cursor.execute('SELECT SCHEMA_NAME FROM INFORMATION_SCHEMA.SCHEMATA WHERE SCHEMA_NAME = %s', (schema_name,))
 
         if cursor.fetchone():
-            print(f'Schema {schema} already exists.')
-            while True:
+            print(f'Schema {schema_name} already exists.')
+            while drop_existing is None:
                 user_input = input('Do you want to delete it? (y/n): ')
 
                 if user_input.lower() == 'y':
-                    cursor.execute(f"DROP DATABASE {schema}")
-                    print(f"Schema {schema} deleted successfully.")
-                    break
+                    drop_existing = True
                 elif user_input.lower() == 'n':
-                    return
-
+                    drop_existing = False
                 else:
                     print('invalid input..')
 
-        cursor.execute(f'CREATE DATABASE {schema_name}')
+            if drop_existing:
+                cursor.execute(f"DROP DATABASE {schema_name}")
+                print(f"Schema {schema_name} deleted successfully.")
+
+        cursor.execute(f'CREATE DATABASE IF NOT EXISTS {schema_name}')
         cursor.execute(f'USE {schema_name}')
 
         cursor.execute('''
-        CREATE TABLE dataset (
+        CREATE TABLE IF NOT EXISTS dataset (
             id INT AUTO_INCREMENT PRIMARY KEY,
             student VARCHAR(5) UNIQUE
         )
         ''')
 
         cursor.execute('''
-        CREATE TABLE exam (
+        CREATE TABLE IF NOT EXISTS exam (
             id INT AUTO_INCREMENT PRIMARY KEY,
             term VARCHAR(10)
         )    
         ''')
 
         cursor.execute('''
-        CREATE TABLE hrv (
+        CREATE TABLE IF NOT EXISTS hrv (
             id INT AUTO_INCREMENT PRIMARY KEY,
             parameter VARCHAR(15)
         )
         ''')
 
+        if partition:
+            # partitioned InnoDB tables don't support foreign keys and need the term_id in the primary key
+            fact_keys = 'PRIMARY KEY (id, term_id)'
+            window_keys = fact_keys
+        else:
+            fact_keys = '''PRIMARY KEY (id),
+            FOREIGN KEY (student_id) REFERENCES dataset(id) ON DELETE CASCADE,
+            FOREIGN KEY (term_id) REFERENCES exam(id)'''
+            window_keys = fact_keys + ''',
+            FOREIGN KEY (window_spec_id) REFERENCES window_spec(id),
+            FOREIGN KEY (parameter_id) REFERENCES hrv(id)'''
+
         cursor.execute('''
-        CREATE TABLE inter_beat_interval (
-            id INT AUTO_INCREMENT PRIMARY KEY,
+        CREATE TABLE IF NOT EXISTS window_spec (
+            id INT PRIMARY KEY,
+            name VARCHAR(10),
+            length_in_s INT,
+            step_in_s INT
+        )
+        ''')
+
+        index_lines = {table: ''.join(f'INDEX {name} ({columns}),\n            '
+                                      for name, columns in table_indexes.items()) if indexes else ''
+                       for table, table_indexes in SECONDARY_INDEXES.items()}
+
+        cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS inter_beat_interval (
+            id INT AUTO_INCREMENT,
             student_id INT, 
-            term_id INT,
+            term_id INT NOT NULL,
             ibi_value_id INT,
             ibi_value INT,
             timestamp INT,
+            {index_lines['inter_beat_interval']}{fact_keys}
+        ){TERM_PARTITIONS if partition else ''}
+        ''')
+
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ibi_series (
+            student_id INT,
+            term_id INT,
+            number_of_ibi INT,
+            start_time INT,
+            time_blob MEDIUMBLOB,
+            interval_blob MEDIUMBLOB,
+            PRIMARY KEY (student_id, term_id),
+            FOREIGN KEY (student_id) REFERENCES dataset(id) ON DELETE CASCADE,
+            FOREIGN KEY (term_id) REFERENCES exam(id)
+        )
+        ''')
+
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ibi_segment (
+            student_id INT,
+            term_id INT,
+            segment_id INT,
+            start_time INT,
+            end_time INT,
+            number_of_ibi INT,
+            duration_in_ms INT,
+            gap_in_s INT,
+            PRIMARY KEY (student_id, term_id, segment_id),
             FOREIGN KEY (student_id) REFERENCES dataset(id) ON DELETE CASCADE,
             FOREIGN KEY (term_id) REFERENCES exam(id)
         )
         ''')
 
         cursor.execute('''
-        CREATE TABLE master_data (
+        CREATE TABLE IF NOT EXISTS master_data (
             id INT AUTO_INCREMENT PRIMARY KEY,
             student_id INT,
             term_id INT,
@@ -151,29 +395,266 @@ def create_schema(schema_name: str):
         ''')
 
         cursor.execute('''
-        CREATE TABLE window_values (
+        CREATE TABLE IF NOT EXISTS exam_window (
             id INT AUTO_INCREMENT PRIMARY KEY,
             student_id INT,
             term_id INT,
+            number_of_ibi INT,
+            nni_mean FLOAT,
+            sdnn FLOAT,
+            coverage FLOAT,
+            UNIQUE INDEX exam_window_student_term (student_id, term_id),
+            FOREIGN KEY (student_id) REFERENCES dataset(id) ON DELETE CASCADE,
+            FOREIGN KEY (term_id) REFERENCES exam(id)
+        )
+        ''')
+
+        cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS window_values (
+            id INT AUTO_INCREMENT,
+            student_id INT,
+            term_id INT NOT NULL,
+            window_spec_id INT NOT NULL DEFAULT 1,
             window_id INT,
             timestamp INT,
             parameter_id INT,
             hrv_value FLOAT,
             number_of_ibi INT,
+            {index_lines['window_values']}{window_keys}
+        ){TERM_PARTITIONS if partition else ''}
+        ''')
+
+        cursor.execute('SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_SCHEMA = %s '
+                       'AND TABLE_NAME = %s AND COLUMN_NAME = %s', (schema_name, 'window_values', 'window_spec_id'))
+        if cursor.fetchone()[0] == 0:
+            cursor.execute('ALTER TABLE window_values ADD COLUMN window_spec_id INT NOT NULL DEFAULT 1 AFTER term_id')
+
+        if indexes:
+            # a retained schema created before the indexes were introduced doesn't have them yet
+            _add_missing_indexes(cursor, schema_name)
+
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ingestion_ledger (
+            student_id INT,
+            term_id INT,
+            fingerprint VARCHAR(64),
+            PRIMARY KEY (student_id, term_id),
             FOREIGN KEY (student_id) REFERENCES dataset(id) ON DELETE CASCADE,
-            FOREIGN KEY (term_id) REFERENCES exam(id),
-            FOREIGN KEY (parameter_id) REFERENCES hrv(id)
+            FOREIGN KEY (term_id) REFERENCES exam(id)
         )
         ''')
 
-        for term_type in ['mid1', 'mid2', 'final']:
-            cursor.execute('INSERT INTO exam (term) VALUES (%s)', (term_type,))
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS signal_recording (
+            student_id INT,
+            term_id INT,
+            signal_name VARCHAR(4),
+            start_time DOUBLE,
+            sample_rate FLOAT,
+            number_of_samples INT,
+            PRIMARY KEY (student_id, term_id, signal_name),
+            FOREIGN KEY (student_id) REFERENCES dataset(id) ON DELETE CASCADE,
+            FOREIGN KEY (term_id) REFERENCES exam(id)
+        )
+        ''')
 
-        for parameter_type in ['nni_mean', 'sdnn']:
-            cursor.execute('INSERT INTO hrv (parameter) VALUES (%s)', (parameter_type,))
+        for signal, table in SIGNAL_TABLES.items():
+            value_columns = ''.join(f'{column} {SIGNAL_TYPES.get(signal, "FLOAT")},\n            '
+                                    for column in SIGNALS[signal])
+            cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                student_id INT,
+                term_id INT,
+                sample_index INT,
+                {value_columns}PRIMARY KEY (student_id, term_id, sample_index),
+                FOREIGN KEY (student_id) REFERENCES dataset(id) ON DELETE CASCADE,
+                FOREIGN KEY (term_id) REFERENCES exam(id)
+            )
+            ''')
+
+        cursor.execute('SELECT COUNT(*) FROM exam')
+        if cursor.fetchone()[0] == 0:
+            for term_type in TERMS:
+                cursor.execute('INSERT INTO exam (term) VALUES (%s)', (term_type,))
+
+        # the hrv table is filled from the registry, parameters added later are appended to a retained schema
+        cursor.execute('SELECT id FROM hrv')
+        stored = {row[0] for row in cursor.fetchall()}
+        for parameter_id, parameter_type in enumerate(HRV_PARAMETERS, start=1):
+            if parameter_id not in stored:
+                cursor.execute('INSERT INTO hrv (id, parameter) VALUES (%s, %s)', (parameter_id, parameter_type))
+
+        cursor.execute('SELECT id FROM window_spec')
+        stored = {row[0] for row in cursor.fetchall()}
+        for spec_id, (name, (length, step)) in enumerate(WINDOW_SPECS.items(), start=1):
+            if spec_id not in stored:
+                cursor.execute('INSERT INTO window_spec (id, name, length_in_s, step_in_s) VALUES (%s, %s, %s, %s)',
+                               (spec_id, name, length, step))
 
         db.commit()
 
 
+def _add_missing_indexes(cursor, schema_name: str) -> None:
+    """
+    add the indexes of `SECONDARY_INDEXES` which a table doesn't have yet and drop those of `STALE_INDEXES`,
+    with one ALTER TABLE per table
+    """
+    for table, table_indexes in SECONDARY_INDEXES.items():
+        cursor.execute('SELECT DISTINCT INDEX_NAME FROM INFORMATION_SCHEMA.STATISTICS '
+                       'WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s', (schema_name, table))
+        existing = {row[0] for row in cursor.fetchall()}
+        changes = [f'DROP INDEX {name}' for name in STALE_INDEXES.get(table, []) if name in existing]
+        changes += [f'ADD INDEX {name} ({columns})' for name, columns in table_indexes.items()
+                    if name not in existing]
+        if changes:
+            cursor.execute(f'ALTER TABLE {table} ' + ', '.join(changes))
+
+
+def add_indexes(schema_name: str, **config) -> None:
+    """
+    Add the missing indexes of `SECONDARY_INDEXES` to the tables of a schema, with one ALTER TABLE per table.
+
+    Building an index once over the loaded table is faster than maintaining it during the load.
+    Indexes of `STALE_INDEXES` are dropped in the same statement.
+
+    :param schema_name: str, The name of the schema.
+    :param config: Further keyword arguments passed to `connect` (host, user, password, ...).
+    """
+
+    with connect_to_localhost(schema_name, **config) as db:
+        _add_missing_indexes(db.cursor(), schema_name)
+
+
+def drop_schema(schema_name: str, **config) -> None:
+    """
+    Drop a schema with all its tables, if it exists.
+
+    :param schema_name: str, The name of the schema.
+    :param config: Further keyword arguments passed to `connect` (host, user, password, ...).
+    """
+
+    with connect_to_localhost(**config) as db:
+        db.cursor().execute(f'DROP DATABASE IF EXISTS {schema_name}')
+
+
+def swap_schema(staging_name: str, schema_name: str, **config) -> None:
+    """
+    Replace all tables of a schema by the tables of a staging schema at once.
+
+    One RENAME TABLE statement moves the tables of the schema into a temporary schema and the
+    tables of the staging schema into the schema. The statement is atomic, so other sessions
+    see either all old or all new tables. Afterwards, the old tables and the empty staging
+    schema are dropped. The schema is created, if it doesn't exist.
+
+    :param staging_name: str, The name of the staging schema holding the new tables.
+    :param schema_name: str, The name of the schema to be replaced.
+    :param config: Further keyword arguments passed to `connect` (host, user, password, ...).
+    """
+
+    old_name = schema_name + '_old'
+    with connect_to_localhost(**config) as db:
+        cursor = db.cursor()
+        cursor.execute(f'DROP DATABASE IF EXISTS {old_name}')
+        cursor.execute(f'CREATE DATABASE {old_name}')
+        cursor.execute(f'CREATE DATABASE IF NOT EXISTS {schema_name}')
+
+        tables = {}
+        for name in [schema_name, staging_name]:
+            cursor.execute('SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_SCHEMA = %s', (name,))
+            tables[name] = [row[0] for row in cursor.fetchall()]
+
+        renames = ([f'{schema_name}.{table} TO {old_name}.{table}' for table in tables[schema_name]] +
+                   [f'{staging_name}.{table} TO {schema_name}.{table}' for table in tables[staging_name]])
+        cursor.execute('RENAME TABLE ' + ', '.join(renames))
+
+        cursor.execute(f'DROP DATABASE {old_name}')
+        cursor.execute(f'DROP DATABASE {staging_name}')
+
+
+def columns_to_rows(table: str, columns: Dict[str, Any]) -> List[tuple]:
+    """
+    Convert columnar data into a list of rows of Python objects.
+
+    Every column is given as a NumPy array (or any other sequence) of the same length,
+    or as a scalar that is repeated for every row (e.g. the student_id). The arrays are
+    converted to Python objects at once instead of value by value.
+
+    :param table: str, Name of the table the data is meant for (used in the error message).
+    :param columns: Dict[str, Any], Mapping of column names to arrays or scalars.
+    :return: List[tuple], One tuple per row with the values in the order of the columns.
+    :raise ValueError: If the arrays are of different length.
+    """
+
+    lengths = {len(values) for values in columns.values() if np.ndim(values) == 1}
+    if len(lengths) > 1:
+        raise ValueError(f'All columns inserted into {table} have to be of the same length.')
+    n_rows = lengths.pop() if lengths else 1
+
+    # bytes are kept as they are, NumPy would strip trailing null bytes
+    values = [np.asarray(col).tolist() if np.ndim(col) == 1 else
+              [col if isinstance(col, (bytes, bytearray)) else np.asarray(col).item()] * n_rows
+              for col in columns.values()]
+    return list(zip(*values))
+
+
+def insert_rows(cursor, table: str, columns: Dict[str, Any], batch_size: int = BATCH_SIZE) -> int:
+    """
+    Insert columnar data into a table using multi-row INSERT statements.
+
+    The columns are converted by `columns_to_rows` and sent in batches of `batch_size` rows,
+    so there is one round trip per batch instead of one per row.
+    The transaction is not committed.
+
+    :param cursor: MySQLCursor, The cursor of an open connection.
+    :param table: str, Name of the table to insert into.
+    :param columns: Dict[str, Any], Mapping of column names to arrays or scalars.
+    :param batch_size: int, Maximum number of rows per INSERT statement.
+    :return: int, Number of inserted rows.
+    :raise ValueError: If the arrays are of different length.
+    """
+
+    rows = columns_to_rows(table, columns)
+
+    statement = f'INSERT INTO {table} ({", ".join(columns)}) VALUES '
+    placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        cursor.execute(statement + ', '.join([placeholder] * len(batch)), list(chain.from_iterable(batch)))
+
+    return len(rows)
+
+
+def insert_student(cursor, student: str) -> int:
+    """
+    Insert a student into the table dataset and return its id.
+
+    If the student is already stored, the existing entry is deleted together with all
+    dependent rows and the student is inserted again. The dependent rows are deleted
+    explicitly, because partitioned tables have no foreign keys (see `create_schema`).
+    The transaction is not committed.
+
+    :param cursor: MySQLCursor, The cursor of an open connection.
+    :param student: str, The identifier of the student, e.g. 'S1'.
+    :return: int, The id of the student in the table dataset.
+    """
+
+    try:
+        # if the student doesn't exist: write student
+        cursor.execute('INSERT INTO dataset (student) VALUES (%s)', (student,))
+    except mysql.connector.IntegrityError as e:
+        # if the student already in db: rewrite student
+        if 'Duplicate entry' not in str(e):
+            raise
+        print(f'Duplicate entry {student} for key student detected. Rewriting...')
+        for table in FACT_TABLES:
+            cursor.execute(f'DELETE t FROM {table} t JOIN dataset d ON t.student_id = d.id WHERE d.student = %s',
+                           (student,))
+        cursor.execute('DELETE FROM dataset WHERE student = %s', (student,))
+        cursor.execute('INSERT INTO dataset (student) VALUES (%s)', (student,))
+
+    return cursor.lastrowid
+
+
 if __name__ == '__main__':
     create_schema(schema)
@@ -0,0 +1,293 @@
+"""
+SQL Query Module
+-------------------
+
+This module provides the read access to the stored data for the analysis. Instead of
+`pd.read_sql`, which buffers the whole result set as Python objects before it builds a
+DataFrame, the results are fetched in chunks of `FETCH_SIZE` rows from an unbuffered cursor,
+so the server streams the rows, and every chunk is copied into NumPy arrays, which are
+allocated once for the whole result. The memory needed on the client is one chunk of Python
+objects besides the arrays.
+
+`QueryReader` provides typed accessors for the IBI series of a student and term (optionally
+within a time range), the intervals of all students during an exam, the aggregates of the exam
+periods stored at ingest, the window values and the master data. The segments of contiguous beats
+of the table ibi_segment answer coverage questions, e.g. the usable minutes of a term, without
+reading the beats. Every accessor returns a dict of column names to arrays, which can be passed to
+`pd.DataFrame` if needed.
+
+The IBI series are read from the rows of inter_beat_interval. Series which are stored as blobs
+in the table ibi_series (`--ibi-storage blob`) are decoded instead, like by
+`StorageBackend.read_ibi_series`, and filtered by the time range on the client.
+
+Usage:
+    with open_reader() as reader:
+        ibi = reader.ibi_series('S1', 'final', (1544022000, 1544032800))
+
+:Modul: sql_query
+:Author: Benjamin Gaube
+:Date: 2023-10-12
+"""
+
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+import numpy as np
+
+from src import sql_database
+from src.codec import decode_series
+from src.storage import TERMS
+
+FETCH_SIZE = 10000  # rows per fetch from the cursor
+
+IBI_COLUMNS = {'timestamp': np.int64, 'ibi_value': np.int32}
+EXAM_COLUMNS = {'student': 'U5', 'ibi_value': np.int32}
+WINDOW_COLUMNS = {'window_spec_id': np.int16, 'window_id': np.int32, 'timestamp': np.int64,
+                  'parameter_id': np.int16, 'hrv_value': np.float64, 'number_of_ibi': np.int32}
+SEGMENT_COLUMNS = {'segment_id': np.int32, 'start_time': np.int64, 'end_time': np.int64,
+                   'number_of_ibi': np.int32, 'duration_in_ms': np.int64, 'gap_in_s': np.int64}
+BLOB_SELECT = ('SELECT s.student_id, d.student, s.start_time, s.time_blob, s.interval_blob, s.number_of_ibi '
+               'FROM ibi_series s JOIN dataset d ON s.student_id = d.id ')
+EXAM_WINDOW_COLUMNS = {'student': 'U5', 'term': 'U5', 'number_of_ibi': np.int32, 'nni_mean': np.float64,
+                       'sdnn': np.float64, 'coverage': np.float64}
+MASTER_COLUMNS = {'student': 'U5', 'term': 'U5', 'grade': np.int32, 'nni_mean': np.float64,
+                  'sdnn': np.float64, 'number_of_ibi': np.int32, 'duration_in_h': np.float64}
+
+
+class QueryReader:
+    """
+    Typed read access to the database, filling NumPy arrays chunk by chunk.
+
+    The queries are written with the placeholder of MySQL (%s), which is replaced by the
+    placeholder of the database. The cursor has to be unbuffered to stream the rows,
+    e.g. `db.cursor(buffered=False)` of mysql.connector or any cursor of sqlite3.
+
+    :ivar cursor: The DB-API cursor the queries are executed with.
+    :ivar placeholder: str, The placeholder of parameters in SQL statements of the database.
+    :ivar fetch_size: int, Maximum number of rows fetched at once.
+
+    :param cursor: A DB-API cursor.
+    :param placeholder: str, The placeholder of parameters, '%s' for MySQL and '?' for SQLite.
+    :param fetch_size: int, Maximum number of rows fetched at once.
+    """
+
+    def __init__(self, cursor, placeholder: str = '%s', fetch_size: int = FETCH_SIZE):
+        self.cursor = cursor
+        self.placeholder = placeholder
+        self.fetch_size = fetch_size
+
+    def _execute(self, query: str, params: tuple = ()) -> None:
+        self.cursor.execute(query.replace('%s', self.placeholder), params)
+
+    def count(self, query: str, params: tuple = ()) -> int:
+        """
+        Count the rows of a query.
+
+        :param query: str, The FROM and WHERE clause of the query, e.g. 'FROM master_data WHERE term_id = %s'.
+        :param params: tuple, The parameters of the query.
+        :return: int, The number of rows.
+        """
+        self._execute('SELECT COUNT(*) ' + query, params)
+        return self.cursor.fetchall()[0][0]
+
+    def fetch(self, query: str, params: tuple, columns: Dict[str, object], size: int = None) -> Dict[str, np.ndarray]:
+        """
+        Execute a query and fetch its rows chunk by chunk into one array per column.
+
+        The arrays are allocated for `size` rows. If the query returns more rows, e.g. because
+        data was inserted in the meantime, they are enlarged to twice the size.
+
+        :param query: str, The query, selecting the columns in the order of `columns`.
+        :param params: tuple, The parameters of the query.
+        :param columns: Dict[str, object], Mapping of the column names to the dtypes of the arrays.
+        :param size: int, Optional. The expected number of rows. Default is None, meaning `fetch_size`.
+        :return: Dict[str, np.ndarray], The arrays of the columns, as long as the number of rows.
+        """
+        row_type = np.dtype(list(columns.items()))
+        result = np.empty(self.fetch_size if size is None else size, dtype=row_type)
+        n_rows = 0
+
+        self._execute(query, params)
+        while True:
+            rows = self.cursor.fetchmany(self.fetch_size)
+            if not rows:
+                break
+            if n_rows + len(rows) > len(result):
+                result = np.resize(result, max(2 * len(result), n_rows + len(rows)))
+            result[n_rows:n_rows + len(rows)] = np.array(rows, dtype=row_type)
+            n_rows += len(rows)
+
+        return {name: np.ascontiguousarray(result[name][:n_rows]) for name in columns}
+
+    def _fetch_counted(self, select: str, query: str, params: tuple, columns: Dict[str, object],
+                       order: str = '') -> Dict[str, np.ndarray]:
+        """ fetch a query into arrays of the size given by a COUNT of the same query """
+        return self.fetch(f'SELECT {select} {query} {order}', params, columns, self.count(query, params))
+
+    def _blob_series(self, query: str, params: tuple, time_range: Tuple[int, int] = None) -> list:
+        """
+        Decode the series of the table ibi_series selected by a query.
+
+        :param query: str, The query, selecting the id and the identifier of the student and the columns
+            start_time, time_blob, interval_blob and number_of_ibi.
+        :param params: tuple, The parameters of the query.
+        :param time_range: tuple(int, int), Optional. Only the intervals within this range are kept.
+        :return: list, A tuple (id, student, timestamps, intervals) per series.
+        """
+        self._execute(query, params)
+        series = []
+        for student_id, student, *blobs in self.cursor.fetchall():
+            time, interval = decode_series(*blobs)
+            if time_range is not None:
+                inside = (time >= time_range[0]) & (time <= time_range[1])
+                time, interval = time[inside], interval[inside]
+            series.append((student_id, student, time, interval))
+        return series
+
+    def ibi_series(self, student: str, term: str, time_range: Tuple[int, int] = None) -> Dict[str, np.ndarray]:
+        """
+        Read the IBI series of a student and term. Like `StorageBackend.read_ibi_series`, the series
+        is decoded from the table ibi_series, if it is stored there, else read from inter_beat_interval.
+
+        :param student: str, The identifier of the student, e.g. 'S1'.
+        :param term: str, should be one of {'mid1', 'mid2', 'final'}.
+        :param time_range: tuple(int, int), Optional. The first and the last Unix timestamp of the
+            intervals to be read. Default is None, meaning the whole recording.
+        :return: Dict[str, np.ndarray], The columns 'timestamp' and 'ibi_value' (in ms).
+        """
+        params = (student, TERMS.index(term) + 1)
+        blobs = self._blob_series(BLOB_SELECT + 'WHERE d.student = %s AND s.term_id = %s', params, time_range)
+        if blobs:
+            _, _, time, interval = blobs[0]
+            return {'timestamp': time.astype(IBI_COLUMNS['timestamp']),
+                    'ibi_value': interval.astype(IBI_COLUMNS['ibi_value'])}
+
+        query = ('FROM inter_beat_interval WHERE student_id = (SELECT id FROM dataset WHERE student = %s) '
+                 'AND term_id = %s')
+        if time_range is not None:
+            query += ' AND timestamp BETWEEN %s AND %s'
+            params += tuple(time_range)
+        return self._fetch_counted('timestamp, ibi_value', query, params, IBI_COLUMNS, 'ORDER BY ibi_value_id')
+
+    def exam_intervals(self, term: str, time_range: Tuple[int, int]) -> Dict[str, np.ndarray]:
+        """
+        Read the intervals of all students within a time range of a term, e.g. the exam period.
+
+        The series of students which are only stored in the table ibi_series are decoded.
+
+        :param term: str, should be one of {'mid1', 'mid2', 'final'}.
+        :param time_range: tuple(int, int), The first and the last Unix timestamp of the intervals.
+        :return: Dict[str, np.ndarray], The columns 'student' and 'ibi_value' (in ms), ordered by student.
+        """
+        term_id = TERMS.index(term) + 1
+        query = ('FROM inter_beat_interval ibi JOIN dataset d ON ibi.student_id = d.id '
+                 'WHERE ibi.term_id = %s AND ibi.timestamp BETWEEN %s AND %s')
+        select = {'student_id': np.int64, **EXAM_COLUMNS}
+        params = (term_id,) + tuple(time_range)
+        rows = self._fetch_counted('d.id, d.student, ibi.ibi_value', query, params, select, 'ORDER BY ibi.student_id')
+
+        # the students of the term, whose series is only stored as blob
+        blobs = self._blob_series(BLOB_SELECT + 'WHERE s.term_id = %s AND NOT EXISTS (SELECT 1 FROM inter_beat_interval '
+                                  'ibi WHERE ibi.student_id = s.student_id AND ibi.term_id = %s)',
+                                  (term_id, term_id), time_range)
+        if blobs:
+            lengths = [len(interval) for *_, interval in blobs]
+            rows = {'student_id': np.concatenate([rows['student_id'], np.repeat([blob[0] for blob in blobs], lengths)]),
+                    'student': np.concatenate([rows['student'], np.repeat([blob[1] for blob in blobs], lengths)]),
+                    'ibi_value': np.concatenate([rows['ibi_value']] + [interval for *_, interval in blobs])}
+            order = np.argsort(rows['student_id'], kind='stable')
+            rows = {name: column[order].astype(select[name]) for name, column in rows.items()}
+
+        return {name: rows[name] for name in EXAM_COLUMNS}
+
+    def segments(self, student: str, term: str, min_ibi: int = 1,
+                 time_range: Tuple[int, int] = None) -> Dict[str, np.ndarray]:
+        """
+        Read the segments of contiguous beats of a student and term from the table ibi_segment.
+
+        :param student: str, The identifier of the student, e.g. 'S1'.
+        :param term: str, should be one of {'mid1', 'mid2', 'final'}.
+        :param min_ibi: int, Segments with less intervals are skipped.
+        :param time_range: tuple(int, int), Optional. Only segments overlapping this range of
+            Unix timestamps are read. Default is None, meaning all segments.
+        :return: Dict[str, np.ndarray], The columns of `SEGMENT_COLUMNS`, ordered by start time.
+        """
+        query = ('FROM ibi_segment WHERE student_id = (SELECT id FROM dataset WHERE student = %s) '
+                 'AND term_id = %s AND number_of_ibi >= %s')
+        params = (student, TERMS.index(term) + 1, min_ibi)
+        if time_range is not None:
+            query += ' AND end_time >= %s AND start_time <= %s'
+            params += tuple(time_range)
+        return self._fetch_counted(', '.join(SEGMENT_COLUMNS), query, params, SEGMENT_COLUMNS, 'ORDER BY segment_id')
+
+    def window_values(self, student: str, term: str, parameter_id: int = None, time_range: Tuple[int, int] = None,
+                      window_spec_id: int = 1) -> Dict[str, np.ndarray]:
+        """
+        Read the HRV parameters of the moving windows of a student and term from the table window_values.
+
+        :param student: str, The identifier of the student, e.g. 'S1'.
+        :param term: str, should be one of {'mid1', 'mid2', 'final'}.
+        :param parameter_id: int, Optional. The id of a parameter in the table hrv. Default is None, meaning all.
+        :param time_range: tuple(int, int), Optional. The first and the last Unix timestamp of the
+            windows to be read. Default is None, meaning all windows.
+        :param window_spec_id: int, The id of a window spec in the table window_spec. Default is 1,
+            meaning the 5-minute windows. None means all specs, which have different lengths.
+        :return: Dict[str, np.ndarray], The columns of `WINDOW_COLUMNS`, ordered by spec, window and parameter.
+        """
+        query = ('FROM window_values WHERE student_id = (SELECT id FROM dataset WHERE student = %s) '
+                 'AND term_id = %s')
+        params = (student, TERMS.index(term) + 1)
+        if window_spec_id is not None:
+            query += ' AND window_spec_id = %s'
+            params += (window_spec_id,)
+        if time_range is not None:
+            query += ' AND timestamp BETWEEN %s AND %s'
+            params += tuple(time_range)
+        if parameter_id is not None:
+            query += ' AND parameter_id = %s'
+            params += (parameter_id,)
+        return self._fetch_counted(', '.join(WINDOW_COLUMNS), query, params, WINDOW_COLUMNS,
+                                   'ORDER BY window_spec_id, window_id, parameter_id')
+
+    def exam_window(self, min_ibi: int = 1) -> Dict[str, np.ndarray]:
+        """
+        Read the aggregated intervals of the exam periods of all students and terms from the table exam_window.
+
+        The aggregates are calculated at ingest (see `InterBeatInterval.exam_window`), so the
+        intervals of the exam periods aren't read again. Values which couldn't be calculated are NaN.
+
+        :param min_ibi: int, Students and terms with less intervals in the exam period are skipped.
+        :return: Dict[str, np.ndarray], The columns of `EXAM_WINDOW_COLUMNS`, ordered by student and term.
+        """
+        query = ('FROM exam_window w JOIN dataset d ON w.student_id = d.id JOIN exam e ON w.term_id = e.id '
+                 'WHERE w.number_of_ibi >= %s')
+        select = 'd.student, e.term, w.number_of_ibi, w.nni_mean, w.sdnn, w.coverage'
+        return self._fetch_counted(select, query, (min_ibi,), EXAM_WINDOW_COLUMNS, 'ORDER BY w.student_id, w.term_id')
+
+    def master_data(self) -> Dict[str, np.ndarray]:
+        """
+        Read the master data of all students and terms.
+
+        :return: Dict[str, np.ndarray], The columns of `MASTER_COLUMNS`, ordered by student and term.
+        """
+        query = 'FROM master_data md JOIN dataset d ON md.student_id = d.id JOIN exam e ON md.term_id = e.id'
+        select = 'd.student, e.term, md.grade, md.nni_mean, md.sdnn, md.number_of_ibi, md.duration_in_h'
+        return self._fetch_counted(select, query, (), MASTER_COLUMNS, 'ORDER BY md.student_id, md.term_id')
+
+
+@contextmanager
+def open_reader(database: str = sql_database.schema, fetch_size: int = FETCH_SIZE, **config):
+    """
+    Connect to the MySQL database (on localhost by default) and provide a reader with an unbuffered cursor.
+
+    :param database: str, The name of the schema.
+    :param fetch_size: int, Maximum number of rows fetched at once.
+    :param config: Further keyword arguments passed to `sql_database.connect` (host, user, password, ...).
+    :yield: QueryReader, The reader of the database.
+    """
+    with sql_database.connect_to_localhost(database, **config) as db:
+        cursor = db.cursor(buffered=False)
+        try:
+            yield QueryReader(cursor, '%s', fetch_size)
+        finally:
+            cursor.close()
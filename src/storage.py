@@ -0,0 +1,674 @@
+"""
+Storage Module
+-------------------
+
+This module decouples the processing of the data from the database it is stored in.
+`StorageBackend` defines the operations needed by `main.process_data`: creation of the
+schema, insertion of a student, bulk insertion into the fact tables inter_beat_interval,
+master_data, exam_window and window_values and the ingestion ledger, which records a
+fingerprint of the input data of every student and term.
+
+The raw IBI series are stored one row per heartbeat in inter_beat_interval ('rows'), as one
+compressed binary blob per student and term in ibi_series ('blob', see `codec`) or in both
+tables ('both'). `read_ibi_series` returns a series as NumPy arrays from either table.
+The segments of contiguous beats of every series are stored in ibi_segment.
+
+The sampled signals are inserted chunk by chunk into a table per signal (`insert_signal`),
+so a recording is never held in memory as a whole.
+
+`reload` provides a non-interactive full load: the data is written into staging tables
+without secondary indexes and constraint checks, the indexes are built after the load and the
+staging tables replace the tables at once, so readers never see a partially loaded database.
+
+Two implementations are provided:
+- `MySQLBackend`: The MySQL database on localhost, using the functionality of `sql_database`.
+- `SQLiteBackend`: An embedded SQLite database in a single file, which needs no server.
+  It is meant for fast local runs, benchmarks and tests of the whole processing.
+
+:Modul: storage
+:Author: Benjamin Gaube
+:Date: 2023-10-12
+"""
+
+import os
+import sqlite3
+import tempfile
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Any, Tuple, Iterable
+
+import numpy as np
+
+from src import sql_database
+from src.codec import encode_series, decode_series
+from src.metrics import timed
+from src.hrv import HRV_PARAMETERS
+from src.event_series import SIGNALS, SignalChunk, WINDOW_SPECS, TERMS
+from src.sql_database import ConnectionPool, columns_to_rows, FACT_TABLES, SIGNAL_TABLES, SIGNAL_TYPES
+
+IBI_STORAGE_MODES = ['rows', 'blob', 'both']
+
+
+class StorageBackend(ABC):
+    """
+    Interface of a database storing the processed data.
+
+    The bulk methods take the columns as NumPy arrays. Everything written inside one
+    `transaction` is committed at once when the transaction ends without error.
+
+    :cvar placeholder: str, The placeholder of parameters in SQL statements of the database.
+    :ivar ibi_storage: str, Where the raw IBI series are stored, one of `IBI_STORAGE_MODES`.
+    """
+
+    placeholder = '%s'
+    ibi_storage = 'rows'
+
+    @abstractmethod
+    def create_schema(self, drop_existing: bool = None, indexes: bool = True) -> None:
+        """
+        Create the tables of the schema and fill the lookup tables exam and hrv.
+
+        :param drop_existing: bool, Optional. Whether existing data is dropped (True) or retained (False).
+        :param indexes: bool, Whether the secondary indexes for time range queries are created.
+        """
+
+    @abstractmethod
+    @contextmanager
+    def reload(self):
+        """
+        Replace all data of the database by a new load without asking.
+
+        The yielded backend writes into empty staging tables, which are created without the
+        secondary indexes. When the block ends without error, the indexes are built and the
+        staging tables replace the tables at once. On an error, the staging tables are dropped
+        and the data of the database is left unchanged.
+
+        :yield: StorageBackend, The backend of the staging tables.
+        """
+
+    @abstractmethod
+    @contextmanager
+    def transaction(self):
+        """
+        Open a transaction, which is committed at the end or rolled back on an error.
+
+        :yield: A DB-API cursor to be passed to the insert methods.
+        """
+
+    @abstractmethod
+    def insert_student(self, cursor, student: str) -> int:
+        """
+        Insert a student into the table dataset, replacing an existing entry with all its data.
+
+        :param cursor: The cursor of the transaction.
+        :param student: str, The identifier of the student, e.g. 'S1'.
+        :return: int, The id of the student in the table dataset.
+        """
+
+    @abstractmethod
+    def insert_rows(self, cursor, table: str, columns: Dict[str, Any]) -> int:
+        """
+        Insert columnar data into a table, see `sql_database.insert_rows`.
+
+        :param cursor: The cursor of the transaction.
+        :param table: str, Name of the table to insert into.
+        :param columns: Dict[str, Any], Mapping of column names to arrays or scalars.
+        :return: int, Number of inserted rows.
+        """
+
+    def close(self) -> None:
+        """
+        Release all connections of the backend.
+        """
+
+    def insert_ibi(self, cursor, student_id: int, term_id: int, interval: np.ndarray, time: np.ndarray) -> int:
+        """
+        Store the IBI series of a student and term in the table inter_beat_interval
+        and/or ibi_series, depending on `ibi_storage`.
+
+        :param cursor: The cursor of the transaction.
+        :param student_id: int, The id of the student in the table dataset.
+        :param term_id: int, The id of the term in the table exam.
+        :param interval: np.ndarray, The inter-beat intervals in ms.
+        :param time: np.ndarray, The Unix timestamps of the intervals.
+        :return: int, Number of inserted rows.
+        """
+        n_rows = 0
+        if self.ibi_storage in ('rows', 'both'):
+            n_rows += self.insert_rows(cursor, 'inter_beat_interval', {
+                'student_id': student_id,
+                'term_id': term_id,
+                'ibi_value_id': np.arange(1, len(interval) + 1),
+                'ibi_value': interval,
+                'timestamp': time
+            })
+        if self.ibi_storage in ('blob', 'both'):
+            start_time, time_blob, interval_blob = encode_series(time, interval)
+            n_rows += self.insert_rows(cursor, 'ibi_series', {
+                'student_id': student_id,
+                'term_id': term_id,
+                'number_of_ibi': len(interval),
+                'start_time': start_time,
+                'time_blob': time_blob,
+                'interval_blob': interval_blob
+            })
+        return n_rows
+
+    def read_ibi_series(self, cursor, student_id: int, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Read the IBI series of a student and term into NumPy arrays.
+
+        The series is decoded from the table ibi_series. If it isn't stored there,
+        it is read from the rows of inter_beat_interval.
+
+        :param cursor: The cursor of the transaction.
+        :param student_id: int, The id of the student in the table dataset.
+        :param term_id: int, The id of the term in the table exam.
+        :return: tuple(np.ndarray, np.ndarray), The Unix timestamps and the inter-beat intervals in ms.
+        """
+        cursor.execute(f'SELECT start_time, time_blob, interval_blob, number_of_ibi FROM ibi_series '
+                       f'WHERE student_id = {self.placeholder} AND term_id = {self.placeholder}',
+                       (student_id, term_id))
+        row = cursor.fetchone()
+        if row is not None:
+            return decode_series(*row)
+
+        cursor.execute(f'SELECT timestamp, ibi_value FROM inter_beat_interval '
+                       f'WHERE student_id = {self.placeholder} AND term_id = {self.placeholder} '
+                       f'ORDER BY ibi_value_id', (student_id, term_id))
+        rows = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 2)
+        return rows[:, 0], rows[:, 1]
+
+    def insert_master(self, cursor, student_id: int, term_id: int,
+                      master: Tuple[int, float, float, int, float]) -> int:
+        """
+        Fill the table master_data with the values of a whole recording.
+
+        :param cursor: The cursor of the transaction.
+        :param student_id: int, The id of the student in the table dataset.
+        :param term_id: int, The id of the term in the table exam.
+        :param master: Tuple, The values grade, nni_mean, sdnn, number_of_ibi and duration_in_h.
+        :return: int, Number of inserted rows.
+        """
+        grade, nni_mean, sdnn, number_of_ibi, duration = master
+        return self.insert_rows(cursor, 'master_data', {
+            'student_id': student_id,
+            'term_id': term_id,
+            'grade': grade,
+            'nni_mean': nni_mean,
+            'sdnn': sdnn,
+            'number_of_ibi': number_of_ibi,
+            'duration_in_h': duration
+        })
+
+    def insert_exam_window(self, cursor, student_id: int, term_id: int, exam_window: Dict[str, float]) -> int:
+        """
+        Fill the table exam_window with the aggregated intervals of the exam period.
+
+        :param cursor: The cursor of the transaction.
+        :param student_id: int, The id of the student in the table dataset.
+        :param term_id: int, The id of the term in the table exam.
+        :param exam_window: Dict[str, float], The results of `InterBeatInterval.exam_window`.
+        :return: int, Number of inserted rows.
+        """
+        return self.insert_rows(cursor, 'exam_window', {
+            'student_id': student_id,
+            'term_id': term_id,
+            'number_of_ibi': exam_window['number_of_ibi'],
+            'nni_mean': exam_window['nni_mean'],
+            'sdnn': exam_window['sdnn'],
+            'coverage': exam_window['coverage']
+        })
+
+    def insert_segments(self, cursor, student_id: int, term_id: int, segments: Dict[str, np.ndarray]) -> int:
+        """
+        Fill the table ibi_segment with one row per segment of contiguous beats.
+
+        :param cursor: The cursor of the transaction.
+        :param student_id: int, The id of the student in the table dataset.
+        :param term_id: int, The id of the term in the table exam.
+        :param segments: Dict[str, np.ndarray], The columnar results of `InterBeatInterval.segments`.
+        :return: int, Number of inserted rows.
+        """
+        if len(segments['segment_id']) == 0:
+            return 0
+        return self.insert_rows(cursor, 'ibi_segment', {'student_id': student_id, 'term_id': term_id, **segments})
+
+    def insert_windows(self, cursor, student_id: int, term_id: int, windows: Dict[str, np.ndarray],
+                       min_ibi: int = 3) -> int:
+        """
+        Fill the table window_values with one row per window and HRV parameter of `hrv.HRV_PARAMETERS`.
+        Without the columns 'window_spec_id' and 'window_id', the windows are the 5-minute windows
+        numbered in their order.
+
+        :param cursor: The cursor of the transaction.
+        :param student_id: int, The id of the student in the table dataset.
+        :param term_id: int, The id of the term in the table exam.
+        :param windows: Dict[str, np.ndarray], The columnar results of `moving_windows_hrv`.
+        :param min_ibi: int, Windows with less intervals are skipped, as well as values which are NaN.
+        :return: int, Number of inserted rows.
+        """
+        hrv_parameters = np.column_stack([windows[parameter] for parameter in HRV_PARAMETERS])
+        stored = (windows['number_of_ibi'] >= min_ibi)[:, None] & ~np.isnan(hrv_parameters)
+        window, parameter = np.nonzero(stored)
+        spec_ids, window_ids = windows.get('window_spec_id'), windows.get('window_id')
+
+        return self.insert_rows(cursor, 'window_values', {
+            'student_id': student_id,
+            'term_id': term_id,
+            'window_spec_id': 1 if spec_ids is None else spec_ids[window],
+            'window_id': window + 1 if window_ids is None else window_ids[window],
+            'timestamp': windows['time'][window],
+            'parameter_id': parameter + 1,
+            'hrv_value': hrv_parameters[window, parameter],
+            'number_of_ibi': windows['number_of_ibi'][window]
+        })
+
+    def insert_signal(self, cursor, student_id: int, term_id: int, signal: str,
+                      chunks: Iterable[SignalChunk]) -> int:
+        """
+        Store a sampled signal of a student and term chunk by chunk in the table of the signal
+        and its start time and sample rate in the table signal_recording.
+
+        :param cursor: The cursor of the transaction.
+        :param student_id: int, The id of the student in the table dataset.
+        :param term_id: int, The id of the term in the table exam.
+        :param signal: str, The name of the signal, one of `event_series.SIGNALS`.
+        :param chunks: Iterable[SignalChunk], The chunks of the recording, see `SignalSeries.chunks`.
+        :return: int, Number of inserted rows.
+        """
+        n_samples, first = 0, None
+        for chunk in chunks:
+            columns = {'student_id': student_id,
+                       'term_id': term_id,
+                       'sample_index': np.arange(chunk.first_sample, chunk.first_sample + len(chunk.values))}
+            for k, column in enumerate(SIGNALS[signal]):
+                columns[column] = chunk.values[:, k]
+            n_samples += self.insert_rows(cursor, SIGNAL_TABLES[signal], columns)
+            first = chunk if first is None else first
+
+        if first is None:
+            return 0
+        return n_samples + self.insert_rows(cursor, 'signal_recording', {
+            'student_id': student_id,
+            'term_id': term_id,
+            'signal_name': signal,
+            'start_time': first.time[0],
+            'sample_rate': first.sample_rate,
+            'number_of_samples': n_samples
+        })
+
+    def load_ledger(self, cursor) -> Dict[str, Tuple[int, Dict[int, str]]]:
+        """
+        Read the ingestion ledger of all stored students.
+
+        :param cursor: The cursor of the transaction.
+        :return: Dict[str, Tuple[int, Dict[int, str]]], Mapping of the student identifiers
+            to their id in the table dataset and the fingerprints of the stored terms by term_id.
+        """
+        cursor.execute('SELECT d.student, d.id, l.term_id, l.fingerprint FROM dataset d '
+                       'LEFT JOIN ingestion_ledger l ON l.student_id = d.id')
+
+        ledger = {}
+        for student, student_id, term_id, fingerprint in cursor.fetchall():
+            _, fingerprints = ledger.setdefault(student, (student_id, {}))
+            if term_id is not None:
+                fingerprints[term_id] = fingerprint
+        return ledger
+
+    def delete_term(self, cursor, student_id: int, term_id: int) -> None:
+        """
+        Delete the data of a student and term from the fact tables and the ledger.
+
+        :param cursor: The cursor of the transaction.
+        :param student_id: int, The id of the student in the table dataset.
+        :param term_id: int, The id of the term in the table exam.
+        """
+        for table in FACT_TABLES:
+            cursor.execute(f'DELETE FROM {table} WHERE student_id = {self.placeholder} '
+                           f'AND term_id = {self.placeholder}', (student_id, term_id))
+
+    def record_fingerprint(self, cursor, student_id: int, term_id: int, fingerprint: str) -> None:
+        """
+        Store the fingerprint of the input data of a student and term in the ingestion ledger.
+
+        :param cursor: The cursor of the transaction.
+        :param student_id: int, The id of the student in the table dataset.
+        :param term_id: int, The id of the term in the table exam.
+        :param fingerprint: str, The fingerprint, see `Student.fingerprint`.
+        """
+        cursor.execute(f'DELETE FROM ingestion_ledger WHERE student_id = {self.placeholder} '
+                       f'AND term_id = {self.placeholder}', (student_id, term_id))
+        self.insert_rows(cursor, 'ingestion_ledger',
+                         {'student_id': student_id, 'term_id': term_id, 'fingerprint': fingerprint})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class MySQLBackend(StorageBackend):
+    """
+    Storage in a MySQL database, using a pool of connections.
+
+    :ivar database: str, The name of the schema.
+    :ivar pool: ConnectionPool, The pool providing the connections.
+    :ivar batch_size: int, Maximum number of rows per INSERT statement.
+    :ivar partition: bool, Whether the fact tables are partitioned by term_id, see `sql_database.create_schema`.
+    :ivar bulk_load: bool, Whether the transactions skip the foreign key and unique checks.
+
+    :param database: str, The name of the schema.
+    :param pool_size: int, Maximum number of open connections.
+    :param batch_size: int, Maximum number of rows per INSERT statement.
+    :param partition: bool, Whether the fact tables are partitioned by term_id when the schema is created.
+    :param ibi_storage: str, Where the raw IBI series are stored, one of `IBI_STORAGE_MODES`.
+    :param bulk_load: bool, Whether the transactions skip the foreign key and unique checks,
+        only meant for the staging schema of `reload`.
+    :param config: Further keyword arguments passed to `sql_database.connect` (host, user, ...), used by the
+        connections of the pool as well as of the schema changes.
+    """
+
+    def __init__(self, database: str = sql_database.schema, pool_size: int = 1,
+                 batch_size: int = sql_database.BATCH_SIZE, partition: bool = False,
+                 ibi_storage: str = 'rows', bulk_load: bool = False, **config):
+        if ibi_storage not in IBI_STORAGE_MODES:
+            raise ValueError(f'ibi_storage has to be one of {IBI_STORAGE_MODES}, not {ibi_storage!r}.')
+        self.database = database
+        self.pool = ConnectionPool(database, pool_size=pool_size, **config)
+        self.batch_size = batch_size
+        self.partition = partition
+        self.ibi_storage = ibi_storage
+        self.bulk_load = bulk_load
+        self._config = config
+
+    def create_schema(self, drop_existing: bool = None, indexes: bool = True) -> None:
+        sql_database.create_schema(self.database, drop_existing, self.partition, indexes, **self._config)
+
+    @contextmanager
+    def reload(self):
+        staging_name = self.database + sql_database.STAGING_SUFFIX
+        staging = MySQLBackend(staging_name, self.pool.pool_size, self.batch_size, self.partition,
+                               self.ibi_storage, bulk_load=True, **self._config)
+        try:
+            staging.create_schema(drop_existing=True, indexes=False)
+            yield staging
+        except BaseException:
+            staging.close()
+            sql_database.drop_schema(staging_name, **self._config)
+            raise
+        staging.close()
+
+        sql_database.add_indexes(staging_name, **self._config)
+        # connections of the pool may hold metadata locks on the old tables
+        self.pool.close()
+        sql_database.swap_schema(staging_name, self.database, **self._config)
+
+    @contextmanager
+    def transaction(self):
+        with self.pool.connection() as db:
+            cursor = db.cursor()
+            if self.bulk_load:
+                # the staging tables are empty and only written by this run
+                cursor.execute('SET foreign_key_checks = 0')
+                cursor.execute('SET unique_checks = 0')
+            yield cursor
+            with timed('commit'):
+                db.commit()
+
+    def insert_student(self, cursor, student: str) -> int:
+        return sql_database.insert_student(cursor, student)
+
+    def insert_rows(self, cursor, table: str, columns: Dict[str, Any]) -> int:
+        return sql_database.insert_rows(cursor, table, columns, self.batch_size)
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Storage in an embedded SQLite database.
+
+    The database runs in WAL mode with relaxed synchronisation, which is safe against
+    corruption but may lose the last transactions on a power failure. Rows are inserted
+    with `executemany`.
+
+    :ivar path: str, The path to the database file, or ':memory:'.
+
+    :param path: str, The path to the database file, or ':memory:'.
+    :param ibi_storage: str, Where the raw IBI series are stored, one of `IBI_STORAGE_MODES`.
+    """
+
+    placeholder = '?'
+
+    SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS dataset (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student VARCHAR(5) UNIQUE
+    );
+    CREATE TABLE IF NOT EXISTS exam (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        term VARCHAR(10)
+    );
+    CREATE TABLE IF NOT EXISTS hrv (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        parameter VARCHAR(15)
+    );
+    CREATE TABLE IF NOT EXISTS inter_beat_interval (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INT REFERENCES dataset(id) ON DELETE CASCADE,
+        term_id INT REFERENCES exam(id),
+        ibi_value_id INT,
+        ibi_value INT,
+        timestamp INT
+    );
+    CREATE TABLE IF NOT EXISTS ibi_series (
+        student_id INT REFERENCES dataset(id) ON DELETE CASCADE,
+        term_id INT REFERENCES exam(id),
+        number_of_ibi INT,
+        start_time INT,
+        time_blob BLOB,
+        interval_blob BLOB,
+        PRIMARY KEY (student_id, term_id)
+    );
+    CREATE TABLE IF NOT EXISTS ibi_segment (
+        student_id INT REFERENCES dataset(id) ON DELETE CASCADE,
+        term_id INT REFERENCES exam(id),
+        segment_id INT,
+        start_time INT,
+        end_time INT,
+        number_of_ibi INT,
+        duration_in_ms INT,
+        gap_in_s INT,
+        PRIMARY KEY (student_id, term_id, segment_id)
+    );
+    CREATE TABLE IF NOT EXISTS master_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INT REFERENCES dataset(id) ON DELETE CASCADE,
+        term_id INT REFERENCES exam(id),
+        grade INT,
+        nni_mean FLOAT,
+        sdnn FLOAT,
+        number_of_ibi INT,
+        duration_in_h FLOAT
+    );
+    CREATE TABLE IF NOT EXISTS exam_window (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INT REFERENCES dataset(id) ON DELETE CASCADE,
+        term_id INT REFERENCES exam(id),
+        number_of_ibi INT,
+        nni_mean FLOAT,
+        sdnn FLOAT,
+        coverage FLOAT,
+        UNIQUE (student_id, term_id)
+    );
+    CREATE TABLE IF NOT EXISTS window_spec (
+        id INTEGER PRIMARY KEY,
+        name VARCHAR(10),
+        length_in_s INT,
+        step_in_s INT
+    );
+    CREATE TABLE IF NOT EXISTS window_values (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INT REFERENCES dataset(id) ON DELETE CASCADE,
+        term_id INT REFERENCES exam(id),
+        window_spec_id INT NOT NULL DEFAULT 1 REFERENCES window_spec(id),
+        window_id INT,
+        timestamp INT,
+        parameter_id INT REFERENCES hrv(id),
+        hrv_value FLOAT,
+        number_of_ibi INT
+    );
+    CREATE TABLE IF NOT EXISTS ingestion_ledger (
+        student_id INT REFERENCES dataset(id) ON DELETE CASCADE,
+        term_id INT REFERENCES exam(id),
+        fingerprint VARCHAR(64),
+        PRIMARY KEY (student_id, term_id)
+    );
+    CREATE TABLE IF NOT EXISTS signal_recording (
+        student_id INT REFERENCES dataset(id) ON DELETE CASCADE,
+        term_id INT REFERENCES exam(id),
+        signal_name VARCHAR(4),
+        start_time DOUBLE,
+        sample_rate FLOAT,
+        number_of_samples INT,
+        PRIMARY KEY (student_id, term_id, signal_name)
+    );
+    '''
+
+    INDEXES = '''
+    CREATE INDEX IF NOT EXISTS ibi_student_term_time ON inter_beat_interval (student_id, term_id, timestamp);
+    CREATE INDEX IF NOT EXISTS ibi_term_time ON inter_beat_interval (term_id, timestamp);
+    CREATE INDEX IF NOT EXISTS master_student ON master_data (student_id);
+    CREATE INDEX IF NOT EXISTS window_student_term_spec_time ON window_values (student_id, term_id, window_spec_id,
+                                                                              timestamp);
+    CREATE INDEX IF NOT EXISTS window_term_spec_time ON window_values (term_id, window_spec_id, timestamp);
+    -- the indexes of older schemas without the window spec
+    DROP INDEX IF EXISTS window_student_term_time;
+    DROP INDEX IF EXISTS window_term_time;
+    '''
+    LOOKUP_TABLES = ['dataset', 'exam', 'hrv', 'window_spec']  # parents of the fact tables
+
+    def __init__(self, path: str = ':memory:', ibi_storage: str = 'rows', foreign_keys: bool = True):
+        if ibi_storage not in IBI_STORAGE_MODES:
+            raise ValueError(f'ibi_storage has to be one of {IBI_STORAGE_MODES}, not {ibi_storage!r}.')
+        self.path = path
+        self.ibi_storage = ibi_storage
+        self.db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        if path != ':memory:':
+            self.db.execute('PRAGMA journal_mode = WAL')
+        self.db.execute('PRAGMA synchronous = NORMAL')
+        self.db.execute(f'PRAGMA foreign_keys = {"ON" if foreign_keys else "OFF"}')
+
+    @staticmethod
+    def _execute_script(cursor, script: str) -> None:
+        for statement in script.split(';'):
+            if statement.strip():
+                cursor.execute(statement)
+
+    def _create_tables(self, cursor, drop_existing: bool = None) -> None:
+        """ create the tables of the schema without the indexes of `INDEXES` """
+        if drop_existing:
+            for table in FACT_TABLES[::-1] + self.LOOKUP_TABLES[::-1]:
+                cursor.execute(f'DROP TABLE IF EXISTS {table}')
+
+        self._execute_script(cursor, self.SCHEMA)
+
+        # window_values of older schemas only contain 5-minute windows
+        if 'window_spec_id' not in {row[1] for row in cursor.execute('PRAGMA table_info(window_values)')}:
+            cursor.execute('ALTER TABLE window_values ADD COLUMN window_spec_id INT NOT NULL DEFAULT 1')
+
+        for signal, table in SIGNAL_TABLES.items():
+            value_columns = ''.join(f'{column} {SIGNAL_TYPES.get(signal, "FLOAT")}, ' for column in SIGNALS[signal])
+            cursor.execute(f'CREATE TABLE IF NOT EXISTS {table} (student_id INT REFERENCES dataset(id) '
+                           f'ON DELETE CASCADE, term_id INT REFERENCES exam(id), sample_index INT, '
+                           f'{value_columns}PRIMARY KEY (student_id, term_id, sample_index))')
+
+    def create_schema(self, drop_existing: bool = None, indexes: bool = True) -> None:
+        with self.transaction() as cursor:
+            self._create_tables(cursor, drop_existing)
+            if indexes:
+                self._execute_script(cursor, self.INDEXES)
+
+            if cursor.execute('SELECT COUNT(*) FROM exam').fetchone()[0] == 0:
+                cursor.executemany('INSERT INTO exam (term) VALUES (?)', [(term,) for term in TERMS])
+
+            # parameters added to the registry after the schema was created are appended
+            stored = {row[0] for row in cursor.execute('SELECT id FROM hrv').fetchall()}
+            cursor.executemany('INSERT INTO hrv (id, parameter) VALUES (?, ?)',
+                               [(i, par) for i, par in enumerate(HRV_PARAMETERS, start=1) if i not in stored])
+
+            stored = {row[0] for row in cursor.execute('SELECT id FROM window_spec').fetchall()}
+            cursor.executemany('INSERT INTO window_spec (id, name, length_in_s, step_in_s) VALUES (?, ?, ?, ?)',
+                               [(i, name, length, step) for i, (name, (length, step))
+                                in enumerate(WINDOW_SPECS.items(), start=1) if i not in stored])
+
+    @contextmanager
+    def reload(self):
+        """
+        Replace all data of the database by a new load without asking.
+
+        The data is loaded into a staging database file without indexes and foreign key checks.
+        Afterwards, it is attached and copied in one transaction, which drops and recreates the
+        tables, copies the rows and builds the indexes. As readers of a database in WAL mode
+        see the last committed state, they see the old data until the commit.
+
+        :yield: SQLiteBackend, The backend of the staging database.
+        """
+        if self.path == ':memory:':
+            handle, staging_path = tempfile.mkstemp(suffix='.db')
+            os.close(handle)
+        else:
+            staging_path = self.path + '.staging'
+        try:
+            with SQLiteBackend(staging_path, self.ibi_storage, foreign_keys=False) as staging:
+                staging.create_schema(drop_existing=True, indexes=False)
+                yield staging
+
+            self.db.execute('ATTACH DATABASE ? AS staging', (staging_path,))
+            try:
+                with self.transaction() as cursor:
+                    cursor.execute('PRAGMA defer_foreign_keys = ON')
+                    self._create_tables(cursor, drop_existing=True)
+                    for table in self.LOOKUP_TABLES + FACT_TABLES:
+                        cursor.execute(f'INSERT INTO main.{table} SELECT * FROM staging.{table}')
+                    self._execute_script(cursor, self.INDEXES)
+            finally:
+                self.db.execute('DETACH DATABASE staging')
+        finally:
+            for suffix in ['', '-wal', '-shm']:
+                if os.path.exists(staging_path + suffix):
+                    os.remove(staging_path + suffix)
+
+    @contextmanager
+    def transaction(self):
+        cursor = self.db.cursor()
+        cursor.execute('BEGIN')
+        try:
+            yield cursor
+        except BaseException:
+            cursor.execute('ROLLBACK')
+            raise
+        with timed('commit'):
+            cursor.execute('COMMIT')
+
+    def insert_student(self, cursor, student: str) -> int:
+        try:
+            cursor.execute('INSERT INTO dataset (student) VALUES (?)', (student,))
+        except sqlite3.IntegrityError:
+            print(f'Duplicate entry {student} for key student detected. Rewriting...')
+            cursor.execute('DELETE FROM dataset WHERE student = ?', (student,))
+            cursor.execute('INSERT INTO dataset (student) VALUES (?)', (student,))
+        return cursor.lastrowid
+
+    def insert_rows(self, cursor, table: str, columns: Dict[str, Any]) -> int:
+        rows = columns_to_rows(table, columns)
+        placeholder = ', '.join(['?'] * len(columns))
+        cursor.executemany(f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({placeholder})', rows)
+
+        return len(rows)
+
+    def close(self) -> None:
+        self.db.close()
@@ -14,11 +14,15 @@ The static methode provides functionality to get the grades from a specific txt-
 """
 
 
+import io
 import os
 import re
+import locale
 from typing import Dict
 
-from src.event_series import InterBeatInterval
+from src.archive import DatasetArchive, list_dir, open_file, file_fingerprint
+from src.cache import ArrayCache
+from src.event_series import InterBeatInterval, TERMS
 
 
 class Student:
@@ -32,13 +36,17 @@ class Student:
     :ivar path: str, Absolute path to the student's data directory.
     :ivar student_id: str, A unique identifier for the student.
     :ivar grades: dict, Nested dictionary containing the student's grade information.
+    :ivar archive: DatasetArchive or None, The archive containing the data, if it isn't extracted.
+    :ivar cache: ArrayCache or None, The cache of the parsed IBI files (see `InterBeatInterval`).
     :ivar _ibi: InterBeatInterval or None, An object that stores and manages the student's IBI data.
     """
 
-    def __init__(self, temp_path, student_id, grades):
+    def __init__(self, temp_path, student_id, grades, archive: DatasetArchive = None, cache: ArrayCache = None):
         self.path = os.path.join(temp_path, student_id)
         self.student_id = student_id
         self.grades = grades
+        self.archive = archive
+        self.cache = cache
         self._ibi = None
 
     @property
@@ -61,19 +69,33 @@ class Student:
 
         check_content = ['Final', 'Midterm 1', 'Midterm 2']
 
+        content = list_dir(temp_dir, self.archive)
         for entry in check_content:
-            if entry not in os.listdir(temp_dir):
+            if entry not in content:
                 raise FileNotFoundError(f'Missing {entry} folder in {temp_dir}')
 
         # initialize object
-        self._ibi = InterBeatInterval(temp_dir)
+        self._ibi = InterBeatInterval(temp_dir, self.archive, self.cache)
+
+    def fingerprint(self, term: str) -> str:
+        """
+        Return a fingerprint of all input data of a term: the IBI file and the grade.
+
+        :param term: str, should be one of {'mid1', 'mid2', 'final'}.
+        :return: str, The fingerprint, which changes if the IBI data or the grade changes.
+        """
+
+        grade = self.grades[TERMS.index(term)]
+        ibi_path = os.path.join(self.path, InterBeatInterval.term_folders[term], 'IBI.csv')
+        return f'{file_fingerprint(ibi_path, self.archive)}-{grade}'
 
     @staticmethod
-    def extract_grades(file_path: str) -> Dict[str, Dict[str, int]]:
+    def extract_grades(file_path: str, archive: DatasetArchive = None) -> Dict[str, Dict[str, int]]:
         """
         Extracts grade information from a text file and organizes it in a nested dictionary.
 
         :param file_path: str, path to the text file containing the grade information.
+        :param archive: DatasetArchive, Optional. If given, the text file is read from this archive.
         :return: Dict[str, Dict[str, int]], a nested dictionary containing the organized grade information.
         """
 
@@ -83,7 +105,8 @@ class Student:
             'FINAL (OUT OF 200)': 'final'
         }
 
-        with open(file_path, 'r') as file:
+        # decoded like open(file_path, 'r') would do
+        with io.TextIOWrapper(open_file(file_path, archive), encoding=locale.getpreferredencoding(False)) as file:
             lines = file.readlines()
 
         grades = {}
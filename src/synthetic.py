@@ -0,0 +1,205 @@
+"""
+Synthetic Module
+-------------------
+
+This module generates zip-files with the layout of the downloaded dataset, filled with
+random data, so the processing can be tested and benchmarked without the real data:
+
+<folder>.zip
+    <folder>/StudentGrades.txt
+    <folder>/Data.zip
+        Data/S1/Final/IBI.csv
+        Data/S1/Midterm 1/IBI.csv
+        Data/S1/Midterm 2/IBI.csv
+        ...
+
+Optionally, the term folders contain the sampled signals of the wristband (BVP.csv, ACC.csv, ...).
+
+The IBI.csv files have the format of the Empatica E4 wristband: a header with the Unix time
+of the start of the recording, followed by the time of every detected beat relative to the start
+and the interval to the previous beat, both in seconds and in multiples of 1/64 s. The recording
+covers the exam period (`InterBeatInterval.term_periods`) and contains gaps of missing beats.
+The files of the sampled signals start with the Unix time of the first sample and the sample rate
+(once per column), followed by one line per sample.
+
+Usage:
+    python -m src.synthetic PATH [--students N] [--beats N] [--gap-rate P] [--seed N] [--signals SIGNAL ...]
+
+:Modul: synthetic
+:Author: Benjamin Gaube
+:Date: 2023-10-12
+"""
+
+import io
+import os
+import locale
+import zipfile
+import argparse
+from typing import Sequence
+
+import numpy as np
+
+from src.event_series import InterBeatInterval, SIGNALS
+
+SAMPLE_RATE = 64  # Hz, resolution of the beat detection of the wristband
+LEAD_TIME = 1800  # seconds the recording starts before the exam
+GRADE_TITLES = {'mid1': 'MIDTERM 1', 'mid2': 'MIDTERM 2', 'final': 'FINAL (OUT OF 200)'}
+MAX_POINTS = {'mid1': 100, 'mid2': 100, 'final': 200}
+SIGNAL_RATES = {'BVP': 64, 'ACC': 32, 'EDA': 4, 'HR': 1, 'TEMP': 4}  # Hz, as recorded by the wristband
+DATE_TIME = (2018, 12, 5, 16, 0, 0)  # fixed modification time of the members, so the zip-files are reproducible
+
+
+def _member(name: str, compress_type: int = zipfile.ZIP_DEFLATED) -> zipfile.ZipInfo:
+    """ return the ZipInfo of a member with the fixed modification time """
+    info = zipfile.ZipInfo(name, DATE_TIME)
+    info.compress_type = compress_type
+    return info
+
+
+def ibi_csv(rng: np.random.Generator, start: int, beats: int, gap_rate: float) -> str:
+    """
+    Generate the content of an IBI.csv file.
+
+    The intervals vary slowly (smoothed noise over about 100 beats) and from beat to beat
+    around a random mean heart rate. After a beat,
+    a gap of up to one minute without detected beats follows with the probability `gap_rate`.
+
+    :param rng: np.random.Generator, The source of random numbers.
+    :param start: int, The Unix time of the start of the recording.
+    :param beats: int, The number of beats in the file.
+    :param gap_rate: float, The probability of a gap after a beat.
+    :return: str, The content of the file.
+    """
+
+    mean = rng.uniform(0.6, 1.0)
+    trend = np.convolve(rng.normal(0, 0.6, beats + 99), np.ones(100) / 100, mode='valid')
+    interval = np.clip(mean + trend + rng.normal(0, 0.03, beats), 0.3, 1.6)
+    interval = np.round(interval * SAMPLE_RATE) / SAMPLE_RATE
+
+    gaps = (rng.random(beats) < gap_rate) * rng.integers(1, 60 * SAMPLE_RATE, beats) / SAMPLE_RATE
+    time = np.cumsum(interval) + np.cumsum(gaps) - gaps  # a gap delays the following beats
+
+    lines = '\n'.join(map('{:.6f},{:.6f}'.format, time, interval))
+    return f'{start:.6f}, IBI\n{lines}\n'
+
+
+def signal_csv(rng: np.random.Generator, start: int, signal: str, seconds: int) -> str:
+    """
+    Generate the content of the file of a sampled signal.
+
+    The values are noise around plausible levels: the blood volume pulse oscillates with about 1 Hz,
+    the acceleration (in 1/64 g) is an integer per axis, EDA, heart rate and temperature vary slowly.
+
+    :param rng: np.random.Generator, The source of random numbers.
+    :param start: int, The Unix time of the first sample.
+    :param signal: str, The name of the signal, one of `SIGNAL_RATES`.
+    :param seconds: int, The length of the recording in seconds.
+    :return: str, The content of the file.
+    """
+
+    rate = SIGNAL_RATES[signal]
+    n = seconds * rate
+    drift = np.cumsum(rng.normal(0, 0.01, n))
+    if signal == 'BVP':
+        values = [50 * np.sin(2 * np.pi * np.arange(n) / rate) + rng.normal(0, 5, n)]
+        fmt = '{:.2f}'
+    elif signal == 'ACC':
+        values = [np.clip(np.round(center + 3 * drift + rng.normal(0, 2, n)), -128, 127) for center in (-14, 46, 41)]
+        fmt = '{:.0f}'
+    elif signal == 'EDA':
+        values = [np.abs(1 + drift / 10 + rng.normal(0, 0.01, n))]
+        fmt = '{:.6f}'
+    elif signal == 'HR':
+        values = [np.clip(80 + drift * 5 + rng.normal(0, 0.5, n), 40, 180)]
+        fmt = '{:.2f}'
+    else:
+        values = [32 + drift / 10 + rng.normal(0, 0.02, n)]
+        fmt = '{:.2f}'
+
+    n_columns = len(SIGNALS[signal])
+    header = ', '.join([f'{start:.6f}'] * n_columns) + '\n' + ', '.join([f'{rate:.6f}'] * n_columns)
+    lines = '\n'.join(map(','.join([fmt] * n_columns).format, *values))
+    return f'{header}\n{lines}\n'
+
+
+def grades_txt(rng: np.random.Generator, n_students: int) -> str:
+    """
+    Generate the content of the file StudentGrades.txt.
+
+    :param rng: np.random.Generator, The source of random numbers.
+    :param n_students: int, The number of students.
+    :return: str, The content of the file.
+    """
+
+    sections = []
+    for term, title in GRADE_TITLES.items():
+        scores = rng.integers(MAX_POINTS[term] // 3, MAX_POINTS[term] + 1, n_students)
+        lines = [f'S{i:02d} – {score}' for i, score in enumerate(scores, start=1)]
+        sections.append('\n'.join([f'GRADES - {title}'] + lines))
+    return '\n\n'.join(sections) + '\n'
+
+
+def generate_archive(zip_path: str, n_students: int = 10, beats: int = 20000, gap_rate: float = 0.002,
+                     seed: int = 0, inner_compression: int = zipfile.ZIP_STORED, signals: Sequence[str] = (),
+                     signal_seconds: int = 600) -> str:
+    """
+    Generate a zip-file with the layout of the downloaded dataset.
+
+    The name of the folder inside the zip-file is the name of the zip-file without extension,
+    as it is for the download. The grades are encoded like `Student.extract_grades` decodes them.
+
+    :param zip_path: str, The path of the zip-file to be created.
+    :param n_students: int, The number of students.
+    :param beats: int, The number of beats per student and term.
+    :param gap_rate: float, The probability of a gap after a beat.
+    :param seed: int, The seed of the random numbers, the same seed generates the same data.
+    :param inner_compression: int, The compression of 'Data.zip' in the outer zip-file,
+        zipfile.ZIP_STORED (like the download) or zipfile.ZIP_DEFLATED.
+    :param signals: Sequence[str], The sampled signals in every term folder besides IBI.csv. Default is none.
+    :param signal_seconds: int, The length of the recordings of the sampled signals in seconds.
+    :return: str, The path of the zip-file.
+    """
+
+    rng = np.random.default_rng(seed)
+    # separate random numbers for the signals, so the IBI data doesn't depend on them
+    signal_rng = np.random.default_rng([seed, 1])
+    folder = os.path.splitext(os.path.basename(zip_path))[0]
+
+    inner = io.BytesIO()
+    with zipfile.ZipFile(inner, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+        for student in range(1, n_students + 1):
+            for term, term_folder in InterBeatInterval.term_folders.items():
+                start = InterBeatInterval.term_periods[term][0] - LEAD_TIME
+                zip_ref.writestr(_member(f'Data/S{student}/{term_folder}/IBI.csv'),
+                                 '\ufeff' + ibi_csv(rng, start, beats, gap_rate))
+                for signal in signals:
+                    zip_ref.writestr(_member(f'Data/S{student}/{term_folder}/{signal}.csv'),
+                                     signal_csv(signal_rng, start, signal, signal_seconds))
+
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+        zip_ref.writestr(_member(f'{folder}/Data.zip', inner_compression), inner.getvalue())
+        zip_ref.writestr(_member(f'{folder}/StudentGrades.txt'),
+                         grades_txt(rng, n_students).encode(locale.getpreferredencoding(False)))
+
+    return zip_path
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Generate a zip-file with the layout of the dataset and random data.')
+    parser.add_argument('path', help='path of the zip-file to be created')
+    parser.add_argument('--students', type=int, default=10, metavar='N', help='number of students (default: 10)')
+    parser.add_argument('--beats', type=int, default=20000, metavar='N',
+                        help='number of beats per student and term (default: 20000)')
+    parser.add_argument('--gap-rate', type=float, default=0.002, metavar='P',
+                        help='probability of a gap after a beat (default: 0.002)')
+    parser.add_argument('--seed', type=int, default=0, metavar='N', help='seed of the random numbers (default: 0)')
+    parser.add_argument('--signals', nargs='+', choices=list(SIGNAL_RATES), default=[], metavar='SIGNAL',
+                        help=f'sampled signals in every term folder, some of {", ".join(SIGNAL_RATES)}')
+    parser.add_argument('--signal-seconds', type=int, default=600, metavar='N',
+                        help='length of the recordings of the sampled signals in seconds (default: 600)')
+    args = parser.parse_args()
+
+    generate_archive(args.path, args.students, args.beats, args.gap_rate, args.seed,
+                     signals=args.signals, signal_seconds=args.signal_seconds)
+    print(f'Generated {args.path}')
@@ -0,0 +1,150 @@
+"""
+Tests for Analysis Module
+----------------------
+The analyses run against an SQLite database filled with a generated zip-file, the results
+are compared with those of the queries and loops of the notebook 'analyzing_students_hrv.ipynb',
+which read the raw intervals of the exam periods.
+
+:Modul: test_analysis
+:Author: Benjamin Gaube
+:Date: 2023-10-12
+"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.analysis import (load_master, load_exam_statistics, exam_averages, student_totals, hrv_differences,
+                          correlation_inputs, grade_correlations, t_distribution)
+from src.main import stream_data, process_data, FILENAME
+from src.sql_query import QueryReader
+from src.storage import SQLiteBackend
+from src.synthetic import generate_archive
+
+MASTER_QUERY = ('SELECT d.student, e.term, md.grade, md.nni_mean, md.sdnn FROM master_data md '
+                'JOIN dataset d ON md.student_id = d.id JOIN exam e ON md.term_id = e.id')
+EXAM_QUERY = ('SELECT d.student, e.term, ibi.ibi_value FROM inter_beat_interval ibi '
+              'JOIN dataset d ON ibi.student_id = d.id JOIN exam e ON ibi.term_id = e.id WHERE '
+              '(ibi.term_id = 1 AND ibi.timestamp BETWEEN 1539439200 AND 1539444600) OR '
+              '(ibi.term_id = 2 AND ibi.timestamp BETWEEN 1541862000 AND 1541867400) OR '
+              '(ibi.term_id = 3 AND ibi.timestamp BETWEEN 1544022000 AND 1544032800)')
+
+
+def notebook_exam_statistics(db) -> pd.DataFrame:
+    """ the per-student and term loop of question 3 of the notebook """
+    df_q3a = pd.read_sql(EXAM_QUERY, db)
+    data_list = []
+    for stud in list(df_q3a.student.unique()):
+        for examen in list(df_q3a.term.unique()):
+            data_list.append({
+                'student': stud,
+                'term': examen,
+                'nni_mean_examen': df_q3a.query('@stud == student and @examen == term').ibi_value.mean().round(2),
+                'sdnn_examen': df_q3a.query('@stud == student and @examen == term').ibi_value.std().round(2)})
+    return pd.DataFrame(data_list)
+
+
+class TestAnalysis(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.backend = SQLiteBackend()
+        cls.backend.create_schema()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = generate_archive(os.path.join(temp_dir, FILENAME + '.zip'), n_students=5, beats=4000)
+            stream_data(path, lambda data_dir, archive: process_data(data_dir, cls.backend, archive=archive))
+
+        reader = QueryReader(cls.backend.db.cursor(), '?')
+        cls.master, cls.statistics = load_master(reader), load_exam_statistics(reader)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.backend.close()
+
+    def assert_frame_equal(self, result: pd.DataFrame, expected: pd.DataFrame, keys=('student', 'term')):
+        keys = list(keys)
+        pd.testing.assert_frame_equal(result.sort_values(keys).reset_index(drop=True),
+                                      expected[result.columns].sort_values(keys).reset_index(drop=True),
+                                      check_dtype=False)
+
+    def test_exam_averages(self):
+        expected = pd.read_sql('SELECT e.id, e.term, AVG(md.grade) AS average_grade FROM master_data md '
+                               'JOIN exam e ON md.term_id = e.id GROUP BY e.id, e.term', self.backend.db)
+        expected.loc[expected['term'] == 'final', 'average_grade'] /= 2
+        result = exam_averages(self.master)
+        self.assertEqual(list(result.term), ['mid1', 'mid2', 'final'])
+        self.assert_frame_equal(result, expected, keys=['id'])
+
+    def test_student_totals(self):
+        expected = pd.read_sql('SELECT d.student, SUM(md.grade) AS total_points FROM master_data md '
+                               'JOIN dataset d ON md.student_id = d.id GROUP BY d.student', self.backend.db)
+        result = student_totals(self.master)
+        self.assertTrue(result.total_points.is_monotonic_decreasing)
+        self.assert_frame_equal(result, expected, keys=['student'])
+
+    def test_exam_statistics(self):
+        self.assertEqual(list(self.statistics.student[:3]), ['S1'] * 3)
+        self.assertEqual(list(self.statistics.term[:3]), ['mid1', 'mid2', 'final'])
+        # the statistics stored at ingest are the same as of the intervals of the exam periods
+        self.assert_frame_equal(self.statistics, notebook_exam_statistics(self.backend.db))
+
+    def test_hrv_differences(self):
+        expected = notebook_exam_statistics(self.backend.db).merge(
+            pd.read_sql(MASTER_QUERY, self.backend.db).rename(columns={'nni_mean': 'nni_mean_whole',
+                                                                       'sdnn': 'sdnn_whole'}),
+            on=['student', 'term'], how='inner')
+        expected['nni_mean_diff'] = expected['nni_mean_examen'] - expected['nni_mean_whole']
+        expected['sdnn_diff'] = expected['sdnn_examen'] - expected['sdnn_whole']
+
+        result = hrv_differences(self.statistics, self.master)
+        self.assertEqual(len(result), 5 * 3)
+        self.assert_frame_equal(result, expected)
+
+    def test_grade_correlations(self):
+        for scale_final, by_term in [(False, True), (True, False)]:
+            inputs = correlation_inputs(self.statistics, self.master, scale_final=scale_final)
+            result = grade_correlations(inputs, by_term=by_term)
+
+            expected = []
+            for term, subset in inputs.groupby('term') if by_term else [(None, inputs)]:
+                for parameter in ['nni_mean_examen', 'sdnn_examen']:
+                    expected.append({'term': term, 'parameter': parameter[:-7], 'n': len(subset),
+                                     'cor': np.corrcoef(subset.grade, subset[parameter])[0, 1]})
+            keys = ['term', 'parameter'] if by_term else ['parameter']
+            self.assert_frame_equal(result.drop(columns='p'), pd.DataFrame(expected), keys=keys)
+
+            if t_distribution is None:
+                self.assertTrue(result.p.isna().all())
+            else:
+                self.assertTrue(result.p.between(0, 1).all())
+
+        inputs = correlation_inputs(self.statistics, self.master, scale_final=True)
+        self.assertTrue((inputs.grade[inputs.term == 'final'] * 2 ==
+                         self.master.grade[self.master.term == 'final'].to_numpy()).all())
+
+    @unittest.skipIf(t_distribution is None, 'scipy is not installed')
+    def test_pearsonr(self):
+        from scipy.stats import pearsonr
+
+        # the loops of question 4 of the notebook
+        for scale_final, by_term in [(False, True), (True, False)]:
+            inputs = correlation_inputs(self.statistics, self.master, scale_final=scale_final)
+            expected = []
+            for term, subset in inputs.groupby('term') if by_term else [(None, inputs)]:
+                for par in ['nni_mean_examen', 'sdnn_examen']:
+                    cor, p = pearsonr(subset.grade, subset[par])
+                    expected.append({'term': term, 'parameter': par[:-7], 'p': p, 'cor': cor})
+
+            result = grade_correlations(inputs, by_term=by_term)
+            keys = ['term', 'parameter'] if by_term else ['parameter']
+            result, expected = (frame.sort_values(keys).reset_index(drop=True)
+                                for frame in (result, pd.DataFrame(expected)))
+            np.testing.assert_allclose(result.cor, expected.cor, rtol=1e-10)
+            np.testing.assert_allclose(result.p, expected.p, rtol=1e-8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+Tests for Archive Module
+----------------------
+The tests build a small zip-file with the layout of the downloaded one,
+so there is no need for the real data.
+
+:Modul: test_archive
+:Author: Benjamin Gaube
+:Date: 2023-10-12
+"""
+
+import io
+import os
+import pickle
+import zipfile
+import tempfile
+import unittest
+from unittest import mock
+
+from src.archive import DatasetArchive, list_dir, open_file
+from src.student import Student
+from src.event_series import InterBeatInterval
+
+FOLDER = 'some-dataset-1.0.0'
+IBI_CSV = '1544027337.000000, IBI\n11.609375,0.593750\n12.203125,0.593750\n14.000000,0.500000\n'
+GRADES = ('GRADES - MIDTERM 1\nS01 – 78\n\nGRADES - MIDTERM 2\nS01 – 82\n\n'
+          'GRADES - FINAL (OUT OF 200)\nS01 – 182\n')
+
+
+def build_archive(path: str, inner_compression: int) -> None:
+    inner = io.BytesIO()
+    with zipfile.ZipFile(inner, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+        for term in ['Final', 'Midterm 1', 'Midterm 2']:
+            zip_ref.writestr(f'Data/S1/{term}/IBI.csv', '\ufeff' + IBI_CSV)
+            zip_ref.writestr(f'Data/S1/{term}/HR.csv', '1544027337.000000\n1.000000\n')
+
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+        zip_ref.writestr(zipfile.ZipInfo(f'{FOLDER}/Data.zip'), inner.getvalue(), compress_type=inner_compression)
+        zip_ref.writestr(f'{FOLDER}/StudentGrades.txt', GRADES.encode())
+
+
+class TestDatasetArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, FOLDER + '.zip')
+        build_archive(self.path, zipfile.ZIP_STORED)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_listdir(self):
+        with DatasetArchive(self.path) as archive:
+            self.assertEqual(archive.listdir(), ['Data', 'Data.zip', 'StudentGrades.txt'])
+            self.assertEqual(archive.listdir('Data'), ['S1'])
+            self.assertEqual(list_dir(os.path.join('Data', 'S1', 'Final'), archive), ['HR.csv', 'IBI.csv'])
+            self.assertRaises(FileNotFoundError, archive.listdir, 'Data/S2')
+
+    def test_open(self):
+        with DatasetArchive(self.path) as archive:
+            with open_file(os.path.join('Data', 'S1', 'Midterm 1', 'IBI.csv'), archive) as file:
+                self.assertIn(b'11.609375', file.read())
+            self.assertEqual(archive.info('StudentGrades.txt').file_size, len(GRADES.encode()))
+            self.assertRaises(FileNotFoundError, archive.open, 'Data/S1/Final/BVP.csv')
+
+    def test_compressed_inner_zip(self):
+        build_archive(self.path, zipfile.ZIP_DEFLATED)
+        with DatasetArchive(self.path) as archive:
+            self.assertEqual(archive.listdir('Data/S1'), ['Final', 'Midterm 1', 'Midterm 2'])
+
+    def test_pickle(self):
+        build_archive(self.path, zipfile.ZIP_DEFLATED)
+        with DatasetArchive(self.path) as archive:
+            data = pickle.dumps(archive)
+
+        # the zip-file is opened once per process, not once per task
+        with mock.patch.object(DatasetArchive, '_open_archive', autospec=True,
+                               side_effect=DatasetArchive._open_archive) as open_archive:
+            copies = [pickle.loads(data) for _ in range(4)]
+        self.assertEqual(open_archive.call_count, 1)
+        self.assertTrue(all(copy is copies[0] for copy in copies))
+
+        with copies[0] as copy:
+            self.assertEqual(copy.listdir('Data'), ['S1'])
+        self.assertFalse(pickle.loads(data).closed)  # reopened after it was closed
+        pickle.loads(data).close()
+
+    def test_student(self):
+        with DatasetArchive(self.path) as archive:
+            grades = Student.extract_grades('StudentGrades.txt', archive)
+            self.assertEqual(grades['final']['S1'], 182)
+
+            student = Student('Data', 'S1', (78, 82, 182), archive)
+            student.ibi = student.path
+            self.assertIsInstance(student.ibi, InterBeatInterval)
+            self.assertEqual(list(student.ibi.final.interval), [593, 593, 500])
+
+    def test_lazy_terms(self):
+        with DatasetArchive(self.path) as archive:
+            ibi = InterBeatInterval('Data/S1', archive)
+            self.assertEqual(ibi._series, {})
+
+            series = ibi.series('mid2')
+            self.assertIs(ibi.series('mid2'), series)
+            self.assertEqual(list(ibi._series), ['mid2'])
+            self.assertEqual(list(series.time), [1544027348, 1544027348, 1544027349])
+
+            ibi.release('mid2')
+            self.assertEqual(ibi._series, {})
+            self.assertRaises(ValueError, ibi.series, 'mid3')
+
+
+if __name__ == '__main__':
+    unittest.main()
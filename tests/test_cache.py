@@ -0,0 +1,121 @@
+"""
+Tests for Cache Module
+----------------------
+
+:Modul: test_cache
+:Author: Benjamin Gaube
+:Date: 2023-10-12
+"""
+
+import os
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+import numpy as np
+
+from test_archive import build_archive, FOLDER
+from src.archive import DatasetArchive, file_fingerprint
+from src.cache import ArrayCache
+from src.event_series import InterBeatInterval, CACHE_VERSION
+from src.main import process_data
+from src.storage import SQLiteBackend
+
+
+class TestArrayCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = ArrayCache(os.path.join(self.temp_dir.name, 'cache'))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_round_trip(self):
+        self.assertIsNone(self.cache.get('0a1b2c3d-100'))
+
+        time, interval = np.arange(10, dtype=np.int32), np.full(10, 800, dtype=np.int16)
+        self.cache.put('0a1b2c3d-100', {'time': time, 'interval': interval})
+        arrays = self.cache.get('0a1b2c3d-100', names=('time', 'interval'))
+        self.assertIsInstance(arrays['time'], np.memmap)
+        self.assertFalse(arrays['time'].flags.writeable)
+        np.testing.assert_array_equal(arrays['interval'], interval)
+        self.assertEqual(arrays['interval'].dtype, np.int16)
+
+        self.assertIsNone(self.cache.get('0a1b2c3d-100'))  # no array 'contiguous'
+        self.assertRaises(ValueError, self.cache.put, '../key', {'time': time})
+
+    def test_lru_eviction(self):
+        array = np.zeros(1000, dtype=np.int64)
+        self.cache.put('a', {'time': array})
+        entry_size = self.cache.nbytes
+        self.cache.clear()
+
+        cache = ArrayCache(self.cache.directory, max_bytes=2 * entry_size)
+        for age, key in enumerate(['a', 'b']):
+            cache.put(key, {'time': array})
+            os.utime(cache._path(key, 'time'), (1000 + age, 1000 + age))
+        cache.get('a', names=('time',))  # 'b' is the least recently used entry now
+
+        cache.put('c', {'time': array})
+        self.assertIsNotNone(cache.get('a', names=('time',)))
+        self.assertIsNone(cache.get('b', names=('time',)))
+        self.assertIsNotNone(cache.get('c', names=('time',)))
+        self.assertLessEqual(cache.nbytes, cache.max_bytes)
+
+
+class TestCachedSeries(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, FOLDER + '.zip')
+        build_archive(self.path, zipfile.ZIP_STORED)
+        self.cache = ArrayCache(os.path.join(self.temp_dir.name, 'cache'))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_parsed_once(self):
+        with DatasetArchive(self.path) as archive:
+            parsed = InterBeatInterval('Data/S1', archive).series('final')
+            InterBeatInterval('Data/S1', archive, self.cache).series('final')
+
+            with mock.patch.object(InterBeatInterval, 'parse_file') as parse_file:
+                cached = InterBeatInterval('Data/S1', archive, self.cache).series('final')
+            parse_file.assert_not_called()
+
+        for name in ['time', 'interval', 'contiguous']:
+            np.testing.assert_array_equal(getattr(cached, name), getattr(parsed, name))
+            self.assertIsInstance(getattr(cached, name).base, np.memmap)  # not copied
+
+    def test_process_data(self):
+        counts = []
+        for _ in range(2):
+            with SQLiteBackend() as backend, DatasetArchive(self.path) as archive:
+                backend.create_schema()
+                process_data('', backend=backend, archive=archive, cache=self.cache)
+                with backend.transaction() as cursor:
+                    counts.append(cursor.execute('SELECT COUNT(*), SUM(hrv_value) FROM window_values').fetchone())
+        self.assertEqual(counts[0], counts[1])
+
+        # one entry of three arrays per distinct IBI file
+        with DatasetArchive(self.path) as archive:
+            fingerprints = {file_fingerprint(f'Data/S1/{folder}/IBI.csv', archive)
+                            for folder in InterBeatInterval.term_folders.values()}
+        self.assertEqual(len(os.listdir(self.cache.directory)), 3 * len(fingerprints))
+
+    def test_version(self):
+        with DatasetArchive(self.path) as archive:
+            InterBeatInterval('Data/S1', archive, self.cache).series('final')
+
+            # the arrays of an older parser aren't read
+            with mock.patch('src.event_series.CACHE_VERSION', CACHE_VERSION + 1), \
+                    mock.patch.object(InterBeatInterval, 'parse_file', wraps=InterBeatInterval.parse_file) as parse_file:
+                InterBeatInterval('Data/S1', archive, self.cache).series('final')
+            parse_file.assert_called_once()
+        self.assertEqual(len(os.listdir(self.cache.directory)), 2 * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
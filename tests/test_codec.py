@@ -0,0 +1,49 @@
+"""
+Tests for Codec Module
+----------------------
+
+:Modul: test_codec
+:Author: Benjamin Gaube
+:Date: 2023-10-12
+"""
+
+import unittest
+
+import numpy as np
+
+from src.codec import encode_series, decode_series
+
+
+class TestCodec(unittest.TestCase):
+
+    def test_round_trip(self):
+        rng = np.random.default_rng(0)
+        time = 1544027337 + np.cumsum(rng.integers(0, 3, 10000))
+        interval = rng.integers(300, 1500, 10000)
+
+        start_time, time_blob, interval_blob = encode_series(time, interval)
+        self.assertEqual(start_time, time[0])
+        # far less than the 8 bytes of the two values per row
+        self.assertLess(len(time_blob) + len(interval_blob), 3 * len(time))
+
+        decoded_time, decoded_interval = decode_series(start_time, time_blob, interval_blob, len(time))
+        np.testing.assert_array_equal(decoded_time, time)
+        np.testing.assert_array_equal(decoded_interval, interval)
+        self.assertEqual(decoded_interval.dtype, np.int16)
+
+    def test_large_intervals(self):
+        time, interval = np.array([10, 12, 100]), np.array([500, 40000, 600])
+        decoded_time, decoded_interval = decode_series(*encode_series(time, interval), 3)
+        np.testing.assert_array_equal(decoded_interval, interval)
+        np.testing.assert_array_equal(decoded_time, time)
+
+    def test_empty(self):
+        decoded_time, decoded_interval = decode_series(*encode_series(np.array([]), np.array([])), 0)
+        self.assertEqual((len(decoded_time), len(decoded_interval)), (0, 0))
+
+    def test_different_length(self):
+        self.assertRaises(ValueError, encode_series, np.arange(3), np.arange(4))
+
+
+if __name__ == '__main__':
+    unittest.main()
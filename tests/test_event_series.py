@@ -8,6 +8,7 @@ For further Information see Docstring in test_main.py
 :Date: 2023-10-12
 """
 
+import io
 import os
 import unittest
 
@@ -15,7 +16,9 @@ import pandas as pd
 import numpy as np
 
 from test_main import TestModul
-from src.event_series import InterBeatInterval
+from src.event_series import InterBeatInterval, IBISeries, SignalSeries
+from src.main import calculate_hrv
+from benchmarks.parse import run_benchmark
 
 
 class TestEventSeriesModul(TestModul):
@@ -31,5 +34,148 @@ class TestEventSeriesModul(TestModul):
         self.assertIsInstance(df.interval[77], np.int32)
 
 
+class TestMovingWindow(unittest.TestCase):
+    """ works on generated data, so there is no need for the zip-file """
+
+    def setUp(self):
+        rng = np.random.default_rng(42)
+        intervals = rng.integers(300, 1500, 15000)
+        gaps = rng.integers(0, 3000, 15000) * (rng.random(15000) < 0.2)
+        start = InterBeatInterval.term_periods['final'][0] - 1800
+        self.ibi_df = pd.DataFrame({'time': (start + np.cumsum(intervals + gaps) / 1000).astype(int),
+                                    'interval': intervals})
+
+    def test_window_bounds(self):
+        centers, lower, upper = InterBeatInterval.window_bounds(self.ibi_df.time.to_numpy(), 'mid1')
+        self.assertEqual(len(centers), 91)
+        self.assertTrue((upper - lower == 0).all())  # no data during mid1
+        self.assertRaises(ValueError, InterBeatInterval.window_bounds, self.ibi_df.time.to_numpy(), 'mid3')
+
+    def test_moving_5min_window_hrv(self):
+        windows = InterBeatInterval.moving_5min_window_hrv(self.ibi_df, 'final')
+
+        for k, timestamp in enumerate(windows['time']):
+            start, stop = timestamp - 150, timestamp + 150
+            intervals = np.array(self.ibi_df.query('@start <= time <= @stop').interval)
+            self.assertEqual(windows['number_of_ibi'][k], len(intervals))
+
+            if len(intervals) >= 3:
+                nni_mean, sdnn = calculate_hrv(intervals)
+                self.assertEqual(windows['nni_mean'][k], nni_mean)
+                self.assertEqual(windows['sdnn'][k], sdnn)
+
+    def test_moving_windows_hrv(self):
+        windows = InterBeatInterval.moving_windows_hrv(self.ibi_df, 'final', ['5min', '1min', '10min'])
+        self.assertEqual(list(np.unique(windows['window_spec_id'])), [1, 2, 4])
+
+        # the windows of several specs are the same as of every spec alone
+        for spec_id, spec in [(1, '5min'), (2, '1min'), (4, '10min')]:
+            alone = InterBeatInterval.moving_windows_hrv(self.ibi_df, 'final', [spec])
+            selected = windows['window_spec_id'] == spec_id
+            for key, values in alone.items():
+                np.testing.assert_array_equal(windows[key][selected], values)
+
+        # 1-minute windows every 15 seconds
+        one_minute = windows['window_spec_id'] == 2
+        self.assertEqual(list(windows['window_id'][one_minute][:3]), [1, 2, 3])
+        self.assertEqual(list(np.diff(windows['time'][one_minute][:3])), [15, 15])
+        k = np.flatnonzero(one_minute)[100]
+        start, stop = windows['time'][k] - 30, windows['time'][k] + 30
+        self.assertEqual(windows['number_of_ibi'][k], len(self.ibi_df.query('@start <= time <= @stop')))
+
+        self.assertRaises(ValueError, InterBeatInterval.moving_windows_hrv, self.ibi_df, 'final', ['3min'])
+
+    def test_exam_window(self):
+        exam_window = InterBeatInterval.exam_window(self.ibi_df, 'final')
+
+        # calculated like in the analysis notebook
+        start, stop = InterBeatInterval.term_periods['final']
+        intervals = self.ibi_df.query('@start <= time <= @stop').interval
+        self.assertEqual(exam_window['number_of_ibi'], len(intervals))
+        self.assertEqual(exam_window['nni_mean'], intervals.mean().round(2))
+        self.assertEqual(exam_window['sdnn'], intervals.std().round(2))
+        self.assertAlmostEqual(exam_window['coverage'], intervals.sum() / 10800000, places=4)
+
+        self.assertEqual(InterBeatInterval.exam_window(self.ibi_df, 'mid1'),
+                         {'number_of_ibi': 0, 'nni_mean': None, 'sdnn': None, 'coverage': 0.0})
+
+
+class TestIBISeries(unittest.TestCase):
+
+    def test_compact(self):
+        ibi_df = pd.DataFrame({'time': np.arange(1544022000, 1544032000, 2), 'interval': np.full(5000, 800)})
+        series = IBISeries.from_frame(ibi_df)
+        self.assertEqual((series.time.dtype, series.interval.dtype), (np.int32, np.int16))
+        self.assertEqual(series.nbytes, 5000 * 7)
+        self.assertEqual(len(series), 5000)
+        pd.testing.assert_frame_equal(series.to_frame(), ibi_df, check_dtype=False)
+
+        # the static methods give the same results for the DataFrame and the compact series
+        self.assertEqual(InterBeatInterval.exam_window(series, 'final'), InterBeatInterval.exam_window(ibi_df, 'final'))
+        for key, values in InterBeatInterval.moving_5min_window_hrv(series, 'final').items():
+            np.testing.assert_array_equal(values, InterBeatInterval.moving_5min_window_hrv(ibi_df, 'final')[key])
+
+    def test_segments(self):
+        series = IBISeries(np.array([100, 100, 101, 110, 111, 130]), np.array([600, 700, 800, 900, 1000, 500]),
+                           np.array([False, True, True, False, True, False]))
+        segments = InterBeatInterval.segments(series)
+        self.assertEqual({key: list(values) for key, values in segments.items()},
+                         {'segment_id': [1, 2, 3], 'start_time': [100, 110, 130], 'end_time': [102, 112, 131],
+                          'number_of_ibi': [3, 2, 1], 'duration_in_ms': [2100, 1900, 500], 'gap_in_s': [0, 8, 18]})
+
+        empty = InterBeatInterval.segments(IBISeries(np.zeros(0), np.zeros(0)))
+        self.assertTrue(all(len(values) == 0 for values in empty.values()))
+
+    def test_large_intervals(self):
+        series = IBISeries(np.array([10, 50]), np.array([800, 40000]))
+        self.assertEqual(series.interval.dtype, np.int32)
+        self.assertEqual(list(series.interval), [800, 40000])
+
+    def test_parse_file(self):
+        content = '1544027337.000000, IBI\r\n11.609375,0.593750\r\n12.203125,0.593750\r\n14.000000,0.500000\r\n'
+        expected = InterBeatInterval._reformat_file(pd.read_csv(io.StringIO(content)))
+
+        series = InterBeatInterval.parse_file(io.BytesIO(b'\xef\xbb\xbf' + content.encode()))
+        self.assertEqual(list(series.time), list(expected.time))
+        self.assertEqual(list(series.interval), [593, 593, 500])
+
+        self.assertEqual(len(InterBeatInterval.parse_file(io.BytesIO(b'1544027337.000000, IBI\n'))), 0)
+
+    def test_parse_benchmark(self):
+        results = run_benchmark(beats=2000, repeat=1)  # raises if the parsers differ
+        self.assertEqual(len(results), 2)
+
+    def test_slots(self):
+        series = IBISeries(np.array([10]), np.array([800]))
+        self.assertRaises(AttributeError, setattr, series, 'grade', 1)
+
+
+
+class TestSignalSeries(unittest.TestCase):
+
+    content = (b'\xef\xbb\xbf1544020000.000000, 1544020000.000000, 1544020000.000000\r\n'
+               b'32.000000, 32.000000, 32.000000\r\n-14,46,41\r\n-15,46,40\r\n-15,47,40\r\n-13,45,41\r\n'
+               b'-14,46,42\r\n')
+
+    def test_read_header(self):
+        self.assertEqual(SignalSeries.read_header(io.BytesIO(self.content)), (1544020000.0, 32.0))
+
+    def test_parse_chunks(self):
+        chunks = list(SignalSeries.parse_chunks(io.BytesIO(self.content), 3, chunk_size=2))
+        self.assertEqual([(chunk.first_sample, len(chunk.values)) for chunk in chunks], [(0, 2), (2, 2), (4, 1)])
+        self.assertEqual(chunks[1].values.tolist(), [[-15, 47, 40], [-13, 45, 41]])
+        # the timestamps are derived from the start time and the sample rate
+        np.testing.assert_array_equal(np.concatenate([chunk.time for chunk in chunks]),
+                                      1544020000 + np.arange(5) / 32)
+
+        self.assertEqual(list(SignalSeries.parse_chunks(io.BytesIO(b'1544020000.0\n4.0\n'), 1)), [])
+
+    def test_file_path(self):
+        series = SignalSeries('S1')
+        self.assertEqual(series.file_path('mid2', 'EDA'), os.path.join('S1', 'Midterm 2', 'EDA.csv'))
+        self.assertRaises(ValueError, series.file_path, 'mid3', 'EDA')
+        self.assertRaises(ValueError, series.file_path, 'mid2', 'IBI')
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,105 @@
+"""
+Tests for Export Module
+----------------------
+The export needs the optional package pyarrow, without it the tests are skipped.
+
+:Modul: test_export
+:Author: Benjamin Gaube
+:Date: 2023-10-12
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from src import export
+from src.export import ParquetExport, read_table, EXPORT_TABLES
+from src.main import stream_data, process_data, FILENAME
+from src.storage import SQLiteBackend
+from src.synthetic import generate_archive
+from src.hrv import HRV_PARAMETERS
+
+
+class TestWithoutPyarrow(unittest.TestCase):
+
+    def test_import_error(self):
+        with mock.patch.object(export, 'pq', None):
+            self.assertRaises(ImportError, ParquetExport, 'export')
+            self.assertRaises(ImportError, read_table, 'export', 'master_data')
+
+
+@unittest.skipIf(export.pq is None, 'pyarrow is not installed')
+class TestParquetExport(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.root = os.path.join(cls.temp_dir.name, 'export')
+        cls.backend = SQLiteBackend()
+        cls.backend.create_schema()
+        path = generate_archive(os.path.join(cls.temp_dir.name, FILENAME + '.zip'), n_students=2, beats=2000)
+        stream_data(path, lambda data_dir, archive: process_data(data_dir, cls.backend, archive=archive,
+                                                                 export=ParquetExport(cls.root)))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.backend.close()
+        cls.temp_dir.cleanup()
+
+    def test_partitions(self):
+        self.assertEqual(sorted(os.listdir(os.path.join(self.root, 'window_values'))),
+                         ['term=final', 'term=mid1', 'term=mid2'])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.root, 'window_values', 'term=final'))),
+                         ['student=S1', 'student=S2'])
+
+    def test_inter_beat_interval(self):
+        ibi = read_table(self.root, 'inter_beat_interval', ['ibi_value', 'timestamp'], term='mid2', student='S2')
+        expected = self.backend.db.execute('SELECT ibi_value, timestamp FROM inter_beat_interval WHERE student_id = 2 '
+                                           'AND term_id = 2 ORDER BY ibi_value_id').fetchall()
+        self.assertEqual(list(ibi.columns), ['ibi_value', 'timestamp'])
+        np.testing.assert_array_equal(ibi.to_numpy(), np.array(expected))
+
+    def test_master_data(self):
+        master = read_table(self.root, 'master_data', ['student', 'term', 'number_of_ibi'])
+        self.assertEqual(len(master), 6)
+        self.assertTrue((master.number_of_ibi == 2000).all())
+
+    def test_window_values(self):
+        windows = read_table(self.root, 'window_values', term='final', student='S1')
+        self.assertTrue(set(HRV_PARAMETERS) <= set(windows.columns))
+        expected = self.backend.db.execute('SELECT window_id, hrv_value FROM window_values WHERE student_id = 1 '
+                                           'AND term_id = 3 AND parameter_id = 2 ORDER BY window_id').fetchall()
+        stored = windows.dropna(subset=['sdnn'])
+        np.testing.assert_array_equal(stored.window_id, [row[0] for row in expected])
+        np.testing.assert_allclose(stored.sdnn, [row[1] for row in expected], rtol=1e-6)
+
+        self.assertRaises(ValueError, read_table, self.root, 'exam_window')
+
+    def test_temporary_file(self):
+        # a file of an interrupted write
+        partition = os.path.join(self.root, 'master_data', 'term=final', 'student=S1')
+        with open(os.path.join(partition, '.tmpabc123.tmp'), 'wb') as file:
+            file.write(b'PAR1\x00')
+        try:
+            self.assertEqual(len(read_table(self.root, 'master_data')), 6)
+        finally:
+            os.remove(os.path.join(partition, '.tmpabc123.tmp'))
+
+    def test_prune(self):
+        root = os.path.join(self.temp_dir.name, 'pruned')
+        shutil.copytree(self.root, root)
+        os.makedirs(os.path.join(root, 'master_data', 'term=mid1', 'student=S3'))
+        leftover = os.path.join(root, 'master_data', 'term=mid1', 'student=S1', '.tmpabc123.tmp')
+        open(leftover, 'wb').close()
+
+        self.assertEqual(ParquetExport(root).prune(['S1']), len(EXPORT_TABLES) * 3 + 1)
+        self.assertEqual(sorted(read_table(root, 'master_data', ['student']).student.unique()), ['S1'])
+        self.assertFalse(os.path.exists(leftover))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+Tests for HRV Module
+----------------------
+The vectorized kernel is compared with the calculation window by window on generated data.
+
+:Modul: test_hrv
+:Author: Benjamin Gaube
+:Date: 2023-10-12
+"""
+
+import unittest
+
+import numpy as np
+
+from src.hrv import HRV_PARAMETERS, window_parameters, estimate_contiguity
+
+
+class TestWindowParameters(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.intervals = rng.integers(400, 1200, 3000)
+        self.contiguous = rng.random(3000) < 0.8
+        self.contiguous[0] = False
+        self.lower = np.sort(rng.integers(0, 3000, 200))
+        self.upper = np.minimum(self.lower + rng.integers(0, 400, 200), 3000)
+        self.lower[:3], self.upper[:3] = [0, 2999, 3000], [0, 3000, 3000]  # empty, single and trailing window
+
+    def expected(self, start, stop):
+        window = self.intervals[start:stop]
+        if len(window) == 0:
+            return {name: np.nan for name in HRV_PARAMETERS}
+
+        differences = np.diff(window)[self.contiguous[start + 1:stop]]
+        with np.errstate(invalid='ignore'):
+            rmssd = np.sqrt(np.mean(differences ** 2.0)) if len(differences) else np.nan
+            pnn50 = 100 * np.mean(np.abs(differences) > 50) if len(differences) else np.nan
+        return {'nni_mean': np.mean(window), 'sdnn': np.std(window), 'rmssd': rmssd, 'pnn50': pnn50,
+                'nni_min': window.min(), 'nni_max': window.max(), 'nni_median': np.median(window)}
+
+    def assert_parameters(self):
+        results = window_parameters(self.intervals, self.contiguous, self.lower, self.upper)
+        self.assertEqual(list(results), list(HRV_PARAMETERS))
+
+        for name in HRV_PARAMETERS:
+            expected = [self.expected(start, stop)[name] for start, stop in zip(self.lower, self.upper)]
+            np.testing.assert_array_equal(results[name], np.round(expected, 2), err_msg=name)
+
+    def test_parameters(self):
+        self.assert_parameters()
+
+    def test_rounding_edges(self):
+        # few distinct intervals and short windows, so many means are exactly x.xx5
+        rng = np.random.default_rng(11)
+        self.intervals = rng.integers(500, 504, 3000)
+        self.lower = np.arange(0, 2960, 3)
+        self.upper = self.lower + 8 * rng.integers(1, 6, len(self.lower))
+        means = np.array([self.intervals[start:stop].mean() for start, stop in zip(self.lower, self.upper)])
+        self.assertTrue((means * 1000 % 10 == 5).any())
+        self.assert_parameters()
+
+    def test_without_intervals(self):
+        results = window_parameters(np.array([], dtype=int), np.array([], dtype=bool), np.zeros(3, int), np.zeros(3, int))
+        self.assertTrue(all(np.isnan(values).all() for values in results.values()))
+
+    def test_registry(self):
+        self.assertEqual(list(HRV_PARAMETERS)[:2], ['nni_mean', 'sdnn'])  # ids of existing databases
+        self.assertTrue(all(len(name) <= 15 for name in HRV_PARAMETERS))  # hrv.parameter VARCHAR(15)
+
+    def test_estimate_contiguity(self):
+        time = np.array([100, 100, 101, 105, 105])
+        interval = np.array([700, 800, 600, 900, 500])
+        self.assertEqual(list(estimate_contiguity(time, interval)), [False, True, True, False, True])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -29,7 +29,8 @@ import tempfile
 import zipfile
 import unittest
 
-from src.main import unzip_data, unzip_it, generator_length, student_factory, FILENAME
+from src.main import unzip_data, unzip_it, generator_length, student_factory, parallel_map, threaded_map, \
+    FILENAME
 
 
 class TestModul(unittest.TestCase):
@@ -94,5 +95,32 @@ class TestMainModul(TestModul):
         self.assertEqual(len(students_list), 10)
 
 
+class TestParallelMap(unittest.TestCase):
+
+    def test_order(self):
+        items = [3, -1, 4, -1, -5, 9, -2, 6]
+        results = list(parallel_map(abs, iter(items), workers=3))
+        self.assertEqual(results, [3, 1, 4, 1, 5, 9, 2, 6])
+
+
+class TestThreadedMap(unittest.TestCase):
+
+    def test_order(self):
+        items = [3, -1, 4, -1, -5, 9, -2, 6]
+        results = list(threaded_map(str, threaded_map(abs, iter(items)), maxsize=1))
+        self.assertEqual(results, ['3', '1', '4', '1', '5', '9', '2', '6'])
+
+    def test_exception(self):
+        with self.assertRaises(ZeroDivisionError):
+            list(threaded_map(lambda x: 1 / x, iter([2, 1, 0, 3])))
+
+    def test_early_stop(self):
+        read = []
+        results = threaded_map(abs, (read.append(i) or i for i in range(1000)), maxsize=2)
+        self.assertEqual(next(results), 0)
+        results.close()
+        self.assertLess(len(read), 10)
+
+
 if __name__ == '__main__':
     unittest.main()
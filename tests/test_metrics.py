@@ -0,0 +1,144 @@
+"""
+Tests for Metrics Module
+----------------------
+
+:Modul: test_metrics
+:Author: Benjamin Gaube
+:Date: 2023-10-12
+"""
+
+import io
+import os
+import csv
+import json
+import pstats
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+from src.main import stream_data, process_data, FILENAME
+from src.metrics import collect, timed, profiled, RunMetrics, ProgressReporter, STAGES
+from src.storage import SQLiteBackend
+from src.synthetic import generate_archive
+
+
+class TestTimers(unittest.TestCase):
+
+    def test_collect(self):
+        with collect() as times:
+            with timed('read_file'):
+                pass
+            with timed('read_file'), timed('commit'):
+                pass
+        self.assertEqual(set(times), {'read_file', 'commit'})
+        self.assertTrue(all(seconds >= 0 for seconds in times.values()))
+
+        # continue the timings of a student, stages outside of collect are not recorded
+        with collect(times):
+            with timed('windowing'):
+                pass
+        with timed('calculate_hrv'):
+            pass
+        self.assertEqual(set(times), {'read_file', 'commit', 'windowing'})
+
+    def test_profiled(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'run.prof')
+            with profiled(path):
+                sorted(range(1000))
+            self.assertGreater(pstats.Stats(path).total_calls, 0)
+
+
+class TestRunMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = RunMetrics()
+        self.metrics.add_student('S1', {'read_file': 1.0, 'commit': 0.5}, 100)
+        self.metrics.add_student('S2', {'read_file': 2.0}, 300)
+        self.metrics.finish()
+
+    def test_totals(self):
+        totals = self.metrics.totals()
+        self.assertEqual(list(totals), STAGES)
+        self.assertEqual((totals['read_file'], totals['commit'], totals['windowing']), (3.0, 0.5, 0.0))
+
+    def test_export(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.metrics.export(os.path.join(temp_dir, 'metrics.json'))
+            with open(os.path.join(temp_dir, 'metrics.json')) as file:
+                content = json.load(file)
+            self.assertEqual(content['beats'], 400)
+            self.assertEqual(content['per_student']['S2'], {'read_file': 2.0, 'beats': 300})
+
+            self.metrics.export(os.path.join(temp_dir, 'metrics.csv'))
+            with open(os.path.join(temp_dir, 'metrics.csv'), newline='') as file:
+                rows = list(csv.DictReader(file))
+            self.assertEqual([row['student'] for row in rows], ['S1', 'S2', 'total'])
+            self.assertEqual(float(rows[2]['read_file']), 3.0)
+
+            self.assertRaises(ValueError, self.metrics.export, os.path.join(temp_dir, 'metrics.txt'))
+
+
+class TestProgressReporter(unittest.TestCase):
+
+    def test_throttled(self):
+        stream = io.StringIO()
+        progress = ProgressReporter(100, stream, interval=3600)
+        for i in range(1, 101):
+            progress.update(i, f'S{i}')
+        progress.close()
+
+        lines = stream.getvalue().split('\r')
+        # the first and the last student are reported, everything between is throttled
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[2].startswith('100/100 (100%) student S100, 0 errors'))
+        self.assertTrue(lines[2].endswith('\n'))
+
+
+class TestProcessDataMetrics(unittest.TestCase):
+
+    def test_stages(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = generate_archive(os.path.join(temp_dir, FILENAME + '.zip'), n_students=2, beats=1000)
+            with SQLiteBackend() as backend:
+                backend.create_schema()
+                results = []
+                stream_data(path, lambda data_dir, archive: results.append(
+                    process_data(data_dir, backend, workers=2, archive=archive)))
+
+        metrics = results[0]
+        self.assertEqual(metrics.beats, {'S1': 3000, 'S2': 3000})
+        # the stages of the worker processes are returned with the results
+        self.assertEqual(set(metrics.students['S2']), set(STAGES))
+        self.assertGreater(metrics.wall_time, 0)
+
+    def test_failed_and_skipped(self):
+        original = SQLiteBackend.insert_windows
+
+        def insert_windows(backend, cursor, student_id, term_id, windows):
+            if cursor.execute('SELECT student FROM dataset WHERE id = ?', (student_id,)).fetchone()[0] == 'S3':
+                raise RuntimeError('write failed')
+            return original(backend, cursor, student_id, term_id, windows)
+
+        with tempfile.TemporaryDirectory() as temp_dir, SQLiteBackend() as backend:
+            path = generate_archive(os.path.join(temp_dir, FILENAME + '.zip'), n_students=4, beats=1000)
+            backend.create_schema()
+            runs, output = [], io.StringIO()
+            with mock.patch('src.main.directory', temp_dir), redirect_stdout(output):
+                with mock.patch.object(SQLiteBackend, 'insert_windows', insert_windows):
+                    stream_data(path, lambda data_dir, archive: runs.append(
+                        process_data(data_dir, backend, archive=archive, incremental=True)))
+                # only S3 is loaded again, S4 is skipped by the prefetching tasks before S3 is written
+                stream_data(path, lambda data_dir, archive: runs.append(
+                    process_data(data_dir, backend, workers=2, archive=archive, incremental=True)))
+
+        self.assertEqual(runs[0].failed, ['S3'])
+        self.assertEqual(set(runs[0].students), {'S1', 'S2', 'S3', 'S4'})
+        self.assertEqual(runs[0].to_dict()['failed'], ['S3'])
+        self.assertEqual((list(runs[1].students), runs[1].failed), (['S3'], []))
+        self.assertIn('3/4 (75%) student S3, 0 errors', output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,254 @@
+"""
+Tests for SQL Database Module
+------------------------------
+Statements and connections are replaced by dummy objects, so there is no need to run a database.
+Only TestQueryPlans needs the MySQL server on localhost and is skipped if it isn't running.
+
+:Modul: test_sql_database
+:Author: Benjamin Gaube
+:Date: 2023-10-12
+"""
+
+import unittest
+from unittest import mock
+
+import numpy as np
+import mysql.connector
+
+from src.sql_database import insert_rows, insert_student, connect, create_schema, swap_schema, ConnectionPool, \
+    ANALYSIS_QUERIES
+
+
+class RecordingCursor:
+    """ stores the executed statements instead of sending them to a database """
+
+    def __init__(self):
+        self.statements = []
+        self.lastrowid = None
+
+    def execute(self, statement, params=None):
+        self.statements.append((statement, params))
+
+
+class TestInsertRows(unittest.TestCase):
+
+    def test_batches(self):
+        cursor = RecordingCursor()
+        n_rows = insert_rows(cursor, 'inter_beat_interval', {
+            'student_id': 3,
+            'term_id': np.int64(2),
+            'ibi_value': np.arange(500, 505, dtype=np.int32),
+            'timestamp': np.arange(10, 15)
+        }, batch_size=2)
+
+        self.assertEqual(n_rows, 5)
+        self.assertEqual(len(cursor.statements), 3)
+
+        statement, params = cursor.statements[0]
+        self.assertEqual(statement, 'INSERT INTO inter_beat_interval (student_id, term_id, ibi_value, timestamp) '
+                                    'VALUES (%s, %s, %s, %s), (%s, %s, %s, %s)')
+        self.assertEqual(params, [3, 2, 500, 10, 3, 2, 501, 11])
+        self.assertIsInstance(params[2], int)
+
+        statement, params = cursor.statements[2]
+        self.assertEqual(params, [3, 2, 504, 14])
+
+    def test_single_row(self):
+        cursor = RecordingCursor()
+        insert_rows(cursor, 'master_data', {'student_id': 1, 'nni_mean': 512.25})
+        self.assertEqual(cursor.statements[0][1], [1, 512.25])
+
+    def test_different_length(self):
+        columns = {'ibi_value': np.arange(3), 'timestamp': np.arange(4)}
+        self.assertRaises(ValueError, insert_rows, RecordingCursor(), 'inter_beat_interval', columns)
+
+
+class DummyConnection:
+    """ stands in for a MySQLConnection """
+
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+        self.rollbacks = 0
+
+    def ping(self, reconnect=False):
+        if not self.alive:
+            raise mysql.connector.InterfaceError('Connection lost')
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+@mock.patch('src.sql_database.sleep')
+class TestConnections(unittest.TestCase):
+
+    def test_backoff(self, sleep):
+        failing = mock.Mock(side_effect=mysql.connector.Error('refused'))
+        with mock.patch('mysql.connector.connect', failing):
+            self.assertRaises(mysql.connector.Error, connect, retries=5, base_delay=1, max_delay=4)
+
+        self.assertEqual(failing.call_count, 6)
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [1, 2, 4, 4, 4])
+
+    def test_pool_reuses_connections(self, sleep):
+        with mock.patch('mysql.connector.connect', side_effect=lambda **kwargs: DummyConnection()) as opener:
+            pool = ConnectionPool('some_schema', pool_size=2)
+            with pool.connection() as first:
+                pass
+            with pool.connection() as second:
+                self.assertIs(first, second)
+
+            with pool.connection() as first, pool.connection() as second:
+                self.assertIsNot(first, second)
+            self.assertEqual(opener.call_count, 2)
+
+            pool.close()
+            self.assertTrue(first.closed and second.closed)
+
+    def test_pool_replaces_stale_connection(self, sleep):
+        with mock.patch('mysql.connector.connect', side_effect=lambda **kwargs: DummyConnection()):
+            pool = ConnectionPool(pool_size=1)
+            with pool.connection() as stale:
+                stale.alive = False
+            with pool.connection() as db:
+                self.assertIsNot(db, stale)
+                self.assertTrue(stale.closed)
+
+    def test_pool_rollback_on_error(self, sleep):
+        with mock.patch('mysql.connector.connect', side_effect=lambda **kwargs: DummyConnection()):
+            pool = ConnectionPool(pool_size=1)
+            with self.assertRaises(KeyError):
+                with pool.connection() as db:
+                    raise KeyError('S1')
+            self.assertEqual(db.rollbacks, 1)
+            with pool.connection() as reused:
+                self.assertIs(reused, db)
+
+
+class TableCursor(RecordingCursor):
+    """ returns the tables of a schema for queries of INFORMATION_SCHEMA.TABLES """
+
+    tables = {'live': ['dataset', 'inter_beat_interval'], 'live_staging': ['dataset', 'inter_beat_interval']}
+
+    def fetchall(self):
+        return [(table,) for table in self.tables[self.statements[-1][1][0]]]
+
+
+class TestSwapSchema(unittest.TestCase):
+
+    def test_single_rename(self):
+        cursor = TableCursor()
+        db = mock.MagicMock()
+        db.cursor.return_value = cursor
+        with mock.patch('src.sql_database.connect_to_localhost') as opener:
+            opener.return_value.__enter__.return_value = db
+            swap_schema('live_staging', 'live')
+
+        renames = [statement for statement, _ in cursor.statements if statement.startswith('RENAME')]
+        self.assertEqual(renames, ['RENAME TABLE live.dataset TO live_old.dataset, '
+                                   'live.inter_beat_interval TO live_old.inter_beat_interval, '
+                                   'live_staging.dataset TO live.dataset, '
+                                   'live_staging.inter_beat_interval TO live.inter_beat_interval'])
+        self.assertEqual([statement for statement, _ in cursor.statements[-2:]],
+                         ['DROP DATABASE live_old', 'DROP DATABASE live_staging'])
+
+
+class SchemaCursor(RecordingCursor):
+    """ behaves like a retained schema, which has all rows of the lookup tables but only some indexes """
+
+    indexes = {'inter_beat_interval': ['PRIMARY', 'ibi_student_term_time'],
+               'window_values': ['PRIMARY', 'window_student_term_time', 'window_term_time']}
+
+    def fetchone(self):
+        return 1,
+
+    def fetchall(self):
+        statement, params = self.statements[-1]
+        if 'INFORMATION_SCHEMA.STATISTICS' in statement:
+            return [(name,) for name in self.indexes[params[1]]]
+        return [(row_id,) for row_id in range(1, 100)]
+
+
+class TestCreateSchema(unittest.TestCase):
+
+    def create_schema(self, indexes):
+        cursor = SchemaCursor()
+        db = mock.MagicMock()
+        db.cursor.return_value = cursor
+        with mock.patch('src.sql_database.connect_to_localhost') as opener:
+            opener.return_value.__enter__.return_value = db
+            create_schema('live', drop_existing=False, indexes=indexes)
+        return [statement for statement, _ in cursor.statements if statement.startswith('ALTER')]
+
+    def test_retained_schema_gets_indexes(self):
+        self.assertEqual(self.create_schema(indexes=True), [
+            'ALTER TABLE inter_beat_interval ADD INDEX ibi_term_time (term_id, timestamp)',
+            'ALTER TABLE window_values DROP INDEX window_student_term_time, DROP INDEX window_term_time, '
+            'ADD INDEX window_student_term_spec_time '
+            '(student_id, term_id, window_spec_id, timestamp), '
+            'ADD INDEX window_term_spec_time (term_id, window_spec_id, timestamp)'])
+        self.assertEqual(self.create_schema(indexes=False), [])
+
+
+class TestQueryPlans(unittest.TestCase):
+    """ checks with EXPLAIN, that the standard analysis queries use index range scans """
+
+    schema = 'application_project_test'
+    expected_index = {'ibi_range': 'ibi_student_term_time',
+                      'window_range': 'window_student_term_spec_time',
+                      'exam_window': 'ibi_term_time'}
+
+    @classmethod
+    def setUpClass(cls):
+        try:
+            connect(retries=0).close()
+        except mysql.connector.Error:
+            raise unittest.SkipTest('no MySQL server running on localhost')
+
+    def check_plans(self, partition):
+        create_schema(self.schema, drop_existing=True, partition=partition)
+
+        with ConnectionPool(self.schema) as pool, pool.connection() as db:
+            cursor = db.cursor()
+            rng = np.random.default_rng(0)
+            for student in ['S1', 'S2', 'S3', 'S4']:
+                student_id = insert_student(cursor, student)
+                for term_id in [1, 2, 3]:
+                    insert_rows(cursor, 'inter_beat_interval', {
+                        'student_id': student_id, 'term_id': term_id,
+                        'ibi_value_id': np.arange(1, 5001), 'ibi_value': rng.integers(300, 1500, 5000),
+                        'timestamp': 1539439200 + np.arange(5000)})
+                    insert_rows(cursor, 'window_values', {
+                        'student_id': student_id, 'term_id': term_id, 'window_id': np.arange(1, 1001),
+                        'timestamp': 1539439200 + 60 * np.arange(1000), 'parameter_id': 1,
+                        'hrv_value': rng.random(1000), 'number_of_ibi': 100})
+            db.commit()
+            cursor.execute('ANALYZE TABLE inter_beat_interval, window_values')
+            cursor.fetchall()
+
+            for name, query in ANALYSIS_QUERIES.items():
+                # student 1 (and spec 1) of the term 2
+                params = {5: (1, 2, 1), 4: (1, 2), 3: (2,)}[query.count('%s')] + (1539439500, 1539439800)
+                cursor = db.cursor(dictionary=True)
+                cursor.execute('EXPLAIN ' + query, params)
+                plan = cursor.fetchall()
+                self.assertEqual(plan[0]['key'], self.expected_index[name], name)
+                self.assertEqual(plan[0]['type'], 'range', name)
+
+    def test_plans(self):
+        self.check_plans(partition=False)
+
+    def test_plans_partitioned(self):
+        self.check_plans(partition=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        with ConnectionPool() as pool, pool.connection() as db:
+            db.cursor().execute(f'DROP DATABASE IF EXISTS {cls.schema}')
+
+
+if __name__ == '__main__':
+    unittest.main()
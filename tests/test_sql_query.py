@@ -0,0 +1,143 @@
+"""
+Tests for SQL Query Module
+----------------------
+The reader runs against an SQLite database filled with a generated zip-file,
+the results are compared with `pd.read_sql`.
+
+:Modul: test_sql_query
+:Author: Benjamin Gaube
+:Date: 2023-10-12
+"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.main import stream_data, process_data, FILENAME
+from src.storage import SQLiteBackend
+from src.synthetic import generate_archive
+from src.sql_query import QueryReader
+from src.event_series import InterBeatInterval
+
+
+class TestQueryReader(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.backend = SQLiteBackend()
+        cls.backend.create_schema()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = generate_archive(os.path.join(temp_dir, FILENAME + '.zip'), n_students=3, beats=4000)
+            stream_data(path, lambda data_dir, archive: process_data(data_dir, cls.backend, archive=archive))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.backend.close()
+
+    def setUp(self):
+        # small chunks, so every result is fetched in several chunks
+        self.reader = QueryReader(self.backend.db.cursor(), '?', fetch_size=700)
+
+    def test_ibi_series(self):
+        ibi = self.reader.ibi_series('S2', 'mid1')
+        expected = pd.read_sql('SELECT timestamp, ibi_value FROM inter_beat_interval WHERE student_id = 2 '
+                               'AND term_id = 1 ORDER BY ibi_value_id', self.backend.db)
+        self.assertEqual((ibi['timestamp'].dtype, ibi['ibi_value'].dtype), (np.int64, np.int32))
+        np.testing.assert_array_equal(ibi['timestamp'], expected.timestamp)
+        np.testing.assert_array_equal(ibi['ibi_value'], expected.ibi_value)
+
+        start, stop = InterBeatInterval.term_periods['mid1']
+        exam = self.reader.ibi_series('S2', 'mid1', (start, stop))
+        self.assertTrue(0 < len(exam['timestamp']) < len(ibi['timestamp']))
+        self.assertTrue(((exam['timestamp'] >= start) & (exam['timestamp'] <= stop)).all())
+
+        self.assertEqual(len(self.reader.ibi_series('S9', 'mid1')['ibi_value']), 0)
+
+    def test_exam_intervals(self):
+        exam = self.reader.exam_intervals('final', InterBeatInterval.term_periods['final'])
+        self.assertEqual(list(np.unique(exam['student'])), ['S1', 'S2', 'S3'])
+        np.testing.assert_array_equal(exam['ibi_value'][exam['student'] == 'S3'],
+                                      self.reader.ibi_series('S3', 'final', InterBeatInterval.term_periods['final'])
+                                      ['ibi_value'])
+
+    def test_exam_window(self):
+        exam_window = self.reader.exam_window()
+        self.assertEqual(list(exam_window['student'][:3]), ['S1'] * 3)
+        self.assertEqual(list(exam_window['term'][:3]), ['mid1', 'mid2', 'final'])
+
+        exam = self.reader.exam_intervals('final', InterBeatInterval.term_periods['final'])['ibi_value']
+        final = exam_window['term'] == 'final'
+        self.assertEqual(exam_window['number_of_ibi'][final].sum(), len(exam))
+        self.assertEqual(len(self.reader.exam_window(min_ibi=10 ** 6)['student']), 0)
+
+    def test_segments(self):
+        segments = self.reader.segments('S1', 'final')
+        ibi = self.reader.ibi_series('S1', 'final')
+        self.assertEqual(segments['number_of_ibi'].sum(), len(ibi['ibi_value']))
+        self.assertEqual(segments['duration_in_ms'].sum(), ibi['ibi_value'].sum())
+        self.assertTrue((segments['start_time'][1:] >= segments['end_time'][:-1] - 1).all())
+
+        long_segments = self.reader.segments('S1', 'final', min_ibi=10)
+        self.assertTrue((long_segments['number_of_ibi'] >= 10).all())
+
+    def test_window_values(self):
+        windows = self.reader.window_values('S1', 'final', parameter_id=2)
+        expected = pd.read_sql('SELECT hrv_value FROM window_values WHERE student_id = 1 AND term_id = 3 '
+                               'AND parameter_id = 2 ORDER BY window_id', self.backend.db)
+        np.testing.assert_array_equal(windows['hrv_value'], expected.hrv_value)
+        self.assertTrue((windows['parameter_id'] == 2).all())
+
+    def test_master_data(self):
+        master = self.reader.master_data()
+        self.assertEqual(list(master['student']), ['S1'] * 3 + ['S2'] * 3 + ['S3'] * 3)
+        self.assertEqual(list(master['term'][:3]), ['mid1', 'mid2', 'final'])
+        self.assertTrue((master['number_of_ibi'] == 4000).all())
+
+    def test_fetch_enlarges(self):
+        result = self.reader.fetch('SELECT ibi_value FROM inter_beat_interval', (), {'ibi_value': np.int32}, size=10)
+        self.assertEqual(len(result['ibi_value']), 3 * 3 * 4000)
+
+
+class TestBlobStorage(unittest.TestCase):
+    """ the series of a database storing blobs only are the same as of the database storing rows """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.backends = {mode: SQLiteBackend(ibi_storage=mode) for mode in ['rows', 'blob']}
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = generate_archive(os.path.join(temp_dir, FILENAME + '.zip'), n_students=3, beats=2000)
+            for backend in cls.backends.values():
+                backend.create_schema()
+                stream_data(path, lambda data_dir, archive: process_data(data_dir, backend, archive=archive))
+        cls.readers = {mode: QueryReader(backend.db.cursor(), '?') for mode, backend in cls.backends.items()}
+
+    @classmethod
+    def tearDownClass(cls):
+        for backend in cls.backends.values():
+            backend.close()
+
+    def assert_results_equal(self, name: str, *args):
+        rows, blob = (getattr(self.readers[mode], name)(*args) for mode in ['rows', 'blob'])
+        self.assertEqual(list(blob), list(rows))
+        for column in rows:
+            self.assertEqual(blob[column].dtype, rows[column].dtype)
+            np.testing.assert_array_equal(blob[column], rows[column])
+
+    def test_ibi_series(self):
+        self.assertEqual(self.backends['blob'].db.execute('SELECT COUNT(*) FROM inter_beat_interval').fetchone()[0], 0)
+        self.assert_results_equal('ibi_series', 'S2', 'mid1')
+        self.assert_results_equal('ibi_series', 'S2', 'final', InterBeatInterval.term_periods['final'])
+        self.assertEqual(len(self.readers['blob'].ibi_series('S9', 'mid1')['ibi_value']), 0)
+
+    def test_exam_intervals(self):
+        for term in ['mid1', 'final']:
+            self.assert_results_equal('exam_intervals', term, InterBeatInterval.term_periods[term])
+        self.assertGreater(len(self.readers['blob'].exam_intervals('final', InterBeatInterval.term_periods['final'])
+                               ['ibi_value']), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,360 @@
+"""
+Tests for Storage Module
+----------------------
+The whole processing is tested with the embedded SQLite database and a small
+zip-file built by test_archive.py, so there is no need to run a MySQL server.
+
+:Modul: test_storage
+:Author: Benjamin Gaube
+:Date: 2023-10-12
+"""
+
+import io
+import os
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+import numpy as np
+
+from test_archive import build_archive, FOLDER, GRADES
+from src.archive import DatasetArchive
+from src.main import process_data
+from src.storage import SQLiteBackend, MySQLBackend
+from src.sql_query import open_reader
+from src.student import Student
+from src.event_series import SignalSeries
+from src.hrv import HRV_PARAMETERS
+from src.sql_database import ANALYSIS_QUERIES
+
+
+class TestSQLiteBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = SQLiteBackend()
+        self.backend.create_schema()
+
+    def tearDown(self):
+        self.backend.close()
+
+    def test_create_schema(self):
+        self.backend.create_schema()  # nothing happens if the tables already exist
+        with self.backend.transaction() as cursor:
+            self.assertEqual(cursor.execute('SELECT term FROM exam ORDER BY id').fetchall(),
+                             [('mid1',), ('mid2',), ('final',)])
+
+    def test_analysis_queries_use_index(self):
+        expected_index = {'ibi_range': 'ibi_student_term_time',
+                          'window_range': 'window_student_term_spec_time',
+                          'exam_window': 'ibi_term_time'}
+
+        with self.backend.transaction() as cursor:
+            for name, query in ANALYSIS_QUERIES.items():
+                query = query.replace('%s', self.backend.placeholder)
+                n_params = query.count('?')
+                plan = cursor.execute('EXPLAIN QUERY PLAN ' + query, [1] * n_params).fetchall()
+                detail = ' '.join(row[-1] for row in plan)
+                self.assertIn(f'USING INDEX {expected_index[name]}', detail)
+                self.assertIn('timestamp>? AND timestamp<?', detail)
+
+    def test_insert_student(self):
+        with self.backend.transaction() as cursor:
+            student_id = self.backend.insert_student(cursor, 'S1')
+            self.backend.insert_ibi(cursor, student_id, 1, np.array([500, 600]), np.array([10, 11]))
+
+        with self.backend.transaction() as cursor:
+            new_id = self.backend.insert_student(cursor, 'S1')
+            self.assertNotEqual(new_id, student_id)
+            # the data of the old entry is deleted by the foreign key
+            self.assertEqual(cursor.execute('SELECT COUNT(*) FROM inter_beat_interval').fetchone()[0], 0)
+
+    def test_rollback(self):
+        with self.assertRaises(KeyError):
+            with self.backend.transaction() as cursor:
+                self.backend.insert_student(cursor, 'S1')
+                raise KeyError('S1')
+
+        with self.backend.transaction() as cursor:
+            self.assertEqual(cursor.execute('SELECT COUNT(*) FROM dataset').fetchone()[0], 0)
+
+    def test_process_data(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, FOLDER + '.zip')
+            build_archive(path, zipfile.ZIP_STORED)
+
+            with DatasetArchive(path) as archive:
+                process_data('', backend=self.backend, archive=archive)
+
+        with self.backend.transaction() as cursor:
+            rows = cursor.execute('SELECT term_id, ibi_value_id, ibi_value, timestamp FROM inter_beat_interval '
+                                  'WHERE term_id = 3 ORDER BY ibi_value_id').fetchall()
+            self.assertEqual(rows, [(3, 1, 593, 1544027348), (3, 2, 593, 1544027348), (3, 3, 500, 1544027349)])
+
+            # the third interval of the final doesn't follow the second one
+            segments = cursor.execute('SELECT segment_id, start_time, number_of_ibi, duration_in_ms FROM ibi_segment '
+                                      'WHERE term_id = 3 ORDER BY segment_id').fetchall()
+            self.assertEqual(segments, [(1, 1544027348, 2, 1186), (2, 1544027349, 1, 500)])
+
+            grade, number_of_ibi = cursor.execute('SELECT grade, number_of_ibi FROM master_data '
+                                                  'WHERE term_id = 3').fetchone()
+            self.assertEqual((grade, number_of_ibi), (182, 3))
+
+            exam_window = cursor.execute('SELECT number_of_ibi, nni_mean, sdnn FROM exam_window '
+                                         'WHERE term_id = 3').fetchone()
+            self.assertEqual(exam_window, (3, 562.0, 53.69))
+
+            # windows of the final containing all three intervals, with all parameters each
+            n_windows = cursor.execute('SELECT COUNT(*) FROM window_values').fetchone()[0]
+            self.assertEqual(n_windows, len(HRV_PARAMETERS) * 5)
+
+            # only the first two intervals are contiguous
+            rmssd, pnn50, median = cursor.execute(
+                'SELECT hrv_value FROM window_values WHERE term_id = 3 AND number_of_ibi = 3 '
+                'AND parameter_id IN (3, 4, 7) ORDER BY window_id, parameter_id LIMIT 3').fetchall()
+            self.assertEqual((rmssd[0], pnn50[0], median[0]), (0.0, 0.0, 593.0))
+
+    def test_window_specs(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, FOLDER + '.zip')
+            build_archive(path, zipfile.ZIP_STORED)
+
+            with DatasetArchive(path) as archive:
+                process_data('', backend=self.backend, archive=archive, window_specs=['5min', '1min'])
+                self.assertRaises(ValueError, process_data, '', backend=self.backend, archive=archive,
+                                  window_specs=['3min'])
+
+        with self.backend.transaction() as cursor:
+            self.assertEqual(cursor.execute('SELECT name, length_in_s, step_in_s FROM window_spec '
+                                            'WHERE id = 2').fetchone(), ('1min', 60, 15))
+            # the 1-minute windows of the final containing all three intervals
+            counts = cursor.execute('SELECT window_spec_id, COUNT(DISTINCT window_id) FROM window_values '
+                                    'WHERE number_of_ibi = 3 GROUP BY window_spec_id').fetchall()
+            self.assertEqual(counts, [(1, 5), (2, 4)])
+
+    def test_add_window_spec_column(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'old.db')
+            with SQLiteBackend(path) as backend, backend.transaction() as cursor:
+                cursor.execute('CREATE TABLE window_values (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INT, '
+                               'term_id INT, window_id INT, timestamp INT, parameter_id INT, hrv_value FLOAT, '
+                               'number_of_ibi INT)')
+                cursor.execute('INSERT INTO window_values (window_id, hrv_value) VALUES (1, 512.5)')
+
+            with SQLiteBackend(path) as backend:
+                backend.create_schema(drop_existing=False)
+                with backend.transaction() as cursor:
+                    self.assertEqual(cursor.execute('SELECT window_spec_id, hrv_value FROM window_values').fetchall(),
+                                     [(1, 512.5)])
+
+    def test_ibi_storage(self):
+        time, interval = np.array([10, 11, 11, 15]), np.array([500, 600, 550, 700])
+        for ibi_storage, expected in [('rows', (4, 0)), ('blob', (0, 1)), ('both', (4, 1))]:
+            backend = SQLiteBackend(ibi_storage=ibi_storage)
+            backend.create_schema()
+            with backend.transaction() as cursor:
+                student_id = backend.insert_student(cursor, 'S1')
+                backend.insert_ibi(cursor, student_id, 2, interval, time)
+
+                counts = tuple(cursor.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                               for table in ['inter_beat_interval', 'ibi_series'])
+                self.assertEqual(counts, expected, ibi_storage)
+
+                read_time, read_interval = backend.read_ibi_series(cursor, student_id, 2)
+                np.testing.assert_array_equal(read_time, time)
+                np.testing.assert_array_equal(read_interval, interval)
+
+                backend.delete_term(cursor, student_id, 2)
+                self.assertEqual(len(backend.read_ibi_series(cursor, student_id, 2)[0]), 0)
+            backend.close()
+
+        self.assertRaises(ValueError, SQLiteBackend, ibi_storage='columns')
+
+    def test_insert_signal(self):
+        content = b'1544020000.000000\n4.000000\n' + b''.join(b'%.2f\n' % (32 + k / 100) for k in range(10))
+        with self.backend.transaction() as cursor:
+            student_id = self.backend.insert_student(cursor, 'S1')
+            chunks = SignalSeries.parse_chunks(io.BytesIO(content), 1, chunk_size=4)
+            self.assertEqual(self.backend.insert_signal(cursor, student_id, 3, 'TEMP', chunks), 11)
+
+            rows = cursor.execute('SELECT sample_index, temp FROM signal_temp ORDER BY sample_index').fetchall()
+            self.assertEqual([row[0] for row in rows], list(range(10)))
+            self.assertAlmostEqual(rows[9][1], 32.09, places=5)
+            recording = cursor.execute('SELECT start_time, sample_rate, number_of_samples FROM signal_recording '
+                                       'WHERE signal_name = ?', ('TEMP',)).fetchone()
+            self.assertEqual(recording, (1544020000.0, 4.0, 10))
+
+            self.backend.delete_term(cursor, student_id, 3)
+            self.assertEqual(cursor.execute('SELECT COUNT(*) FROM signal_temp').fetchone()[0], 0)
+
+
+class TestReload(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, FOLDER + '.zip')
+        build_archive(self.path, zipfile.ZIP_STORED)
+        self.db_path = os.path.join(self.temp_dir.name, 'live.db')
+        self.backend = SQLiteBackend(self.db_path)
+        self.backend.create_schema()
+        with self.backend.transaction() as cursor:
+            self.backend.insert_student(cursor, 'S9')
+
+    def tearDown(self):
+        self.backend.close()
+        self.temp_dir.cleanup()
+
+    def students(self, backend):
+        with backend.transaction() as cursor:
+            return cursor.execute('SELECT student FROM dataset').fetchall()
+
+    def test_reload(self):
+        with SQLiteBackend(self.db_path) as reader:
+            with self.backend.reload() as staging, DatasetArchive(self.path) as archive:
+                process_data('', backend=staging, archive=archive)
+                self.assertEqual(self.students(reader), [('S9',)])  # old data until the swap
+            self.assertEqual(self.students(reader), [('S1',)])
+
+        with self.backend.transaction() as cursor:
+            self.assertEqual(cursor.execute('SELECT COUNT(*) FROM inter_beat_interval').fetchone()[0], 9)
+            plan = ' '.join(row[-1] for row in cursor.execute(
+                'EXPLAIN QUERY PLAN SELECT * FROM window_values WHERE term_id = 1 AND window_spec_id = 1 '
+                'AND timestamp > 0').fetchall())
+            self.assertIn('USING INDEX window_term_spec_time', plan)
+            self.assertEqual(cursor.execute('PRAGMA foreign_key_check').fetchall(), [])
+        self.assertFalse(os.path.exists(self.db_path + '.staging'))
+
+    def test_rollback(self):
+        with self.assertRaises(KeyError):
+            with self.backend.reload() as staging:
+                with staging.transaction() as cursor:
+                    staging.insert_student(cursor, 'S1')
+                raise KeyError('S1')
+
+        self.assertEqual(self.students(self.backend), [('S9',)])
+        self.assertFalse(os.path.exists(self.db_path + '.staging'))
+
+
+class TestMySQLBackend(unittest.TestCase):
+
+    @mock.patch('src.sql_database.connect')
+    def test_config(self, opener):
+        config = {'host': 'db.example.org', 'user': 'analyst', 'password': 'secret'}
+        backend = MySQLBackend('live', **config)
+        backend.create_schema(drop_existing=False)
+        with backend.reload() as staging:
+            with staging.transaction():
+                pass
+        with open_reader('live', **config):
+            pass
+
+        # pool connections, schema changes and the reader all connect to the configured server
+        self.assertEqual(len(opener.call_args_list), 6)
+        for call in opener.call_args_list:
+            self.assertEqual({key: call.kwargs[key] for key in config}, config)
+
+        with self.assertRaises(KeyError):
+            with backend.reload():
+                raise KeyError('S1')
+        self.assertEqual(opener.call_args.kwargs['host'], 'db.example.org')  # drop of the staging schema
+
+
+class TestIncrementalIngestion(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, FOLDER + '.zip')
+        build_archive(self.path, zipfile.ZIP_STORED)
+        self.backend = SQLiteBackend()
+        self.backend.create_schema()
+
+    def tearDown(self):
+        self.backend.close()
+        self.temp_dir.cleanup()
+
+    def ingest(self, incremental=True, signals=()):
+        with DatasetArchive(self.path) as archive:
+            process_data('', backend=self.backend, archive=archive, incremental=incremental, signals=signals)
+
+        with self.backend.transaction() as cursor:
+            return cursor.execute('SELECT term_id, MIN(id) FROM inter_beat_interval GROUP BY term_id').fetchall()
+
+    def test_unchanged(self):
+        first = self.ingest()
+        with self.backend.transaction() as cursor:
+            ledger = self.backend.load_ledger(cursor)
+        self.assertEqual(sorted(ledger['S1'][1]), [1, 2, 3])
+
+        self.assertEqual(self.ingest(), first)  # nothing rewritten
+
+    def test_full_run(self):
+        # without the comparison, the fingerprint of every term is calculated once, while it is processed
+        with mock.patch.object(Student, 'fingerprint', autospec=True, side_effect=Student.fingerprint) as fingerprint:
+            first = self.ingest(incremental=False)
+        self.assertEqual(fingerprint.call_count, 3)
+
+        self.assertEqual(self.ingest(), first)  # the ledger is recorded by the full run
+
+    def deliver_final(self, file_name='IBI.csv', row=b'15.000000,0.750000\n'):
+        """ deliver a new recording of the final of S1 """
+        with zipfile.ZipFile(self.path) as zip_ref:
+            inner = zipfile.ZipFile(zip_ref.open(f'{FOLDER}/Data.zip'))
+            members = {name: inner.read(name) for name in inner.namelist()}
+        members[f'Data/S1/Final/{file_name}'] += row
+        with zipfile.ZipFile(self.path, 'w') as zip_ref:
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, 'w') as inner:
+                for name, content in members.items():
+                    inner.writestr(name, content)
+            zip_ref.writestr(f'{FOLDER}/Data.zip', buffer.getvalue())
+            zip_ref.writestr(f'{FOLDER}/StudentGrades.txt', GRADES.encode())
+
+    def test_changed_term(self):
+        first = dict(self.ingest())
+        self.deliver_final()
+
+        second = dict(self.ingest())
+        self.assertEqual(second[1], first[1])
+        self.assertEqual(second[2], first[2])
+        self.assertGreater(second[3], first[3])
+
+        with self.backend.transaction() as cursor:
+            self.assertEqual(cursor.execute('SELECT COUNT(*) FROM dataset').fetchone()[0], 1)
+            self.assertEqual(cursor.execute('SELECT number_of_ibi FROM master_data WHERE term_id = 3').fetchall(),
+                             [(4,)])
+
+    def test_signals(self):
+        first = dict(self.ingest())
+
+        # requesting a signal replaces all terms, so the signal is loaded for them
+        second = dict(self.ingest(signals=['HR']))
+        self.assertTrue(all(second[j] > first[j] for j in first))
+        self.assertEqual(self.ingest(signals=['HR']), list(second.items()))  # nothing rewritten
+
+        # a changed signal file replaces its term
+        self.deliver_final('HR.csv', b'2.000000\n')
+        third = dict(self.ingest(signals=['HR']))
+        self.assertEqual(third[1], second[1])
+        self.assertGreater(third[3], second[3])
+        with self.backend.transaction() as cursor:
+            self.assertEqual(cursor.execute('SELECT COUNT(*) FROM signal_hr WHERE term_id = 3').fetchone()[0], 1)
+
+    def test_failed_write(self):
+        first = dict(self.ingest())
+        self.deliver_final()
+
+        # the replacement of the final fails after its old rows are deleted
+        with mock.patch.object(SQLiteBackend, 'insert_windows', side_effect=RuntimeError('write failed')), \
+                mock.patch('src.main.directory', self.temp_dir.name):
+            self.assertEqual(dict(self.ingest()), first)
+        with open(os.path.join(self.temp_dir.name, 'error_log.txt')) as file:
+            self.assertIn('Error in S1', file.read())
+
+        # the ledger wasn't updated, so the next run replaces the final
+        second = dict(self.ingest())
+        self.assertEqual(second[1], first[1])
+        self.assertGreater(second[3], first[3])
+
+
+if __name__ == '__main__':
+    unittest.main()
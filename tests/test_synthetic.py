@@ -0,0 +1,106 @@
+"""
+Tests for Synthetic Module
+----------------------
+The generated zip-file is processed like the downloaded one.
+
+:Modul: test_synthetic
+:Author: Benjamin Gaube
+:Date: 2023-10-12
+"""
+
+import os
+import zipfile
+import tempfile
+import unittest
+
+from src.main import unzip_data, stream_data, student_factory, process_data, FILENAME
+from src.storage import SQLiteBackend
+from src.synthetic import generate_archive
+from benchmarks.ingest import run_benchmark, STAGES
+
+
+class TestGenerateArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = generate_archive(os.path.join(self.temp_dir.name, FILENAME + '.zip'),
+                                     n_students=3, beats=2000, seed=1)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def check_students(self, temp_dir, archive=None):
+        students = list(student_factory(temp_dir, archive))
+        self.assertEqual([stud.student_id for stud in students], ['S1', 'S2', 'S3'])
+
+        stud = students[2]
+        self.assertTrue(all(30 <= grade <= 200 for grade in stud.grades))
+        stud.ibi = stud.path
+        for term in ['final', 'mid1', 'mid2']:
+            ibi_df = getattr(stud.ibi, term)
+            self.assertEqual(len(ibi_df), 2000)
+            self.assertTrue(ibi_df.interval.between(300, 1600).all())
+            self.assertTrue((ibi_df.time.diff().dropna() >= 0).all())
+        self.checked = True
+
+    def test_unzip_data(self):
+        unzip_data(self.path, self.check_students)
+        self.assertTrue(self.checked)
+
+    def test_stream_data(self):
+        stream_data(self.path, self.check_students)
+        self.assertTrue(self.checked)
+
+    def test_reproducible(self):
+        other = generate_archive(os.path.join(self.temp_dir.name, 'other.zip'), n_students=3, beats=2000, seed=1)
+        with zipfile.ZipFile(self.path) as first, zipfile.ZipFile(other) as second:
+            self.assertEqual([info.CRC for info in first.infolist()], [info.CRC for info in second.infolist()])
+
+    def test_process_data(self):
+        with SQLiteBackend() as backend:
+            backend.create_schema()
+            stream_data(self.path, lambda temp_dir, archive: process_data(temp_dir, backend, archive=archive))
+            with backend.transaction() as cursor:
+                n_rows = cursor.execute('SELECT COUNT(*) FROM inter_beat_interval').fetchone()[0]
+        self.assertEqual(n_rows, 3 * 3 * 2000)
+
+    def test_pipeline(self):
+        tables = {}
+        for pipeline in [False, True]:
+            with SQLiteBackend() as backend:
+                backend.create_schema()
+                stream_data(self.path, lambda temp_dir, archive: process_data(temp_dir, backend, archive=archive,
+                                                                               pipeline=pipeline))
+                with backend.transaction() as cursor:
+                    tables[pipeline] = {table: cursor.execute(f'SELECT * FROM {table}').fetchall()
+                                        for table in ['dataset', 'inter_beat_interval', 'master_data',
+                                                      'exam_window', 'window_values']}
+        self.assertEqual(tables[True], tables[False])
+        with SQLiteBackend() as backend, self.assertRaises(ValueError):
+            process_data('', backend, workers=2, pipeline=True)
+
+    def test_signals(self):
+        path = generate_archive(os.path.join(self.temp_dir.name, 'signals.zip'), n_students=2, beats=500,
+                                signals=['BVP', 'ACC'], signal_seconds=60)
+        with SQLiteBackend() as backend:
+            backend.create_schema()
+            stream_data(path, lambda temp_dir, archive: process_data(temp_dir, backend, archive=archive,
+                                                                     signals=['ACC', 'BVP']))
+            with backend.transaction() as cursor:
+                counts = [cursor.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                          for table in ['signal_bvp', 'signal_acc', 'signal_recording']]
+                acc = cursor.execute('SELECT x, y, z FROM signal_acc LIMIT 1').fetchone()
+        self.assertEqual(counts, [2 * 3 * 60 * 64, 2 * 3 * 60 * 32, 2 * 3 * 2])
+        self.assertTrue(all(isinstance(value, int) for value in acc))
+
+        with SQLiteBackend() as backend, self.assertRaises(ValueError):
+            process_data('', backend, signals=['ECG'])
+
+    def test_benchmark(self):
+        timings = run_benchmark(self.path)
+        self.assertEqual(timings['beats'], 3 * 3 * 2000)
+        self.assertTrue(all(timings[stage] > 0 for stage in STAGES))
+
+
+if __name__ == '__main__':
+    unittest.main()